@@ -1,42 +1,2763 @@
+import time
+STARTUP_TIME = time.perf_counter()  # Start of the module import, for the startup benchmark
+
 import tkinter as tk 
 from tkinter import filedialog, messagebox
 from tkinter import ttk
-from PIL import Image, ImageTk, ImageOps, __version__ as PILLOW_VERSION
+from PIL import __version__ as PILLOW_VERSION
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlparse
+import argparse
+import array
+import base64
+import functools
+import hashlib
+import io
+import itertools
+import json
 import logging
+import math
+import operator
 import os
+import queue
+import re
+import signal
 import sys
+import threading
+import weakref
+
+# Pillow modules, imported by load_imaging. The GUI imports them once its window is
+# painted, everything else as soon as this module is imported (see the end of the file).
+Image = ImageDraw = ImageFilter = ImageMath = ImageOps = ImageSequence = ImageTk = None
+_image_math_eval = None
+
+def load_imaging():
+    """Import the Pillow modules used for processing and display."""
+    global Image, ImageDraw, ImageFilter, ImageMath, ImageOps, ImageSequence, ImageTk, _image_math_eval
+    if Image is not None:
+        return
+    from PIL import Image, ImageDraw, ImageFilter, ImageMath, ImageOps, ImageSequence, ImageTk
+    # ImageMath.eval was renamed to unsafe_eval in Pillow 10.3
+    _image_math_eval = getattr(ImageMath, "unsafe_eval", None) or ImageMath.eval
+
+def configure_logging():
+    """Record app events and errors in app.log."""
+    logging.basicConfig(filename='app.log', level=logging.INFO,
+                        format='%(asctime)s:%(levelname)s:%(message)s')
+
+# Keys of the five channel columns, in display order
+CHANNEL_KEYS = ("gray", "green", "red", "blue", "gray_no_g")
+
+# Widget classes that use the keys of the review shortcuts themselves
+KEY_WIDGET_CLASSES = ("Entry", "TEntry", "Spinbox", "TSpinbox", "TCombobox", "Text", "Listbox", "Scale", "TScale")
+
+# Image modes kept at their native precision instead of being reduced to 8-bit RGB
+HIGH_DEPTH_MODES = ("I;16", "I;16L", "I;16B", "I;16N", "I")
+HIGH_DEPTH_MAX = 65535
+
+# Name of the built-in channel mix controlled by the red and blue coefficient sliders
+NO_GREEN_MIX = "Grayscale No Green"
+
+# Colour space channels available to channel mixes, with their Pillow mode and band
+MIX_SPACES = {
+    "LAB L*": ("LAB", "L"),
+    "HSV V": ("HSV", "V"),
+    "YCbCr Y": ("YCbCr", "Y")
+}
+
+# Region of interest shapes, the first one meaning no region of interest
+ROI_MODES = ("Full Frame", "Rectangle", "Circle", "Auto FOV")
+
+# Name of every output, matching the image attributes of the display slots in order
+OUTPUT_NAMES = tuple(f"{key}_{row}" for row in ("image", "normalized", "custom") for key in CHANNEL_KEYS)
+
+# Supported image file extensions, and the formats outputs can be written in
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff")
+OUTPUT_FORMATS = ("png", "jpg", "bmp", "tif")
+
+# Default budget for the full-resolution images the GUI keeps, in bytes
+DEFAULT_MEMORY_BUDGET = 1024 * 1024 * 1024
+
+# Recipe format version, and the default of every recipe setting
+RECIPE_VERSION = 1
+DEFAULT_RECIPE = {
+    "version": RECIPE_VERSION,
+    "invert_before": False,
+    "red_coefficient": 0.5,
+    "blue_coefficient": 0.5,
+    "channel_mixes": "",
+    "selected_mix": NO_GREEN_MIX,
+    "roi_mode": ROI_MODES[0],
+    "roi_inset": 0.0,
+    "roi_crop": False,
+    "low_cutoff": 0.0,
+    "high_cutoff": 0.0,
+    "ignore_values": "",
+    "local_contrast": False,
+    "local_contrast_clip": 2.0,
+    "local_contrast_grid": 8,
+    "lower_threshold": 128,
+    "upper_threshold": 255,
+    "threshold_max": 255,  # Maximum level the thresholds were set against
+    "inverse_lower": False,
+    "inverse_upper": False,
+    "curve": "Linear",
+    "curve_parameter": "",
+    "outputs": [f"{key}_custom" for key in CHANNEL_KEYS],
+    "output_format": "png"
+}
+
+# Valid range of the numeric recipe settings, also the limits of their GUI controls
+RECIPE_RANGES = {
+    "red_coefficient": (0.0, 1.0),
+    "blue_coefficient": (0.0, 1.0),
+    "roi_inset": (0.0, 45.0),
+    "low_cutoff": (0.0, 20.0),
+    "high_cutoff": (0.0, 20.0),
+    "local_contrast_clip": (0.0, 10.0),
+    "local_contrast_grid": (1, 32)
+}
+
+def convert_frame(image):
+    """
+    Convert a decoded image or stack page to the mode it is processed in.
+
+    8-bit images are converted to RGB. High-bit-depth grayscale images are kept as
+    32-bit integer ("I") images clamped to 0-65535, so no precision is lost. Pillow
+    decodes 16-bit RGB files to 8 bits per channel, so those take the RGB path.
+
+    Parameters:
+        image (PIL.Image): An opened image, positioned on the page to convert.
+
+    Returns:
+        PIL.Image: A new "RGB" or "I" image, independent of the opened file.
+    """
+    if image.mode in HIGH_DEPTH_MODES:
+        if image.mode == "I":
+            image = image.convert("I;16")  # Clamp to the 16-bit range
+        return image.convert("I")
+    return image.convert("RGB")
+
+def open_image(file_path, frame=0):
+    """
+    Open an image, or one page of a multi-page TIFF stack, for processing.
+
+    Only the requested page is decoded. See convert_frame for the modes returned.
+
+    Parameters:
+        file_path (str or file): Path of the image file, or a binary file object.
+        frame (int): Zero-based page of a multi-page file.
+
+    Returns:
+        PIL.Image: An "RGB" or "I" image.
+    """
+    image = Image.open(file_path)
+    if not frame and image.mode == "RGB" and not getattr(image, "is_animated", False):
+        image.load()  # Already RGB; converting would only copy the decoded pixels. Pillow closes the file once loaded
+        return image
+    # Multi-page files stay open after a page is decoded, so close them once the page is copied
+    with image:
+        image.seek(frame)
+        return convert_frame(image)
+
+def frame_count(file_path):
+    """Return the number of pages of an image file, 1 for single-page images."""
+    with Image.open(file_path) as image:
+        return getattr(image, "n_frames", 1)
+
+def iter_frames(file_path):
+    """
+    Yield the pages of an image file one at a time, converted as by open_image.
+
+    Each page is decoded only when it is requested, so a stack is streamed rather
+    than loaded into memory as a whole.
+
+    Parameters:
+        file_path (str): Path of the image file.
+
+    Yields:
+        PIL.Image: An "RGB" or "I" image per page.
+    """
+    with Image.open(file_path) as image:
+        for page in ImageSequence.Iterator(image):
+            yield convert_frame(page)
+
+def frame_thumbnail(file_path, frame, size):
+    """
+    Build the display thumbnail of one page of an image file.
+
+    Each call opens its own handle on the file, so pages can be rendered in parallel.
+
+    Parameters:
+        file_path (str): Path of the image file.
+        frame (int): Zero-based page.
+        size (int): Maximum width and height of the thumbnail.
+
+    Returns:
+        PIL.Image: An 8-bit thumbnail ready to display.
+    """
+    return to_display_image(fit_image(open_image(file_path, frame), size, size))
+
+def max_value_of(image):
+    """Return the largest intensity level of an image processed by the app."""
+    return HIGH_DEPTH_MAX if image.mode == "I" else 255
+
+def channel_histogram(image, mask=None):
+    """
+    Compute the histogram of a single channel image at its native depth.
+
+    Parameters:
+        image (PIL.Image): An "L" or "I" image.
+        mask (PIL.Image): Optional binary "L" mask; only pixels under it are counted.
+
+    Returns:
+        list: 256 or 65536 pixel counts, one per intensity level.
+    """
+    if image.mode != "I":
+        return image.histogram(mask)
+    outside = 0
+    if mask is not None:
+        # getcolors has no mask, so zero the pixels outside it and take them out of bin 0
+        outside = mask.histogram()[0]
+        image = Image.composite(image, Image.new("I", image.size, 0), mask)
+    # getcolors counts every distinct value in C, which gives a full-resolution histogram
+    histogram = [0] * (HIGH_DEPTH_MAX + 1)
+    for count, value in image.getcolors(HIGH_DEPTH_MAX + 1):
+        histogram[value] = count
+    histogram[0] -= outside
+    return histogram
+
+def histogram_mean(histogram):
+    """Return the mean intensity of a histogram, or 0.0 if it is empty."""
+    total = sum(histogram)
+    if not total:
+        return 0.0
+    return sum(value * count for value, count in enumerate(histogram) if count) / total
+
+def build_roi_mask(image, mode, inset=0.0):
+    """
+    Build the region of interest mask of an image.
+
+    Parameters:
+        image (PIL.Image): The loaded image.
+        mode (str): One of ROI_MODES.
+        inset (float): Percent of the frame left out around a rectangle or circle.
+
+    Returns:
+        PIL.Image: A binary "L" mask, or None for the full frame.
+    """
+    if mode == "Auto FOV":
+        return detect_fov_mask(image)
+    if mode not in ("Rectangle", "Circle"):
+        return None
+
+    width, height = image.size
+    mask = Image.new("L", image.size, 0)
+    draw = ImageDraw.Draw(mask)
+    if mode == "Rectangle":
+        dx = width * inset / 100
+        dy = height * inset / 100
+        draw.rectangle((dx, dy, width - 1 - dx, height - 1 - dy), fill=255)
+    else:
+        radius = min(width, height) / 2 * (1 - inset / 100)
+        cx, cy = (width - 1) / 2, (height - 1) / 2
+        draw.ellipse((cx - radius, cy - radius, cx + radius, cy + radius), fill=255)
+    return mask
+
+def detect_fov_mask(image):
+    """
+    Detect the illuminated field of view of a fundus image.
+
+    The dark border around the field of view is found on a small copy of the image,
+    cleaned up with a median filter and scaled back to full size.
+
+    Parameters:
+        image (PIL.Image): The loaded "RGB" or "I" image.
+
+    Returns:
+        PIL.Image: A binary "L" mask, or None if no field of view was found.
+    """
+    gray = to_display_image(image if image.mode == "I" else ImageOps.grayscale(image))
+    small = gray.copy()
+    small.thumbnail((256, 256))
+    level = max(small.getextrema()[1] * 0.1, 8)
+    small = small.point(lambda v: 255 if v > level else 0).filter(ImageFilter.MedianFilter(5))
+    mask = small.resize(image.size, Image.BILINEAR).point(lambda v: 255 if v >= 128 else 0)
+    if not mask.getbbox():
+        return None
+    return mask
+
+def roi_mask_key(file_path, size, mode, inset):
+    """
+    Return the key an ROI mask is shared under.
+
+    Images of the same size in the same folder come from the same camera, so they
+    share one mask; the automatic field of view does not use the inset.
+
+    Parameters:
+        file_path (str): Path of the image, or "" for an image without a file.
+        size (tuple): Width and height of the image.
+        mode (str): One of ROI_MODES.
+        inset (float): Percent of the frame left out around a rectangle or circle.
+
+    Returns:
+        tuple: (folder, size, mode, inset).
+    """
+    if mode == "Auto FOV":
+        inset = None
+    return (os.path.dirname(file_path) if file_path else "", size, mode, inset)
+
+def shared_roi_mask(image, file_path, mode, inset, roi_masks=None):
+    """
+    Return the ROI mask of an image, reusing masks within a folder, see roi_mask_key.
+
+    The cache may be shared between worker threads. A missing mask is built without
+    a lock; threads building the same one at once keep whichever is stored first.
+
+    Parameters:
+        image (PIL.Image): The loaded image, before inversion.
+        file_path (str): Path of the image.
+        mode (str): One of ROI_MODES.
+        inset (float): Percent of the frame left out around a rectangle or circle.
+        roi_masks (dict): Optional mask cache, keyed by roi_mask_key.
+
+    Returns:
+        PIL.Image: A binary "L" mask, or None for the full frame.
+    """
+    if mode not in ROI_MODES[1:]:
+        return None
+    key = roi_mask_key(file_path, image.size, mode, inset)
+    if roi_masks is not None and key in roi_masks:
+        return roi_masks[key]
+    mask = build_roi_mask(image, mode, key[3])
+    if roi_masks is not None:
+        mask = roi_masks.setdefault(key, mask)
+    return mask
+
+def apply_lut(image, lut):
+    """
+    Map an image through a lookup table at its native depth.
+
+    8-bit images use Image.point directly. Pillow can only map 16-bit data to 8-bit
+    output, so 16-bit images are mapped once for the high byte and once for the low
+    byte of the table, and the two results are recombined.
+
+    Parameters:
+        image (PIL.Image): An "L" or "I" image.
+        lut (list): 256 or 65536 output levels.
+
+    Returns:
+        PIL.Image: The mapped image, in the same mode as the input.
+    """
+    if image.mode != "I":
+        return image.point(lut)
+    high_lut, low_lut = _split_lut16(lut)
+    high = image.point(high_lut, "L")
+    low = image.point(low_lut, "L")
+    return _image_math_eval("convert(high, 'I') * 256 + convert(low, 'I')", high=high, low=low)
+
+_split_luts = OrderedDict()  # id of a 16-bit table to (table, high bytes, low bytes), least recently used first
+_split_luts_lock = threading.Lock()
+
+def _split_lut16(lut):
+    """
+    Split a 16-bit lookup table into the tables of its high and low bytes.
+
+    The same table objects recur between channels, outputs and slider positions
+    (see normalize_lut and build_stretch_lut), so splits are cached by identity;
+    each entry holds its table, so the id cannot be reused while cached.
+
+    Parameters:
+        lut (list): 65536 output levels. Tables are shared, so they are never modified.
+
+    Returns:
+        tuple: The high byte and low byte tables, as bytes.
+    """
+    with _split_luts_lock:
+        entry = _split_luts.get(id(lut))
+        if entry is not None and entry[0] is lut:
+            _split_luts.move_to_end(id(lut))
+            return entry[1:]
+    table = array.array("H", lut)
+    if sys.byteorder == "big":
+        table.byteswap()
+    data = table.tobytes()  # Little-endian: low byte first
+    split = (data[1::2], data[0::2])
+    with _split_luts_lock:
+        _split_luts[id(lut)] = (lut,) + split
+        while len(_split_luts) > 16:
+            _split_luts.popitem(last=False)
+    return split
+
+def reduce_lut16(lut):
+    """
+    Reduce a 16-bit lookup table to the 256-entry table of 8-bit previews.
+
+    Each 8-bit level stands for 256 16-bit levels; the table is sampled at their
+    centre and its output reduced to 8 bits.
+
+    Parameters:
+        lut (list): 65536 output levels.
+
+    Returns:
+        list: 256 output levels.
+    """
+    return [v >> 8 for v in lut[128::256]]
+
+@functools.lru_cache(maxsize=1)
+def _display_lut16():
+    """Lookup table reducing 16-bit levels to 8-bit for display."""
+    return [v >> 8 for v in range(HIGH_DEPTH_MAX + 1)]
+
+@functools.lru_cache(maxsize=1)
+def _low_byte_lut16():
+    """Lookup table extracting the low byte of 16-bit levels."""
+    return [v & 0xFF for v in range(HIGH_DEPTH_MAX + 1)]
+
+def to_display_image(image, lut=None):
+    """
+    Reduce an image to 8 bits for display, optionally through a lookup table first.
+
+    High-bit-depth images are reduced to their top 8 bits first, and the table to
+    256 entries (see reduce_lut16), so previews cost the same as for 8-bit images.
+
+    Parameters:
+        image (PIL.Image): An "L" or "I" image.
+        lut (list): Optional lookup table at the image's native depth.
+
+    Returns:
+        PIL.Image: An 8-bit image.
+    """
+    if image.mode == "I":
+        reduced = _image_math_eval("convert(image >> 8, 'L')", image=image)
+        if lut is None:
+            return reduced
+        return reduced.point(reduce_lut16(lut))
+    if lut is None:
+        return image
+    return image.point(lut)
+
+def fit_image(image, max_width, max_height):
+    """
+    Resize an image to fit within the specified dimensions while maintaining aspect ratio.
+
+    Parameters:
+        image (PIL.Image): The image to resize.
+        max_width (int): Maximum width in pixels.
+        max_height (int): Maximum height in pixels.
+
+    Returns:
+        PIL.Image: The resized image.
+    """
+    width, height = image.size
+    ratio = min(max_width / width, max_height / height)
+    new_size = (int(width * ratio), int(height * ratio))
+    pillow_version = tuple(map(int, PILLOW_VERSION.split('.')[:2]))
+    if pillow_version >= (10, 0):
+        resample_filter = Image.Resampling.LANCZOS
+    else:
+        resample_filter = Image.ANTIALIAS
+    return image.resize(new_size, resample=resample_filter)
+
+def invert_image(image):
+    """Invert an "RGB" or "I" image."""
+    if image.mode == "I":
+        return image.point(lambda v: HIGH_DEPTH_MAX - v)
+    return ImageOps.invert(image)
+
+def no_green_mix(red_coeff, blue_coeff):
+    """Return the built-in Grayscale No Green channel mix for the given coefficients."""
+    return {"name": NO_GREEN_MIX, "weights": (red_coeff, 0.0, blue_coeff), "offset": 0.0}
+
+def parse_channel_mixes(text):
+    """
+    Parse channel mix definitions, one per line.
+
+    A line is either "Name: red, green, blue[, offset]" for a weighted mix, with the
+    offset in 8-bit levels, or "Name: <space>" with one of MIX_SPACES.
+
+    Parameters:
+        text (str): The definitions.
+
+    Returns:
+        list: Channel mix dictionaries.
+
+    Raises:
+        ValueError: If a line is not valid or a name is used twice.
+    """
+    mixes = []
+    names = {NO_GREEN_MIX}
+    for line_number, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line:
+            continue
+        if ":" not in line:
+            raise ValueError(f"Line {line_number}: expected 'Name: definition'")
+        name, definition = (part.strip() for part in line.split(":", 1))
+        if not name or name in names:
+            raise ValueError(f"Line {line_number}: missing or duplicate name '{name}'")
+        names.add(name)
+        if definition in MIX_SPACES:
+            mixes.append({"name": name, "space": definition})
+            continue
+        try:
+            values = [float(value) for value in definition.split(",")]
+        except ValueError:
+            raise ValueError(f"Line {line_number}: '{definition}' is not a list of weights or a colour space")
+        if len(values) not in (3, 4):
+            raise ValueError(f"Line {line_number}: expected red, green, blue and an optional offset")
+        mixes.append({
+            "name": name,
+            "weights": tuple(values[:3]),
+            "offset": values[3] if len(values) == 4 else 0.0
+        })
+    return mixes
+
+def format_channel_mixes(mixes):
+    """Format channel mixes in the syntax read by parse_channel_mixes."""
+    lines = []
+    for mix in mixes:
+        if "space" in mix:
+            lines.append(f"{mix['name']}: {mix['space']}")
+        else:
+            values = [*mix["weights"], mix["offset"]]
+            lines.append(f"{mix['name']}: " + ", ".join(f"{value:g}" for value in values))
+    return "\n".join(lines)
+
+def mix_exceeds_range(mix):
+    """Return True if a weighted mix can produce values outside the 0-255 range."""
+    if "space" in mix:
+        return False
+    high = sum(weight for weight in mix["weights"] if weight > 0) * 255 + mix["offset"]
+    low = sum(weight for weight in mix["weights"] if weight < 0) * 255 + mix["offset"]
+    return high > 255.5 or low < -0.5
+
+@functools.lru_cache(maxsize=1)
+def _lab_transform():
+    """Build the sRGB to LAB colour transform (requires Pillow with littlecms)."""
+    from PIL import ImageCms
+    return ImageCms.buildTransformFromOpenProfiles(
+        ImageCms.createProfile("sRGB"), ImageCms.createProfile("LAB"), "RGB", "LAB"
+    )
+
+@functools.lru_cache(maxsize=1)
+def _lightness_lut16():
+    """Lookup table from 16-bit gray levels to CIE L*, scaled to 0-65535."""
+    lut = []
+    for v in range(HIGH_DEPTH_MAX + 1):
+        c = v / HIGH_DEPTH_MAX
+        linear = c / 12.92 if c <= 0.04045 else ((c + 0.055) / 1.055) ** 2.4
+        f = linear ** (1 / 3) if linear > 216 / 24389 else (24389 / 27 * linear + 16) / 116
+        lut.append(min(max(int((116 * f - 16) / 100 * HIGH_DEPTH_MAX + 0.5), 0), HIGH_DEPTH_MAX))
+    return lut
+
+def compute_channel_mixes(image, mixes):
+    """
+    Evaluate channel mixes over an image.
+
+    Weighted mixes are evaluated three at a time: each group is one matrix conversion
+    to a three-band image, so the RGB buffer is read once per three mixes instead of
+    once per mix. Mixes using the same colour space share one conversion.
+
+    Parameters:
+        image (PIL.Image): An "RGB" or single channel "I" image.
+        mixes (list): Channel mix dictionaries.
+
+    Returns:
+        dict: Mix name to "L" image, or "I" image for high-bit-depth input.
+    """
+    results = {}
+    if image.mode == "I":
+        # A single channel image has identical colour channels
+        for mix in mixes:
+            if "space" not in mix:
+                factor = sum(mix["weights"])
+                offset = mix["offset"] * 257  # Offsets are given in 8-bit levels
+                mixed = image.point(lambda v: v * factor + offset)
+                results[mix["name"]] = mixed.convert("I;16").convert("I")  # Clamp to 16 bits
+            elif mix["space"] == "LAB L*":
+                results[mix["name"]] = apply_lut(image, _lightness_lut16())
+            else:
+                results[mix["name"]] = image  # HSV V and YCbCr Y of a gray image are the gray level
+        return results
+
+    weighted = [mix for mix in mixes if "space" not in mix]
+    for start in range(0, len(weighted), 3):
+        group = weighted[start:start + 3]
+        matrix = []
+        for mix in group:
+            matrix.extend((*mix["weights"], mix["offset"]))
+        if len(group) == 1:
+            results[group[0]["name"]] = image.convert("L", tuple(matrix))
+        else:
+            matrix.extend((0.0,) * 4 * (3 - len(group)))
+            for mix, band in zip(group, image.convert("RGB", tuple(matrix)).split()):
+                results[mix["name"]] = band
+
+    converted = {}
+    for mix in mixes:
+        if "space" not in mix:
+            continue
+        space, band = MIX_SPACES[mix["space"]]
+        if space not in converted:
+            if space == "LAB":
+                from PIL import ImageCms
+                converted[space] = ImageCms.applyTransform(image, _lab_transform())
+            else:
+                converted[space] = image.convert(space)
+        results[mix["name"]] = converted[space].getchannel(band)
+    return results
+
+def split_channels(image):
+    """
+    Split a loaded image into its grayscale and colour channel images.
+
+    The colour bands come from a single split() of the image, so each band is copied
+    once. High-bit-depth images have a single band, which every channel refers to.
+
+    Parameters:
+        image (PIL.Image): An "RGB" or "I" image from open_image.
+
+    Returns:
+        dict: "gray", "green", "red" and "blue" channel images.
+    """
+    if image.mode == "I":
+        return {key: image for key in ("gray", "green", "red", "blue")}
+    red, green, blue = image.split()
+    return {"gray": ImageOps.grayscale(image), "green": green, "red": red, "blue": blue}
+
+def extract_channel(image, key, mix=None):
+    """
+    Extract one of the five channel images from a loaded image.
+
+    Parameters:
+        image (PIL.Image): An "RGB" or "I" image from open_image.
+        key (str): One of CHANNEL_KEYS.
+        mix (dict): Channel mix shown in the "gray_no_g" column, Grayscale No Green by default.
+
+    Returns:
+        PIL.Image: An "L" or "I" image.
+    """
+    if key == "gray_no_g":
+        mix = mix or no_green_mix(0.5, 0.5)
+        return compute_channel_mixes(image, [mix])[mix["name"]]
+    if image.mode == "I":
+        return image  # Single channel images have identical colour channels
+    if key == "gray":
+        return ImageOps.grayscale(image)
+    return image.getchannel({"red": "R", "green": "G", "blue": "B"}[key])
+
+def normalization_bounds(histogram, cutoff=(0.0, 0.0), ignore=None):
+    """
+    Find the intensity bounds used for autocontrast normalization.
+
+    Mirrors ImageOps.autocontrast, but works on an already computed histogram so
+    the cutoff and ignore values can change without rescanning the pixels.
+
+    Parameters:
+        histogram (list): Pixel counts per intensity level.
+        cutoff (tuple): Percent of pixels to discard from the low and high ends.
+        ignore (iterable): Intensity levels to leave out of the histogram.
+
+    Returns:
+        tuple: The (low, high) bounds, or None if there is nothing to stretch.
+    """
+    h = list(histogram)
+    levels = len(h)
+    for value in ignore or ():
+        if 0 <= value < levels:
+            h[value] = 0
+
+    total = sum(h)
+    # Remove cutoff% of the pixels from the low end
+    cut = int(total * cutoff[0] // 100)
+    for lo in range(levels):
+        if cut > h[lo]:
+            cut -= h[lo]
+            h[lo] = 0
+        else:
+            h[lo] -= cut
+            cut = 0
+        if cut <= 0:
+            break
+    # Remove cutoff% of the pixels from the high end
+    cut = int(total * cutoff[1] // 100)
+    for hi in range(levels - 1, -1, -1):
+        if cut > h[hi]:
+            cut -= h[hi]
+            h[hi] = 0
+        else:
+            h[hi] -= cut
+            cut = 0
+        if cut <= 0:
+            break
+
+    # Find the lowest and highest remaining levels
+    lo = next((ix for ix in range(levels) if h[ix]), levels)
+    hi = next((ix for ix in range(levels - 1, -1, -1) if h[ix]), -1)
+    if hi <= lo:
+        return None
+    return lo, hi
+
+@functools.lru_cache(maxsize=32)
+def normalize_lut(bounds, levels=256):
+    """
+    Build the lookup table that stretches the given bounds to the full range.
+
+    Parameters:
+        bounds (tuple): The (low, high) bounds from normalization_bounds, or None.
+        levels (int): Number of intensity levels in the image.
+
+    Returns:
+        list: The lookup table, the identity mapping if bounds is None. Tables are
+        cached and shared, so callers must not modify them.
+    """
+    if bounds is None:
+        return list(range(levels))
+    lo, hi = bounds
+    scale = (levels - 1) / (hi - lo)
+    offset = -lo * scale
+    # int(ix * scale + offset) for every level, as ImageOps.autocontrast computes it. Off the
+    # exact integer levels it equals the integer division, built without a per-level loop
+    span = hi - lo
+    ramp = list(map(operator.floordiv, range(0, (span + 1) * (levels - 1), levels - 1), itertools.repeat(span)))
+    for k in range(0, span + 1, span // math.gcd(span, levels - 1)):
+        ramp[k] = int((lo + k) * scale + offset)  # Exact in theory, where rounding can land just below
+    return [0] * lo + ramp + [levels - 1] * (levels - 1 - hi)
+
+def compose_luts(first, second):
+    """
+    Combine two lookup tables into one applying the first, then the second.
+
+    Parameters:
+        first (list): Table applied first.
+        second (list): Table applied to the output of the first.
+
+    Returns:
+        list: The combined table, with as many entries as the first.
+    """
+    return list(map(second.__getitem__, first))
+
+# Registered stretch curves: name -> {"build", "uses_histogram", "default"}
+STRETCH_CURVES = {}
+
+def register_stretch_curve(name, default="", uses_histogram=False):
+    """
+    Register a stretch curve under a name.
+
+    The decorated function receives the number of levels between the thresholds minus
+    one (the span), the user parameter string, and, for curves using the histogram, the
+    pixel counts of those levels. It returns span + 1 output fractions between 0 and 1,
+    and raises ValueError for an invalid parameter.
+
+    Parameters:
+        name (str): Name shown in the curve selector.
+        default (str): Default parameter string.
+        uses_histogram (bool): Whether the curve depends on the channel histogram.
+    """
+    def decorator(build):
+        STRETCH_CURVES[name] = {"build": build, "uses_histogram": uses_histogram, "default": default}
+        return build
+    return decorator
+
+@register_stretch_curve("Linear")
+def linear_curve(span, parameter, counts):
+    """Straight ramp between the thresholds."""
+    return [i / span for i in range(span + 1)]
+
+@register_stretch_curve("Gamma", default="0.5")
+def gamma_curve(span, parameter, counts):
+    """Power curve; values below 1 brighten the mid-tones, above 1 darken them."""
+    gamma = float(parameter)
+    if gamma <= 0:
+        raise ValueError("Gamma must be positive")
+    return [(i / span) ** gamma for i in range(span + 1)]
+
+@register_stretch_curve("Sigmoid", default="10")
+def sigmoid_curve(span, parameter, counts):
+    """S-shaped curve centred between the thresholds; the parameter is its gain."""
+    gain = float(parameter)
+    if not 0 < gain < math.inf:
+        raise ValueError("Sigmoid gain must be a positive number")
+
+    def logistic(x):
+        """Logistic function, in a form whose exponent never overflows."""
+        if x >= 0:
+            return 1 / (1 + math.exp(-x))
+        return math.exp(x) / (1 + math.exp(x))
+
+    low = logistic(-gain / 2)
+    high = logistic(gain / 2)
+    if high <= low:
+        return [i / span for i in range(span + 1)]  # Gain too small to bend the line
+    return [(logistic(gain * (i / span - 0.5)) - low) / (high - low) for i in range(span + 1)]
+
+@register_stretch_curve("Piecewise", default="0.25:0.1, 0.75:0.9")
+def piecewise_curve(span, parameter, counts):
+    """Straight segments through "input:output" control points between 0 and 1."""
+    points = [(0.0, 0.0), (1.0, 1.0)]
+    for token in parameter.split(","):
+        if token.strip():
+            x, y = (float(value) for value in token.split(":"))
+            if not (0 <= x <= 1 and 0 <= y <= 1):
+                raise ValueError("Control points must be between 0 and 1")
+            points.append((x, y))
+    points.sort()
+    fractions = []
+    segment = 0
+    for i in range(span + 1):
+        t = i / span
+        while segment < len(points) - 2 and t > points[segment + 1][0]:
+            segment += 1
+        (x0, y0), (x1, y1) = points[segment], points[segment + 1]
+        fractions.append(y0 if x1 == x0 else y0 + (t - x0) * (y1 - y0) / (x1 - x0))
+    return fractions
+
+@register_stretch_curve("Equalize", default="2.0", uses_histogram=True)
+def equalize_curve(span, parameter, counts):
+    """
+    Contrast-limited histogram equalization of the levels between the thresholds.
+
+    The parameter is the clip limit as a multiple of the mean count per level; counts
+    above it are spread evenly over all levels, as in CLAHE. 0 disables the limit.
+    """
+    clip_limit = float(parameter)
+    if clip_limit < 0:
+        raise ValueError("Clip limit must not be negative")
+    counts = list(counts)
+    total = sum(counts)
+    if not total:
+        return linear_curve(span, parameter, counts)
+    if clip_limit:
+        ceiling = clip_limit * total / len(counts)
+        excess = sum(max(count - ceiling, 0) for count in counts)
+        counts = [min(count, ceiling) + excess / len(counts) for count in counts]
+    fractions = []
+    cumulative = 0
+    for count in counts:
+        cumulative += count
+        fractions.append(cumulative / total)
+    return fractions
+
+@functools.lru_cache(maxsize=32)
+def build_stretch_lut(lower_threshold, upper_threshold, inverse_lower, inverse_upper, max_value=255,
+                      curve="Linear", parameter="", counts=None):
+    """
+    Build the stretch lookup table between two thresholds.
+
+    Tables are cached by their arguments, so the five channels share one table and
+    returning to a slider position reuses it. Callers must not modify the result.
+
+    Parameters:
+        lower_threshold (int): The lower threshold value.
+        upper_threshold (int): The upper threshold value.
+        inverse_lower (bool): Whether to invert the lower clipping.
+        inverse_upper (bool): Whether to invert the upper clipping.
+        max_value (int): Largest intensity level, 255 or 65535.
+        curve (str): Name of a registered stretch curve.
+        parameter (str): Parameter of the curve.
+        counts (tuple): Histogram of the stretched image, for curves using it.
+
+    Returns:
+        list: The lookup table with max_value + 1 entries.
+
+    Raises:
+        ValueError: If the curve parameter is not valid.
+    """
+    if upper_threshold == lower_threshold:
+        # Equal thresholds binarize the image
+        return [0] * lower_threshold + [max_value] * (max_value + 1 - lower_threshold)
+    elif upper_threshold < lower_threshold:
+        lower_threshold, upper_threshold = upper_threshold, lower_threshold
+
+    below = max_value if inverse_lower else 0
+    above = 0 if inverse_upper else max_value
+    span = upper_threshold - lower_threshold
+    if curve == "Linear":
+        # Exact integer ramp, identical to the original linear stretch, built without a per-level loop
+        ramp = list(map(operator.floordiv, range(0, (span + 1) * max_value, max_value), itertools.repeat(span)))
+    else:
+        section = counts[lower_threshold:upper_threshold + 1] if counts else None
+        fractions = STRETCH_CURVES[curve]["build"](span, parameter, section)
+        ramp = [min(max(int(f * max_value + 1e-9), 0), max_value) for f in fractions]
+    return [below] * lower_threshold + ramp + [above] * (max_value - upper_threshold)
+
+@functools.lru_cache(maxsize=1)
+def worker_pool():
+    """Return the shared thread pool used to process image tiles in parallel."""
+    return ThreadPoolExecutor(max_workers=os.cpu_count() or 1)
+
+def clip_histogram(histogram, clip_limit):
+    """
+    Clip a histogram at a multiple of its mean count and spread the excess evenly.
+
+    Parameters:
+        histogram (list): Pixel counts per level.
+        clip_limit (float): Ceiling as a multiple of the mean count; 0 disables clipping.
+
+    Returns:
+        list: The clipped counts.
+    """
+    if clip_limit <= 0:
+        return histogram
+    total = sum(histogram)
+    ceiling = max(clip_limit * total / len(histogram), 1)
+    excess = sum(max(count - ceiling, 0) for count in histogram)
+    return [min(count, ceiling) + excess / len(histogram) for count in histogram]
+
+def _clahe_bands(count, length):
+    """
+    Split one axis into interpolation bands between tile centres.
+
+    Each band is (start, end, low tile, high tile, weights), where weights holds the
+    0-255 blend weight of the high tile per pixel, or None at the borders where both
+    tiles are the same.
+    """
+    size = length / count
+    centres = [(k + 0.5) * size for k in range(count)]
+    starts = [0] + [math.ceil(centre - 0.5) for centre in centres] + [length]
+    bands = []
+    for k in range(count + 1):
+        start, end = starts[k], starts[k + 1]
+        if end <= start:
+            continue
+        low, high = max(k - 1, 0), min(k, count - 1)
+        weights = None
+        if low != high:
+            weights = [min(max(round(255 * (x + 0.5 - centres[low]) / size), 0), 255) for x in range(start, end)]
+        bands.append((start, end, low, high, weights))
+    return bands
+
+def _render_clahe_cell(index_image, tables, mode, x_band, y_band):
+    """Map one cell through its four neighbouring tile tables and blend them bilinearly."""
+    x0, x1, x_low, x_high, x_weights = x_band
+    y0, y1, y_low, y_high, y_weights = y_band
+    region = index_image.crop((x0, y0, x1, y1))
+
+    def blend_row(j):
+        """Blend the left and right tiles of tile row j."""
+        left = region.point(tables[(x_low, j)], mode)
+        if x_weights is None:
+            return left
+        mask = Image.frombytes("L", (len(x_weights), 1), bytes(x_weights)).resize(region.size, Image.NEAREST)
+        return Image.composite(region.point(tables[(x_high, j)], mode), left, mask)
+
+    top = blend_row(y_low)
+    if y_weights is None:
+        return top
+    mask = Image.frombytes("L", (1, len(y_weights)), bytes(y_weights)).resize(region.size, Image.NEAREST)
+    return Image.composite(blend_row(y_high), top, mask)
+
+def _interpolate_tiles(index_image, tables, mode, grid_x, grid_y, run):
+    """Map an 8-bit index image through per-tile tables with bilinear interpolation."""
+    width, height = index_image.size
+    cells = [
+        (x_band, y_band)
+        for y_band in _clahe_bands(grid_y, height)
+        for x_band in _clahe_bands(grid_x, width)
+    ]
+    rendered = run(lambda cell: _render_clahe_cell(index_image, tables, mode, *cell), cells)
+    output = Image.new(mode or index_image.mode, index_image.size)
+    for (x_band, y_band), cell_image in zip(cells, rendered):
+        output.paste(cell_image, (x_band[0], y_band[0]))
+    return output
+
+def clahe(image, clip_limit=2.0, grid=8, executor=None):
+    """
+    Apply contrast-limited adaptive histogram equalization (CLAHE).
+
+    The image is divided into grid x grid tiles. Each tile gets a clipped equalization
+    table from its own histogram, and every pixel is mapped through the tables of the
+    four nearest tiles, blended bilinearly. Tile histograms and the mapping of each
+    interpolation cell run on the executor when one is given.
+
+    16-bit images are indexed by their high byte: each tile table gives the start and
+    the width of the output range of every high-byte bin, and the low byte interpolates
+    within it, so the output keeps the full 16-bit precision.
+
+    Parameters:
+        image (PIL.Image): An "L" or "I" image.
+        clip_limit (float): Histogram ceiling as a multiple of the mean count; 0 disables it.
+        grid (int): Number of tiles along each axis.
+        executor (concurrent.futures.Executor): Optional executor for the tiles.
+
+    Returns:
+        PIL.Image: The enhanced image, in the same mode as the input.
+    """
+    width, height = image.size
+    grid_x, grid_y = min(grid, width), min(grid, height)
+    run = executor.map if executor else map
+    high_depth = image.mode == "I"
+    index_image = image.point(_display_lut16(), "L") if high_depth else image
+    max_value = max_value_of(image)
+
+    tiles = [(i, j) for j in range(grid_y) for i in range(grid_x)]
+
+    def tile_counts(tile):
+        """Clipped histogram of one tile."""
+        i, j = tile
+        box = (i * width // grid_x, j * height // grid_y, (i + 1) * width // grid_x, (j + 1) * height // grid_y)
+        return clip_histogram(index_image.crop(box).histogram(), clip_limit)
+
+    starts, widths = {}, {}
+    for tile, counts in zip(tiles, run(tile_counts, tiles)):
+        total = sum(counts) or 1
+        cumulative = 0
+        starts[tile], widths[tile] = [], []
+        for count in counts:
+            starts[tile].append(int(cumulative * max_value / total + 0.5))
+            cumulative += count
+            widths[tile].append(int(cumulative * max_value / total + 0.5) - starts[tile][-1])
+
+    if not high_depth:
+        tables = {tile: [start + width for start, width in zip(starts[tile], widths[tile])] for tile in tiles}
+        return _interpolate_tiles(index_image, tables, None, grid_x, grid_y, run)
+
+    start_image = _interpolate_tiles(index_image, starts, "I", grid_x, grid_y, run)
+    width_image = _interpolate_tiles(index_image, widths, "I", grid_x, grid_y, run)
+    low = image.point(_low_byte_lut16(), "L")
+    return _image_math_eval(
+        "convert(start + width * (convert(low, 'F') + 0.5) / 256.0, 'I')",
+        start=start_image, width=width_image, low=low
+    )
+
+def remap_histogram(histogram, lut, bins=256):
+    """
+    Compute the histogram of an image after a lookup table, without touching pixels.
+
+    Parameters:
+        histogram (list): Pixel counts per level of the source image.
+        lut (list): Lookup table applied to the source image.
+        bins (int): Number of bins of the result.
+
+    Returns:
+        list: Pixel counts of the mapped image, reduced to the given number of bins.
+    """
+    levels = len(histogram)
+    remapped = [0] * bins
+    for value, count in enumerate(histogram):
+        if count:
+            remapped[lut[value] * bins // levels] += count
+    return remapped
+
+def parse_ignore_values(text):
+    """
+    Parse the ignore values entry into per-channel lists.
+
+    Values are separated by commas. A bare value applies to every channel, while
+    "channel:value" (e.g. "green:0") applies to one of CHANNEL_KEYS only.
+
+    Parameters:
+        text (str): The entry text.
+
+    Returns:
+        dict: Channel key to list of ignored intensity levels.
+
+    Raises:
+        ValueError: If a value or channel name is not valid.
+    """
+    ignore = {key: [] for key in CHANNEL_KEYS}
+    for token in text.split(","):
+        token = token.strip()
+        if not token:
+            continue
+        if ":" in token:
+            key, value = (part.strip() for part in token.split(":", 1))
+            if key not in ignore:
+                raise ValueError(f"Unknown channel '{key}'")
+            keys = [key]
+        else:
+            value = token
+            keys = CHANNEL_KEYS
+        for key in keys:
+            ignore[key].append(int(value))
+    return ignore
+
+def scale_thresholds(lower, upper, from_max, to_max):
+    """
+    Rescale thresholds set against one maximum level to another, keeping lower < upper.
+
+    Parameters:
+        lower (int): Lower threshold.
+        upper (int): Upper threshold.
+        from_max (int): Maximum level the thresholds were set against.
+        to_max (int): Maximum level of the image they apply to.
+
+    Returns:
+        tuple: The rescaled (lower, upper) thresholds.
+    """
+    scale = to_max / from_max
+    lower = min(max(round(lower * scale), 0), to_max - 1)
+    upper = max(min(round(upper * scale), to_max), lower + 1)
+    return lower, upper
+
+def save_output(image, file_path, output_format=None):
+    """
+    Save an output image, keeping 16 bits where the file format supports it.
+
+    Parameters:
+        image (PIL.Image): The image to save.
+        file_path (str or file): Destination path, or a binary file object.
+        output_format (str): One of OUTPUT_FORMATS; defaults to the path's extension.
+    """
+    if output_format is None:
+        output_format = os.path.splitext(file_path)[1].lower().lstrip(".")
+    output_format = {"jpeg": "jpg", "tiff": "tif"}.get(output_format, output_format)
+    if image.mode == "I":
+        if output_format in ("png", "tif"):
+            image = image.convert("I;16")  # Keep the full 16-bit precision
+        else:
+            image = to_display_image(image)  # Format only supports 8 bits
+    image.save(file_path, format={"png": "PNG", "jpg": "JPEG", "bmp": "BMP", "tif": "TIFF"}.get(output_format))
+
+def validate_recipe(recipe):
+    """
+    Check a recipe and fill in the settings it leaves out with their defaults.
+
+    Parameters:
+        recipe (dict): Recipe settings, as read from a recipe file.
+
+    Returns:
+        dict: The complete recipe.
+
+    Raises:
+        ValueError: If a setting is unknown or does not hold a valid value.
+    """
+    unknown = set(recipe) - set(DEFAULT_RECIPE)
+    if unknown:
+        raise ValueError(f"Unknown recipe settings: {', '.join(sorted(unknown))}")
+    version = recipe.get("version", RECIPE_VERSION)
+    if not isinstance(version, int) or isinstance(version, bool):
+        raise ValueError("Recipe setting 'version' should be of type int")
+    if version > RECIPE_VERSION:
+        raise ValueError(f"Recipe version {recipe['version']} is newer than this application supports")
+
+    complete = dict(DEFAULT_RECIPE)
+    for name, value in recipe.items():
+        default = DEFAULT_RECIPE[name]
+        if isinstance(default, bool):
+            valid = isinstance(value, bool)
+        elif isinstance(default, (int, float)):
+            valid = isinstance(value, (int, float)) and not isinstance(value, bool)
+        else:
+            valid = isinstance(value, type(default))
+        if not valid:
+            raise ValueError(f"Recipe setting '{name}' should be of type {type(default).__name__}")
+        complete[name] = value
+
+    for name, (low, high) in RECIPE_RANGES.items():
+        if not low <= complete[name] <= high:
+            raise ValueError(f"Recipe setting '{name}' should be between {low} and {high}")
+    parse_ignore_values(complete["ignore_values"])
+    mixes = parse_channel_mixes(complete["channel_mixes"])
+    if complete["selected_mix"] not in [NO_GREEN_MIX] + [mix["name"] for mix in mixes]:
+        raise ValueError(f"Unknown channel mix '{complete['selected_mix']}'")
+    if complete["curve"] not in STRETCH_CURVES:
+        raise ValueError(f"Unknown stretch curve '{complete['curve']}'")
+    curve = STRETCH_CURVES[complete["curve"]]
+    if not complete["curve_parameter"].strip():
+        complete["curve_parameter"] = curve["default"]
+    try:
+        # Build a table once so an invalid parameter is reported before any image is processed
+        counts = (1,) * 256 if curve["uses_histogram"] else None
+        build_stretch_lut(0, 255, False, False, 255, complete["curve"], complete["curve_parameter"], counts)
+    except ValueError as e:
+        raise ValueError(f"Invalid {complete['curve']} curve parameter: {e}") from e
+    if complete["roi_mode"] not in ROI_MODES:
+        raise ValueError(f"Unknown ROI mode '{complete['roi_mode']}'")
+    if not all(isinstance(output, str) for output in complete["outputs"]):
+        raise ValueError("Recipe setting 'outputs' should be a list of output names")
+    unknown = set(complete["outputs"]) - set(OUTPUT_NAMES)
+    if unknown:
+        raise ValueError(f"Unknown outputs: {', '.join(sorted(unknown))}")
+    if complete["output_format"] not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format '{complete['output_format']}'")
+    if complete["threshold_max"] < 1:
+        raise ValueError("Recipe setting 'threshold_max' should be at least 1")
+    return complete
+
+def load_recipe(file_path):
+    """
+    Read and validate a recipe file.
+
+    Parameters:
+        file_path (str): Path of the JSON recipe.
+
+    Returns:
+        dict: The complete recipe.
+
+    Raises:
+        ValueError: If the file is not valid JSON or holds an invalid recipe.
+    """
+    with open(file_path, encoding="utf-8") as f:
+        try:
+            recipe = json.load(f)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Not a valid recipe file: {e}") from e
+    if not isinstance(recipe, dict):
+        raise ValueError("Not a valid recipe file: expected a JSON object")
+    return validate_recipe(recipe)
+
+def save_recipe(recipe, file_path):
+    """
+    Write a recipe file.
+
+    Parameters:
+        recipe (dict): The recipe settings.
+        file_path (str): Path of the JSON recipe.
+    """
+    with open(file_path, "w", encoding="utf-8") as f:
+        json.dump(recipe, f, indent=4)
+        f.write("\n")
+
+def recipe_mix(recipe):
+    """Return the channel mix a recipe selects for the last column."""
+    if recipe["selected_mix"] == NO_GREEN_MIX:
+        return no_green_mix(recipe["red_coefficient"], recipe["blue_coefficient"])
+    mixes = parse_channel_mixes(recipe["channel_mixes"])
+    return next(mix for mix in mixes if mix["name"] == recipe["selected_mix"])
+
+def process_recipe(image, recipe, file_path="", roi_masks=None, temporal=None):
+    """
+    Produce the outputs a recipe selects from an image, without the GUI.
+
+    This runs the same stages as the application: inversion, region of interest,
+    channel extraction, normalization, local contrast enhancement and the custom
+    stretch. Only the channels and stages the selected outputs need are computed.
+
+    Parameters:
+        image (PIL.Image): Image as returned by open_image.
+        recipe (dict): A complete recipe, see validate_recipe.
+        file_path (str): Path of the image, used to share ROI masks within a folder.
+        roi_masks (dict): Optional ROI mask cache shared between images.
+        temporal (TemporalNormalizer): Normalization state carried across the frames of a video.
+
+    Returns:
+        dict: Output name to full-resolution image, in recipe order.
+    """
+    source = invert_image(image) if recipe["invert_before"] else image
+    inset = min(max(recipe["roi_inset"], 0.0), 45.0)
+    mask = shared_roi_mask(image, file_path, recipe["roi_mode"], inset, roi_masks)
+    # Auto FOV finds no field of view in a blank image; it is then processed in full
+    bbox = mask.getbbox() if mask is not None and recipe["roi_crop"] else None
+    if bbox:
+        source = source.crop(bbox)
+        mask = mask.crop(bbox)
+
+    max_value = max_value_of(source)
+    cutoff = (recipe["low_cutoff"], recipe["high_cutoff"])
+    ignore_values = parse_ignore_values(recipe["ignore_values"])
+    lower, upper = scale_thresholds(
+        recipe["lower_threshold"], recipe["upper_threshold"], recipe["threshold_max"], max_value
+    )
+    clahe_settings = None
+    if recipe["local_contrast"]:
+        clahe_settings = (
+            min(max(recipe["local_contrast_clip"], 0.0), 10.0),
+            min(max(int(recipe["local_contrast_grid"]), 1), 32)
+        )
+
+    channels = {}
+
+    def channel(key):
+        """Extract a channel once, however many outputs use it, as the application does."""
+        if key not in channels:
+            # The channel mix applies to high-bit-depth images too, like the mix column of the GUI
+            channels[key] = extract_channel(source, key, recipe_mix(recipe) if key == "gray_no_g" else None)
+        return channels[key]
+
+    # High-bit-depth images have a single band shared by several channels, so the work
+    # below is cached per distinct image and table rather than per channel. Entries
+    # hold on to the objects they are keyed by, so their ids are not reused.
+    histograms = {}
+    normalized = {}
+
+    def normalize(key):
+        """Compute a channel's histogram and normalization table once."""
+        if key not in normalized:
+            band = channel(key)
+            if id(band) not in histograms:
+                histograms[id(band)] = (band, channel_histogram(band, mask))
+            histogram = histograms[id(band)][1]
+            bounds = normalization_bounds(histogram, cutoff, ignore_values[key])
+            if temporal is not None:
+                bounds = temporal.smooth(key, bounds)
+            normalized[key] = (histogram, bounds, normalize_lut(bounds, max_value + 1))
+        return normalized[key]
+
+    mapped = {}
+
+    def map_image(image, lut):
+        """Map an image through a table once, however many outputs share both."""
+        if (id(image), id(lut)) not in mapped:
+            mapped[id(image), id(lut)] = (image, lut, apply_lut(image, lut))
+        return mapped[id(image), id(lut)][2]
+
+    combined = {}
+
+    def combine(lut, stretch_lut):
+        """Compose the normalization and stretch tables once per pair."""
+        if (id(lut), id(stretch_lut)) not in combined:
+            combined[id(lut), id(stretch_lut)] = (lut, stretch_lut, compose_luts(lut, stretch_lut))
+        return combined[id(lut), id(stretch_lut)][2]
+
+    enhanced = {}
+
+    def normalized_image(key):
+        """Normalize a channel, and enhance its local contrast when the recipe asks for it."""
+        image = map_image(channel(key), normalize(key)[2])
+        if clahe_settings is None:
+            return image
+        if id(image) not in enhanced:
+            enhanced[id(image)] = (image, clahe(image, *clahe_settings, executor=worker_pool()))
+        return enhanced[id(image)][1]
+
+    outputs = {}
+    for name in recipe["outputs"]:
+        key, row = name.rsplit("_", 1)
+        if row == "image":
+            outputs[name] = channel(key)
+            continue
+        histogram, bounds, lut = normalize(key)
+        if row == "normalized":
+            outputs[name] = normalized_image(key)
+            continue
+        counts = None
+        if STRETCH_CURVES[recipe["curve"]]["uses_histogram"]:
+            counts = tuple(remap_histogram(histogram, lut, max_value + 1))
+        stretch_lut = build_stretch_lut(
+            lower, upper, recipe["inverse_lower"], recipe["inverse_upper"], max_value,
+            recipe["curve"], recipe["curve_parameter"], counts
+        )
+        if clahe_settings is not None:
+            outputs[name] = map_image(normalized_image(key), stretch_lut)
+        elif temporal is not None and counts is None:
+            # The recipe is fixed for a video, so the combined table only changes with the bounds
+            outputs[name] = map_image(channel(key), temporal.table(
+                (bounds, max_value), lambda: combine(lut, stretch_lut)
+            ))
+        else:
+            # Without local contrast, normalization and stretch combine into one table
+            outputs[name] = map_image(channel(key), combine(lut, stretch_lut))
+    return outputs
+
+def collect_images(paths):
+    """
+    Expand files and folders into a sorted list of supported image files.
+
+    Parameters:
+        paths (list): Image files and folders.
+
+    Returns:
+        list: Paths of the image files.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(
+                os.path.join(path, f) for f in os.listdir(path)
+                if f.lower().endswith(IMAGE_EXTENSIONS)
+            ))
+        else:
+            files.append(path)
+    return files
+
+def write_outputs(outputs, prefix, output_dir, output_format):
+    """
+    Save processed outputs as <prefix>_<output name>.<format> in a folder.
+
+    Each output is first written under a hidden name and then renamed, so programs
+    watching the output folder never see a partially written file.
+
+    Parameters:
+        outputs (dict): Output name to image.
+        prefix (str): Start of the file names, usually the image's name.
+        output_dir (str): Folder the outputs are written to.
+        output_format (str): One of OUTPUT_FORMATS.
+    """
+    for name, output in outputs.items():
+        file_name = f"{prefix}_{name}.{output_format}"
+        partial_path = os.path.join(output_dir, f".{file_name}")
+        save_output(output, partial_path)
+        os.replace(partial_path, os.path.join(output_dir, file_name))
+
+def process_file(path, recipe, output_dir, roi_masks=None, frame=None):
+    """
+    Apply a recipe to one image file and save the selected outputs.
+
+    Outputs are written as <image name>_<output name>.<format> in the output folder,
+    or <image name>_p<page>_<output name>.<format> for the pages of a multi-page file,
+    with pages numbered from 1, see write_outputs.
+
+    Parameters:
+        path (str): Path of the image.
+        recipe (dict): A complete recipe, see validate_recipe.
+        output_dir (str): Folder the outputs are written to.
+        roi_masks (dict): Optional ROI mask cache shared between images.
+        frame (int): Zero-based page to process; by default every page is streamed in order.
+
+    Returns:
+        bool: True if the image was processed, False if it failed.
+    """
+    try:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        if frame is not None:
+            pages = [(frame, open_image(path, frame))]
+        elif frame_count(path) > 1:
+            pages = enumerate(iter_frames(path))
+        else:
+            pages = [(None, open_image(path))]
+        for page, image in pages:
+            outputs = process_recipe(image, recipe, path, roi_masks)
+            prefix = stem if page is None else f"{stem}_p{page + 1:04d}"
+            write_outputs(outputs, prefix, output_dir, recipe["output_format"])
+        logging.info(f"Processed {path}" if frame is None else f"Processed page {frame + 1} of {path}")
+        return True
+    except Exception as e:
+        logging.error(f"Failed to process {path} with error: {e}")
+        print(f"Failed to process {path}: {e}", file=sys.stderr)
+        return False
+
+def run_batch(recipe, paths, output_dir, workers=None):
+    """
+    Apply a recipe to many images and save the selected outputs, without the GUI.
+
+    Images, and the pages of multi-page files, are processed in parallel. Each page is
+    decoded by the task processing it, so only as many pages as there are workers are
+    held in memory. A failing image is logged and skipped.
+
+    Parameters:
+        recipe (dict): A complete recipe, see validate_recipe.
+        paths (list): Image files and folders.
+        output_dir (str): Folder the outputs are written to.
+        workers (int): Number of pages processed at once; defaults to the CPU count.
+
+    Returns:
+        tuple: Number of images processed and number of images that failed.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    roi_masks = {}  # Images of a folder share their ROI mask, as in the application
+    files = collect_images(paths)
+    tasks = []
+    for path in files:
+        try:
+            count = frame_count(path)
+        except Exception:
+            count = 1  # Unreadable files fail, and are reported, when processed
+        # Single-page files keep their plain output names
+        tasks.extend([(path, None)] if count == 1 else [(path, frame) for frame in range(count)])
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as executor:
+        results = list(executor.map(
+            lambda task: process_file(task[0], recipe, output_dir, roi_masks, task[1]),
+            tasks
+        ))
+    failed = {path for (path, frame), success in zip(tasks, results) if not success}
+    return len(files) - len(failed), len(failed)
+
+class FolderWatcher:
+    """
+    Process images as they are dropped into a folder, without the GUI.
+
+    The folder is polled rather than watched through OS notifications, which works the
+    same on every platform and on network shares. A file is only queued once its size
+    and modification time stayed the same for a number of polls, so files still being
+    copied in are left alone. Queued files go through a bounded queue to a fixed number
+    of worker threads; when the queue is full, ready files wait on disk for a later poll
+    instead of piling up in memory. Throughput and queue depth are reported periodically.
+    """
+    def __init__(self, recipe, folder, output_dir, workers=None, queue_size=16, interval=1.0,
+                 settle=2, include_existing=False, metrics_interval=10.0, max_attempts=3):
+        """
+        Parameters:
+            recipe (dict): A complete recipe, see validate_recipe.
+            folder (str): Folder to watch.
+            output_dir (str): Folder the outputs are written to; must differ from folder.
+            workers (int): Number of worker threads; defaults to the CPU count.
+            queue_size (int): Maximum number of files waiting for a worker.
+            interval (float): Seconds between polls of the folder.
+            settle (int): Polls a file must stay unchanged before it is processed.
+            include_existing (bool): Also process the files present at startup.
+            metrics_interval (float): Seconds between metrics reports.
+            max_attempts (int): Times a file that fails to process is tried.
+        """
+        if os.path.abspath(folder) == os.path.abspath(output_dir):
+            raise ValueError("The output folder must differ from the watched folder")
+        self.recipe = recipe
+        self.folder = folder
+        self.output_dir = output_dir
+        self.workers = workers or os.cpu_count() or 1
+        self.interval = interval
+        self.settle = settle
+        self.metrics_interval = metrics_interval
+        self.max_attempts = max_attempts
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()  # Guards the state shared with the worker threads
+        self.roi_masks = {}  # Images of the folder share their ROI mask
+        self.pending = {}  # Path to (size and modification time, polls unchanged)
+        self.queued = set()  # Paths queued or processed, not to be queued again
+        self.attempts = {}  # Path to the number of failed attempts
+
+        # Metrics
+        self.processed = 0
+        self.failed = 0
+        self.deferred = 0  # Polls that left ready files on disk because the queue was full
+        self.peak_depth = 0
+        self.busy_time = 0.0  # Seconds spent processing, summed over workers
+        self.last_report = (time.perf_counter(), 0)
+
+        if not include_existing:
+            self.queued.update(self.list_images())
+
+    def list_images(self):
+        """Return the supported image files of the folder, skipping hidden files."""
+        try:
+            names = os.listdir(self.folder)
+        except OSError as e:
+            logging.error(f"Failed to list {self.folder} with error: {e}")
+            return []
+        return [
+            os.path.join(self.folder, name) for name in sorted(names)
+            if not name.startswith(".") and name.lower().endswith(IMAGE_EXTENSIONS)
+        ]
+
+    def scan(self):
+        """Queue the files that finished being written since the last poll."""
+        paths = self.list_images()
+        present = set(paths)  # Membership tests stay constant time in large folders
+        with self.lock:
+            # Forget removed files, so a new file with the same name is processed again
+            self.queued.intersection_update(present)
+            self.pending = {path: state for path, state in self.pending.items() if path in present}
+            for path in paths:
+                if path in self.queued:
+                    continue
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue  # Removed since the folder was listed
+                signature = (stat.st_size, stat.st_mtime_ns)
+                previous, unchanged = self.pending.get(path, (None, 0))
+                unchanged = unchanged + 1 if signature == previous else 0
+                self.pending[path] = (signature, unchanged)
+                if stat.st_size == 0 or unchanged < self.settle:
+                    continue  # Still being written
+                try:
+                    self.queue.put_nowait(path)
+                except queue.Full:
+                    self.deferred += 1  # Back-pressure: the file is queued on a later poll
+                    break
+                self.queued.add(path)
+                del self.pending[path]
+            self.peak_depth = max(self.peak_depth, self.queue.qsize())
+
+    def work(self):
+        """Process queued files until a None sentinel is received."""
+        while True:
+            path = self.queue.get()
+            if path is None:
+                break
+            start = time.perf_counter()
+            success = process_file(path, self.recipe, self.output_dir, self.roi_masks)
+            with self.lock:
+                self.busy_time += time.perf_counter() - start
+                if success:
+                    self.processed += 1
+                    self.attempts.pop(path, None)
+                else:
+                    self.attempts[path] = self.attempts.get(path, 0) + 1
+                    if self.attempts[path] < self.max_attempts:
+                        self.queued.discard(path)  # Possibly truncated; retried once it settles again
+                    else:
+                        self.failed += 1
+
+    def report(self):
+        """Log and print the throughput and queue depth since the last report."""
+        now = time.perf_counter()
+        with self.lock:
+            since, processed_before = self.last_report
+            rate = (self.processed - processed_before) / max(now - since, 1e-9)
+            latency = self.busy_time / self.processed if self.processed else 0.0
+            message = (
+                f"Watch: {self.processed} processed, {self.failed} failed, {rate:.2f} images/s, "
+                f"queue {self.queue.qsize()}/{self.queue.maxsize} (peak {self.peak_depth}), "
+                f"{len(self.pending)} settling, {self.deferred} deferred, {latency:.2f} s per image"
+            )
+            self.last_report = (now, self.processed)
+        logging.info(message)
+        print(message, flush=True)
+
+    def run(self, duration=None):
+        """
+        Watch the folder until stop is called, the duration elapses or Ctrl+C is pressed.
+
+        Parameters:
+            duration (float): Optional number of seconds to watch for.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        threads = [threading.Thread(target=self.work, daemon=True) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        logging.info(f"Watching {self.folder} with {self.workers} workers")
+        start = next_report = time.perf_counter()
+        try:
+            while not self.stop_event.is_set():
+                self.scan()
+                now = time.perf_counter()
+                if now >= next_report:
+                    if now > start:
+                        self.report()
+                    next_report = now + self.metrics_interval
+                if duration is not None and now - start >= duration:
+                    break
+                self.stop_event.wait(self.interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for thread in threads:
+                self.queue.put(None)  # Workers finish the queued files first
+            for thread in threads:
+                thread.join()
+            self.report()
+
+    def stop(self):
+        """Stop watching, from another thread."""
+        self.stop_event.set()
+
+# MIME type of each output format, for the HTTP service
+CONTENT_TYPES = {"png": "image/png", "jpg": "image/jpeg", "bmp": "image/bmp", "tif": "image/tiff"}
+
+class TemporalNormalizer:
+    """
+    Normalization state carried across the frames of a video, see process_recipe.
+
+    Each channel's bounds are smoothed with an exponential moving average, so the
+    normalization does not flicker with small changes between frames. The combined
+    normalization and stretch tables are kept by bounds, so they are only rebuilt
+    when the smoothed bounds move. A normalizer serves one recipe.
+    """
+    def __init__(self, smoothing=0.0, max_tables=64):
+        """
+        Parameters:
+            smoothing (float): Weight of the previous frames in the bounds, 0 to 1; 0 follows each frame.
+            max_tables (int): Combined lookup tables kept.
+        """
+        self.smoothing = min(max(smoothing, 0.0), 0.99)
+        self.max_tables = max_tables
+        self.bounds = {}  # Smoothed (low, high) bounds per channel key, unrounded
+        self.tables = OrderedDict()  # Combined lookup tables, least recently used first
+        self.built = 0  # Tables built
+        self.reused = 0  # Tables served from the cache
+
+    def smooth(self, key, bounds):
+        """
+        Blend a frame's normalization bounds into the channel's running bounds.
+
+        Parameters:
+            key (str): Channel key.
+            bounds (tuple): The frame's (low, high) bounds, or None if it is flat.
+
+        Returns:
+            tuple: The rounded (low, high) bounds to normalize with, or None.
+        """
+        previous = self.bounds.get(key)
+        if bounds is None:
+            bounds = previous  # A flat frame keeps the running bounds
+        elif previous is not None:
+            bounds = tuple(self.smoothing * p + (1 - self.smoothing) * b for p, b in zip(previous, bounds))
+        if bounds is None:
+            return None
+        self.bounds[key] = bounds
+        low, high = round(bounds[0]), round(bounds[1])
+        return (low, high) if high > low else None
+
+    def table(self, key, build):
+        """Return the lookup table cached under key, building it if needed."""
+        table = self.tables.get(key)
+        if table is not None:
+            self.tables.move_to_end(key)
+            self.reused += 1
+            return table
+        table = self.tables[key] = build()
+        self.built += 1
+        if len(self.tables) > self.max_tables:
+            self.tables.popitem(last=False)
+        return table
+
+class Y4MReader:
+    """
+    Read the frames of an uncompressed YUV4MPEG2 (.y4m) video one at a time.
+
+    8-bit 4:2:0, 4:2:2, 4:4:4 and monochrome videos are supported. Frames are converted
+    to RGB, the mode open_image gives 8-bit images.
+    """
+    def __init__(self, file_path):
+        """
+        Parameters:
+            file_path (str): Path of the video.
+
+        Raises:
+            ValueError: If the file is not a supported YUV4MPEG2 video.
+        """
+        self.file_path = file_path
+        with open(file_path, "rb") as f:
+            header = f.readline().split()
+        if not header or header[0] != b"YUV4MPEG2":
+            raise ValueError(f"{file_path} is not a YUV4MPEG2 video")
+        parameters = {token[:1].decode(): token[1:].decode() for token in header[1:]}
+        self.width, self.height = int(parameters["W"]), int(parameters["H"])
+        self.rate = parameters.get("F", "25:1")  # Frames per second, as a ratio
+        self.colorspace = parameters.get("C", "420jpeg")
+        if self.colorspace == "mono":
+            self.chroma_size = None
+        elif self.colorspace.startswith("420") and not self.colorspace.startswith("420p"):
+            self.chroma_size = ((self.width + 1) // 2, (self.height + 1) // 2)
+        elif self.colorspace == "422":
+            self.chroma_size = ((self.width + 1) // 2, self.height)
+        elif self.colorspace == "444":
+            self.chroma_size = (self.width, self.height)
+        else:
+            raise ValueError(f"Unsupported Y4M colour space '{self.colorspace}', expected 8-bit 420, 422, 444 or mono")
+
+    def __iter__(self):
+        """Yield each frame as an "RGB" image."""
+        size = (self.width, self.height)
+        luma_bytes = self.width * self.height
+        chroma_bytes = self.chroma_size[0] * self.chroma_size[1] if self.chroma_size else 0
+        with open(self.file_path, "rb") as f:
+            f.readline()  # Stream header
+            while True:
+                marker = f.readline()  # "FRAME" with optional parameters
+                if not marker:
+                    return
+                if not marker.startswith(b"FRAME"):
+                    raise ValueError(f"{self.file_path}: corrupt frame header")
+                data = f.read(luma_bytes + 2 * chroma_bytes)
+                if len(data) < luma_bytes + 2 * chroma_bytes:
+                    raise ValueError(f"{self.file_path}: truncated frame")
+                luma = Image.frombytes("L", size, data[:luma_bytes])
+                if not chroma_bytes:
+                    yield Image.merge("RGB", (luma, luma, luma))
+                    continue
+                cb, cr = (
+                    Image.frombytes("L", self.chroma_size, data[start:start + chroma_bytes]).resize(size, Image.BILINEAR)
+                    for start in (luma_bytes, luma_bytes + chroma_bytes)
+                )
+                yield Image.merge("YCbCr", (luma, cb, cr)).convert("RGB")
+
+class Y4MWriter:
+    """
+    Write 8-bit single-channel frames as a monochrome YUV4MPEG2 video.
+
+    The video is written under a hidden name and renamed once complete, like the
+    outputs of write_outputs.
+    """
+    def __init__(self, file_path, rate="25:1"):
+        """
+        Parameters:
+            file_path (str): Path of the video.
+            rate (str): Frames per second, as a ratio.
+        """
+        self.file_path = file_path
+        self.partial_path = os.path.join(os.path.dirname(file_path), f".{os.path.basename(file_path)}")
+        self.rate = rate
+        self.file = None  # Opened with the first frame, whose size the header holds
+        self.size = None
+
+    def write(self, image):
+        """Append one "L" frame; every frame must have the size of the first."""
+        if image.mode != "L":
+            raise ValueError(f"Y4M output holds 8-bit single-channel frames, not {image.mode}")
+        if self.file is None:
+            self.size = image.size
+            self.file = open(self.partial_path, "wb")
+            self.file.write(f"YUV4MPEG2 W{image.width} H{image.height} F{self.rate} Ip A1:1 Cmono\n".encode())
+        elif image.size != self.size:
+            raise ValueError(f"Frame size {image.size} differs from the video's {self.size}")
+        self.file.write(b"FRAME\n")
+        self.file.write(image.tobytes())
+
+    def close(self, complete=True):
+        """Finish the video, or remove it if the run did not complete."""
+        if self.file is None:
+            return
+        self.file.close()
+        self.file = None
+        if complete:
+            os.replace(self.partial_path, self.file_path)
+        else:
+            os.remove(self.partial_path)
+
+def natural_key(path):
+    """Sort key that orders numbered file names by number, e.g. frame2 before frame10."""
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r"(\d+)", os.path.basename(path))]
+
+def run_video(recipe, source, output_dir, smoothing=0.0, queue_size=4):
+    """
+    Apply a recipe to the frames of a video or numbered frame sequence, without the GUI.
+
+    Frames are decoded, processed and encoded by three threads connected by bounded
+    queues, so decoding and encoding overlap with processing while at most a few
+    frames are held in memory. Processing stays in frame order, as the normalization
+    bounds are smoothed over time; see TemporalNormalizer.
+
+    A folder of frames gives one image per frame and output, named as batch runs name
+    them. A .y4m video gives one monochrome .y4m video per output.
+
+    Parameters:
+        recipe (dict): A complete recipe, see validate_recipe.
+        source (str): Folder of numbered frames, or a .y4m video.
+        output_dir (str): Folder the outputs are written to.
+        smoothing (float): Weight of the previous frames in the normalization bounds, 0 to 1.
+        queue_size (int): Frames waiting between two stages at most.
+
+    Returns:
+        dict: "frames" processed, busy seconds per stage, and lookup tables "built" and "reused".
+
+    Raises:
+        ValueError: If the source cannot be read or an output cannot be written.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    if os.path.isdir(source):
+        paths = sorted(collect_images([source]), key=natural_key)
+        frames = ((os.path.splitext(os.path.basename(path))[0], open_image(path)) for path in paths)
+        writers = None
+    else:
+        reader = Y4MReader(source)
+        stem = os.path.splitext(os.path.basename(source))[0]
+        frames = ((f"{stem}_{index:06d}", image) for index, image in enumerate(reader))
+        writers = {
+            name: Y4MWriter(os.path.join(output_dir, f"{stem}_{name}.y4m"), reader.rate)
+            for name in recipe["outputs"]
+        }
+
+    stop = threading.Event()  # Set when a stage fails or the run is interrupted
+    decoded = queue.Queue(maxsize=max(queue_size, 1))
+    processed = queue.Queue(maxsize=max(queue_size, 1))
+    temporal = TemporalNormalizer(smoothing)
+    stats = {"frames": 0, "decode": 0.0, "process": 0.0, "encode": 0.0}
+    errors = []
+
+    def put(outbox, item):
+        """Hand an item to the next stage, waiting for room unless the run stops."""
+        while not stop.is_set():
+            try:
+                outbox.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(inbox):
+        """Take the next item from the previous stage; None at the end or when the run stops."""
+        while not stop.is_set():
+            try:
+                return inbox.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return None
+
+    def decode():
+        """Read frames in order (decode thread)."""
+        while True:
+            start = time.perf_counter()
+            frame = next(frames, None)
+            stats["decode"] += time.perf_counter() - start
+            if frame is None or not put(decoded, frame):
+                break
+        put(decoded, None)
+
+    def process():
+        """Apply the recipe to each frame in order (process thread)."""
+        roi_masks = {}  # Every frame shares the ROI mask of the first
+        while True:
+            frame = get(decoded)
+            if frame is None:
+                break
+            name, image = frame
+            start = time.perf_counter()
+            outputs = process_recipe(image, recipe, source, roi_masks, temporal)
+            stats["process"] += time.perf_counter() - start
+            if not put(processed, (name, outputs)):
+                break
+        put(processed, None)
+
+    def encode():
+        """Write each frame's outputs (encode thread)."""
+        while True:
+            frame = get(processed)
+            if frame is None:
+                break
+            name, outputs = frame
+            start = time.perf_counter()
+            if writers is None:
+                write_outputs(outputs, name, output_dir, recipe["output_format"])
+            else:
+                for output, image in outputs.items():
+                    writers[output].write(image)
+            stats["encode"] += time.perf_counter() - start
+            stats["frames"] += 1
+
+    def run_stage(stage):
+        """Run a stage, stopping the whole pipeline if it fails."""
+        try:
+            stage()
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+
+    threads = [
+        threading.Thread(target=run_stage, args=(stage,), name=f"video-{stage.__name__}", daemon=True)
+        for stage in (decode, process, encode)
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(0.1)  # Short joins keep Ctrl+C responsive
+    except KeyboardInterrupt:
+        stop.set()
+        for thread in threads:
+            thread.join()
+        errors.append(KeyboardInterrupt())
+    finally:
+        for writer in (writers or {}).values():
+            writer.close(complete=not errors)
+    if errors and isinstance(errors[0], KeyboardInterrupt):
+        raise errors[0]
+    if errors:
+        raise ValueError(f"Video processing stopped after {stats['frames']} frames: {errors[0]}") from errors[0]
+    stats["built"], stats["reused"] = temporal.built, temporal.reused
+    return stats
+
+def _warm_service_worker():
+    """Build the shared lookup tables once in each service worker process."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C stops the service, which shuts the workers down
+    _display_lut16()
+    _low_byte_lut16()
+    process_recipe(Image.new("RGB", (16, 16)), dict(DEFAULT_RECIPE, outputs=list(OUTPUT_NAMES)))
+
+def render_outputs(data, recipe, outputs):
+    """
+    Decode an image, apply a recipe and encode the requested outputs.
+
+    Runs in the service worker processes, so only encoded files cross process boundaries.
+
+    Parameters:
+        data (bytes): Content of the image file.
+        recipe (dict): A complete recipe, see validate_recipe.
+        outputs (list): Names of the outputs to produce.
+
+    Returns:
+        dict: Output name to the encoded file content.
+    """
+    results = process_recipe(open_image(io.BytesIO(data)), dict(recipe, outputs=list(outputs)))
+    encoded = {}
+    for name, image in results.items():
+        buffer = io.BytesIO()
+        save_output(image, buffer, recipe["output_format"])
+        encoded[name] = buffer.getvalue()
+    return encoded
+
+class ProcessingService:
+    """
+    Process images for the HTTP service in a pool of warm worker processes.
+
+    Results are cached by the SHA-256 of the image content together with the recipe and
+    the requested outputs. The cache holds futures, so identical requests arriving while
+    the first one is still processing wait for the same result instead of recomputing it.
+    """
+    def __init__(self, workers=None, max_concurrent=None, cache_size=64):
+        """
+        Parameters:
+            workers (int): Number of worker processes; defaults to the CPU count.
+            max_concurrent (int): Requests handled at once, others get 503; defaults to twice the workers.
+            cache_size (int): Number of results kept in the cache.
+        """
+        from concurrent.futures import ProcessPoolExecutor  # Only the service needs multiprocessing
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_service_worker)
+        # Run one trivial task per worker so every process is started and warm before requests arrive
+        list(self.executor.map(int, range(self.workers)))
+        self.limit = threading.BoundedSemaphore(max_concurrent or 2 * self.workers)
+        self.cache = OrderedDict()  # (content hash, recipe, outputs) to future, least recently used first
+        self.cache_size = cache_size
+        self.lock = threading.Lock()  # Guards the cache and its counters
+        self.hits = 0
+        self.misses = 0
+
+    def submit(self, data, recipe, outputs, digest=None):
+        """
+        Return a future of the encoded outputs, from the cache when possible.
+
+        Parameters:
+            data (bytes): Content of the image file.
+            recipe (dict): A complete recipe, see validate_recipe.
+            outputs (list): Names of the outputs to produce.
+            digest (str): SHA-256 of data, if already computed.
+
+        Returns:
+            concurrent.futures.Future: Future of the output name to encoded content dict.
+        """
+        key = (digest or hashlib.sha256(data).hexdigest(), json.dumps(recipe, sort_keys=True), tuple(sorted(outputs)))
+        with self.lock:
+            future = self.cache.get(key)
+            if future is not None and not (future.done() and future.exception()):
+                self.cache.move_to_end(key)
+                self.hits += 1
+                return future
+            future = self.executor.submit(render_outputs, data, recipe, sorted(outputs))
+            self.cache[key] = future  # A failed result is replaced by the next identical request
+            self.misses += 1
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+            return future
+
+    def process_batch(self, items):
+        """
+        Process several requests, merging the ones for the same image and recipe.
 
-# Configure logging to record app events and errors
-logging.basicConfig(filename='app.log', level=logging.INFO,
-                    format='%(asctime)s:%(levelname)s:%(message)s')
+        Items with the same image content and recipe are rendered by a single task
+        producing the union of their outputs, so the channels are only extracted and
+        normalized once.
 
-class ImageProcessorApp:
-    """Main application class for the Image Processor GUI."""
-    def __init__(self, root):
-        """Initialize the main window and set up the UI."""
-        self.root = root
-        self.root.title("Custom Contrast Stretching GUI by github.com/kaanaldemir")
-        self.root.geometry("1275x980")
-        self.root.minsize(1275, 980)
-        
-        # Attempt to set the window icon
+        Parameters:
+            items (list): (data, recipe, outputs) tuples.
+
+        Returns:
+            list: Output name to encoded content dict, or the exception, per item.
+        """
+        groups = {}
+        keys = []
+        for data, recipe, outputs in items:
+            digest = hashlib.sha256(data).hexdigest()
+            key = (digest, json.dumps(recipe, sort_keys=True))
+            groups.setdefault(key, (data, recipe, set()))[2].update(outputs)
+            keys.append(key)
+        futures = {
+            key: self.submit(data, recipe, outputs, key[0])
+            for key, (data, recipe, outputs) in groups.items()
+        }
+        results = []
+        for key, (data, recipe, outputs) in zip(keys, items):
+            try:
+                encoded = futures[key].result()
+                results.append({name: encoded[name] for name in outputs})
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def stats(self):
+        """Return the worker count and cache counters."""
+        with self.lock:
+            return {"workers": self.workers, "cached": len(self.cache), "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        """Stop the worker processes, dropping the requests not started yet."""
+        self.executor.shutdown(cancel_futures=True)
+
+class ProcessingRequestHandler:
+    """
+    HTTP endpoints of the processing service.
+
+    create_server mixes this class into http.server's BaseHTTPRequestHandler, so the
+    HTTP modules are only imported when the service starts.
+
+    GET /health
+        Service status, cache counters and the output names.
+    POST /process
+        One output of one image. The body is either the image file, with the output
+        and any recipe settings as query parameters (e.g. ?output=gray_custom&curve=Gamma),
+        or a JSON request object. Responds with the encoded image.
+    POST /batch
+        A JSON object {"items": [request, ...]}. Responds with {"results": [...]}, each
+        result holding base64-encoded outputs or an error.
+
+    A JSON request object holds "image" (base64 file content) or "path" (a file on the
+    server), optionally "recipe" (recipe settings) and "output" or "outputs".
+    """
+    server_version = "CustomContrastStretching/1.0"
+
+    def do_GET(self):
+        """Answer the health check."""
+        if urlparse(self.path).path != "/health":
+            self.send_json(404, {"error": "Not found"})
+            return
+        self.send_json(200, dict(self.server.service.stats(), status="ok", outputs=list(OUTPUT_NAMES)))
+
+    def do_POST(self):
+        """Process images, refusing requests beyond the concurrency limit."""
+        service = self.server.service
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if not service.limit.acquire(blocking=False):
+            self.send_json(503, {"error": "Too many concurrent requests"}, {"Retry-After": "1"})
+            return
         try:
-            if getattr(sys, 'frozen', False):
-                script_dir = sys._MEIPASS
+            url = urlparse(self.path)
+            if url.path == "/process":
+                self.handle_process(body, parse_qs(url.query))
+            elif url.path == "/batch":
+                self.handle_batch(body)
             else:
-                script_dir = os.path.dirname(os.path.abspath(__file__))
+                self.send_json(404, {"error": "Not found"})
+        except (OSError, ValueError) as e:
+            self.send_json(400, {"error": str(e)})
+        except Exception as e:
+            logging.error(f"Service failed to process {self.path} with error: {e}")
+            self.send_json(500, {"error": str(e)})
+        finally:
+            service.limit.release()
 
-            icon_path = os.path.join(script_dir, "cstretch.ico")
+    def handle_process(self, body, query):
+        """Respond with one output of one image."""
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            request = self.parse_json(body)
+        else:
+            # Raw image upload; text settings keep the query text ("2", "0"), others are JSON ("90", "true")
+            request = {"image": body, "recipe": {}}
+            for name, values in query.items():
+                if name == "output":
+                    request["output"] = values[-1]
+                    continue
+                request["recipe"][name] = values[-1]
+                if isinstance(DEFAULT_RECIPE.get(name), str):
+                    continue
+                try:
+                    request["recipe"][name] = json.loads(values[-1])
+                except json.JSONDecodeError:
+                    pass  # Reported as the wrong type by validate_recipe
+        data, recipe, outputs = self.parse_item(request)
+        if len(outputs) != 1:
+            raise ValueError("/process returns one output; use /batch for several")
+        encoded = self.server.service.process_batch([(data, recipe, outputs)])[0]
+        if isinstance(encoded, Exception):
+            raise ValueError(f"Failed to process image: {encoded}")
+        self.send_body(200, CONTENT_TYPES[recipe["output_format"]], encoded[outputs[0]])
 
-            if not os.path.exists(icon_path):
-                raise FileNotFoundError(f"Icon file not found at: {icon_path}")
+    def handle_batch(self, body):
+        """Respond with the outputs of several requests."""
+        request = self.parse_json(body)
+        if not isinstance(request.get("items"), list):
+            raise ValueError("Expected an 'items' list")
+        items, errors = [], {}
+        for i, item in enumerate(request["items"]):
+            try:
+                items.append(self.parse_item(item))
+            except (OSError, ValueError) as e:
+                errors[i] = str(e)
+        processed = iter(self.server.service.process_batch(items))
+        results = []
+        for i in range(len(request["items"])):
+            encoded = errors.get(i) or next(processed)
+            if isinstance(encoded, (str, Exception)):
+                results.append({"error": str(encoded)})
+            else:
+                results.append({"outputs": {name: base64.b64encode(content).decode("ascii") for name, content in encoded.items()}})
+        self.send_json(200, {"results": results})
 
-            icon_image = Image.open(icon_path)
-            icon_photo = ImageTk.PhotoImage(icon_image)
-            self.root.iconphoto(False, icon_photo)
-            self.root.icon_photo = icon_photo  # Keep a reference to prevent garbage collection
-        except Exception as e:
-            logging.warning(f"Failed to set window icon: {e}")
+    def parse_json(self, body):
+        """Decode a JSON request object."""
+        try:
+            request = json.loads(body)
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise ValueError(f"Invalid JSON: {e}") from e
+        if not isinstance(request, dict):
+            raise ValueError("Expected a JSON object")
+        return request
+
+    def parse_item(self, item):
+        """
+        Read the image, recipe and outputs of a request object.
+
+        Returns:
+            tuple: Image file content, complete recipe and output names.
+        """
+        if not isinstance(item, dict):
+            raise ValueError("Expected a request object")
+        if "image" in item:
+            data = item["image"]
+            if isinstance(data, str):
+                data = base64.b64decode(data, validate=True)
+        elif "path" in item:
+            with open(item["path"], "rb") as f:
+                data = f.read()
+        else:
+            raise ValueError("Expected 'image' or 'path'")
+        if not data:
+            raise ValueError("Empty image")
+        recipe = validate_recipe(item.get("recipe", {}))
+        if "outputs" in item:
+            outputs = list(item["outputs"])
+        elif "output" in item:
+            outputs = [item["output"]]
+        else:
+            outputs = recipe["outputs"]
+        unknown = set(outputs) - set(OUTPUT_NAMES)
+        if unknown:
+            raise ValueError(f"Unknown outputs: {', '.join(sorted(unknown))}")
+        return data, recipe, outputs
+
+    def send_body(self, status, content_type, body, headers=None):
+        """Send a response."""
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, status, content, headers=None):
+        """Send a JSON response."""
+        self.send_body(status, "application/json", json.dumps(content).encode("utf-8"), headers)
+
+    def log_message(self, format, *args):
+        """Send request logs to the application log instead of stderr."""
+        logging.info(f"Service {self.address_string()}: {format % args}")
+
+def create_server(service, host="127.0.0.1", port=8000):
+    """
+    Create the HTTP server of a processing service.
+
+    Parameters:
+        service (ProcessingService): The service handling the requests.
+        host (str): Address to listen on; only the local machine by default.
+        port (int): Port to listen on; 0 picks a free port.
+
+    Returns:
+        ThreadingHTTPServer: The server, not yet serving.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    handler = type("ProcessingRequestHandler", (ProcessingRequestHandler, BaseHTTPRequestHandler), {})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.service = service
+    return server
+
+def image_bytes(image):
+    """Return the approximate number of bytes of pixel data an image holds."""
+    pixel_size = {"1": 1, "L": 1, "P": 1, "I;16": 2}.get(image.mode, 4)  # Pillow pads RGB to 4 bytes
+    width, height = image.size
+    return width * height * pixel_size
+
+class MemoryManager:
+    """
+    Account for the memory held by full-resolution images and keep it within a budget.
+
+    Images are tracked by name through weak references, so the manager never keeps an
+    image alive and forgets it once its holder drops it. An image tracked with a release
+    callback can be recomputed; when the total goes over the budget, such images are
+    released least recently used first. Images without a callback are counted but kept.
+    An image tracked under several names (e.g. the channels of a 16-bit image) is
+    counted once. The entries are guarded by a lock, so images can be tracked from
+    worker threads too.
+    """
+    def __init__(self, budget):
+        """
+        Parameters:
+            budget (int): Budget in bytes.
+        """
+        self.budget = budget
+        self.entries = OrderedDict()  # Name to (weak reference, bytes, release callback), least recently used first
+        self.lock = threading.RLock()  # Reentrant, as enforce calls usage
+
+    def track(self, name, image, release=None):
+        """
+        Start tracking an image, replacing any image tracked under the same name.
+
+        Parameters:
+            name (str): Name of the image, e.g. its attribute.
+            image (PIL.Image): The image, or None to stop tracking the name.
+            release (callable): Drops the holder's reference so the image can be freed.
+        """
+        with self.lock:
+            self.entries.pop(name, None)
+            if image is not None:
+                self.entries[name] = (weakref.ref(image), image_bytes(image), release)
+
+    def touch(self, name):
+        """Mark an image as recently used."""
+        with self.lock:
+            if name in self.entries:
+                self.entries.move_to_end(name)
+
+    def prune(self):
+        """Forget the images that were freed."""
+        with self.lock:
+            for name in [name for name, (ref, size, release) in self.entries.items() if ref() is None]:
+                del self.entries[name]
+
+    def usage(self):
+        """Return the number of bytes held by the tracked images."""
+        with self.lock:
+            self.prune()
+            return sum({id(ref()): size for ref, size, release in self.entries.values()}.values())
+
+    def enforce(self):
+        """
+        Release recomputable images, least recently used first, until within budget.
+
+        Returns:
+            list: Names of the released images.
+        """
+        released = []
+        with self.lock:
+            usage = self.usage()
+            for name, (ref, size, release) in list(self.entries.items()):
+                if usage <= self.budget:
+                    break
+                if release is None:
+                    continue
+                image = ref()
+                shared = any(
+                    other_name != name and other_ref() is image
+                    for other_name, (other_ref, _, _) in self.entries.items()
+                )
+                del self.entries[name]
+                release()
+                released.append(name)
+                if not shared:
+                    usage -= size  # Freed unless referenced outside the tracked holders
+        if released:
+            logging.info(f"Memory budget exceeded, released {', '.join(released)}")
+        return released
+
+class BackgroundLoader:
+    """
+    Decode images on a background thread, always the one requested most recently.
+
+    A request made while another is waiting replaces it, so holding a navigation key
+    down only decodes the images the thread gets to, not every image passed on the way.
+    """
+    def __init__(self, load):
+        """
+        Parameters:
+            load (callable): Decodes one request's arguments, e.g. open_image.
+        """
+        self.load = load
+        self.condition = threading.Condition()
+        self.request = None  # (token, args) of the request waiting for the thread
+        self.token = 0  # Increases with every request
+        self.dropped = 0  # Requests replaced before they were decoded
+        self.results = queue.Queue()  # (token, args, result, error) of decoded requests
+        self.thread = None  # Started with the first request
+
+    def submit(self, *args):
+        """
+        Request a load, replacing any request still waiting.
+
+        Returns:
+            int: Token identifying the request in the results.
+        """
+        with self.condition:
+            if self.request is not None:
+                self.dropped += 1
+            self.token += 1
+            self.request = (self.token, args)
+            self.condition.notify()
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="BackgroundLoader", daemon=True)
+                self.thread.start()
+            return self.token
+
+    def run(self):
+        """Decode requests one after another (loader thread)."""
+        while True:
+            with self.condition:
+                while self.request is None:
+                    self.condition.wait()
+                token, args = self.request
+                self.request = None
+            try:
+                self.results.put((token, args, self.load(*args), None))
+            except Exception as e:
+                self.results.put((token, args, None, e))
+
+    def poll(self):
+        """Return the most recent decoded request, or None; older results are discarded."""
+        result = None
+        while True:
+            try:
+                result = self.results.get_nowait()
+            except queue.Empty:
+                return result
+
+def analyze_image(image, source, file_path, settings, roi_masks=None):
+    """
+    Compute the channels, histograms and thumbnails the main window displays.
+
+    This is the heavy part of showing an image. It does not touch the application's
+    state, so navigation runs it on the background loader.
+
+    Parameters:
+        image (PIL.Image): The loaded image, before inversion, used to build the ROI mask.
+        source (PIL.Image): The image to process, inverted if the settings ask for it.
+        file_path (str): Path of the image.
+        settings (dict): "roi_mode", "roi_inset", "roi_crop", "mixes" (every channel mix)
+            and "selected_mix" (name of the mix shown in the last column).
+        roi_masks (dict): Optional ROI mask cache, see shared_roi_mask.
+
+    Returns:
+        dict: "roi_key" and "roi_full_mask" (the uncropped mask, None for the full frame),
+        "roi_mask", "source_image", and "channels", "mix_images", "histograms" and
+        "thumbnails" per channel key or mix name.
+    """
+    full_mask = shared_roi_mask(image, file_path, settings["roi_mode"], settings["roi_inset"], roi_masks)
+    mask = full_mask
+    bbox = mask.getbbox() if mask is not None and settings["roi_crop"] else None
+    if bbox:
+        source = source.crop(bbox)
+        mask = mask.crop(bbox)
+
+    # Split the bands once; high-bit-depth images share their single band between columns
+    channels = split_channels(source)
+    # Evaluate every channel mix in one go, so switching the mix column is instant
+    mix_images = compute_channel_mixes(source, settings["mixes"])
+    channels["gray_no_g"] = mix_images[settings["selected_mix"]]
+
+    # Channels sharing the same data (high-bit-depth images) share their histogram and thumbnail
+    histograms, thumbnails = {}, {}
+    for key in CHANNEL_KEYS:
+        other = next((other for other in histograms if channels[other] is channels[key]), None)
+        if other is None:
+            histograms[key] = channel_histogram(channels[key], mask)
+            thumbnails[key] = fit_image(channels[key], 250, 250)
+        else:
+            histograms[key], thumbnails[key] = histograms[other], thumbnails[other]
+    return {
+        "roi_key": roi_mask_key(file_path, image.size, settings["roi_mode"], settings["roi_inset"])
+        if full_mask is not None else None,
+        "roi_full_mask": full_mask,
+        "roi_mask": mask,
+        "source_image": source,
+        "channels": channels,
+        "mix_images": mix_images,
+        "histograms": histograms,
+        "thumbnails": thumbnails
+    }
+
+def comparison_entry(image, mask, mix, size):
+    """
+    Compute the channel histograms and thumbnails the comparison grid renders tiles from.
+
+    Parameters:
+        image (PIL.Image): The image, already inverted and cropped as the settings ask.
+        mask (PIL.Image): Region of interest mask of the image, or None for the full frame.
+        mix (dict): Channel mix of the last column.
+        size (int): Maximum width and height of the thumbnails.
+
+    Returns:
+        dict: "max_value", and "histograms" and "thumbnails" per channel key.
+    """
+    entry = {"max_value": max_value_of(image), "histograms": {}, "thumbnails": {}}
+    for key in CHANNEL_KEYS:
+        channel = extract_channel(image, key, mix)
+        entry["histograms"][key] = channel_histogram(channel, mask)
+        entry["thumbnails"][key] = fit_image(channel, size, size)
+    return entry
+
+def render_tile(entry, idx, parameters):
+    """
+    Build the thumbnail of one output from an image's cached channels.
+
+    Parameters:
+        entry (dict): Cached histograms and thumbnails of the image, see comparison_entry.
+        idx (int): Index of the output in OUTPUT_NAMES.
+        parameters (dict): Snapshot from ComparisonWindow.stretch_parameters.
+
+    Returns:
+        PIL.Image: The 8-bit thumbnail.
+    """
+    num_columns = len(CHANNEL_KEYS)
+    key = CHANNEL_KEYS[idx % num_columns]
+    thumbnail = entry["thumbnails"][key]
+    if idx < num_columns:
+        return to_display_image(thumbnail)
+
+    max_value = entry["max_value"]
+    bounds = normalization_bounds(
+        entry["histograms"][key], parameters["cutoff"], parameters["ignore_values"][key]
+    )
+    normalize = normalize_lut(bounds, max_value + 1)
+    lut = normalize
+    if parameters["clahe"] is not None:
+        # Enhance the normalized thumbnail; the stretch below then applies on top of it
+        thumbnail = clahe(apply_lut(thumbnail, normalize), *parameters["clahe"])
+        lut = None
+    if idx >= 2 * num_columns:
+        # Thresholds are set in the main image's range; rescale them to this image's range
+        lower, upper = scale_thresholds(parameters["lower"], parameters["upper"], parameters["max_value"], max_value)
+        counts = None
+        if STRETCH_CURVES[parameters["curve"]]["uses_histogram"]:
+            # As in the main window, curves see the normalized histogram, with or without local contrast
+            counts = tuple(remap_histogram(entry["histograms"][key], normalize, max_value + 1))
+        try:
+            stretch_lut = build_stretch_lut(
+                lower, upper, parameters["inverse_lower"], parameters["inverse_upper"], max_value,
+                parameters["curve"], parameters["curve_parameter"], counts
+            )
+        except ValueError:
+            stretch_lut = build_stretch_lut(
+                lower, upper, parameters["inverse_lower"], parameters["inverse_upper"], max_value
+            )  # The main window reports invalid parameters
+        lut = stretch_lut if lut is None else compose_luts(lut, stretch_lut)
+    return to_display_image(thumbnail, lut)
+
+# Parameter grid of the regression harness: recipe settings applied over the defaults
+REGRESSION_RECIPES = {
+    "default": {},
+    "inverted_gamma": {
+        "invert_before": True, "curve": "Gamma", "curve_parameter": "0.6", "inverse_lower": True,
+        "red_coefficient": 0.2, "blue_coefficient": 0.2
+    },
+    "sigmoid_cutoffs": {
+        "curve": "Sigmoid", "low_cutoff": 1.0, "high_cutoff": 0.5,
+        "lower_threshold": 60, "upper_threshold": 200, "inverse_upper": True
+    },
+    "circle_piecewise": {
+        "roi_mode": "Circle", "roi_inset": 5.0, "ignore_values": "0, green:255", "curve": "Piecewise"
+    },
+    "fov_crop_equalize": {"roi_mode": "Auto FOV", "roi_crop": True, "curve": "Equalize"},
+    "clahe_lightness": {"local_contrast": True, "channel_mixes": "Lightness: LAB L*", "selected_mix": "Lightness"}
+}
+
+# Images of the regression harness: the bundled sample and synthetic 8-bit and 16-bit images
+REGRESSION_IMAGES = ("fundus", "gradient_rgb", "ramp_16bit")
+REGRESSION_GOLDEN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "regression_golden.json")
+REGRESSION_THUMBNAIL = 250  # Size of the thumbnails hashed, as in the comparison grid
+REGRESSION_SIZE = 1024  # Size of the synthetic images, large enough for their memory use to register
+
+def regression_image(name):
+    """
+    Build one of the images of the regression harness.
+
+    Parameters:
+        name (str): One of REGRESSION_IMAGES.
+
+    Returns:
+        PIL.Image: An "RGB" or "I" image, as returned by open_image.
+    """
+    if name == "fundus":
+        return open_image(os.path.join(os.path.dirname(os.path.abspath(__file__)), "image", "fundus.jpg"))
+    linear = Image.linear_gradient("L")  # 256x256, black at the top
+    radial = Image.radial_gradient("L")  # 256x256, black in the centre
+    if name == "gradient_rgb":
+        image = Image.merge("RGB", (linear, radial, linear.rotate(90)))
+    elif name == "ramp_16bit":
+        # Every 16-bit level: the linear ramp gives the high byte, the radial one the low byte
+        image = _image_math_eval("a * 256 + b", a=linear.convert("I"), b=radial.convert("I"))
+    else:
+        raise ValueError(f"Unknown regression image '{name}'")
+    return image.resize((REGRESSION_SIZE, REGRESSION_SIZE), Image.NEAREST)  # Scaled up, keeping every level
+
+def image_digest(image):
+    """Return a short hash of an image's mode, size and pixels."""
+    digest = hashlib.sha256(f"{image.mode} {image.size}".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()[:16]
+
+def peak_memory_mb():
+    """Return the peak resident memory of this process in megabytes, or None where it is not available."""
+    try:
+        import resource
+    except ImportError:
+        return None  # Not available on Windows
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10  # Bytes on macOS, kilobytes elsewhere
+
+def regression_case(image_name, repeat=3, ballast_mb=0):
+    """
+    Run the parameter grid on one image and record its outputs, latencies and memory.
+
+    This runs in a fresh worker process, so the peak memory is that of this case alone.
+    Pillow allocates pixels outside the Python allocator, so tracemalloc would miss
+    them; the process's peak resident memory is used instead.
+
+    Parameters:
+        image_name (str): One of REGRESSION_IMAGES.
+        repeat (int): Runs of the grid; the fastest run of each stage is kept.
+        ballast_mb (int): Extra memory held during the runs, to check that the memory
+            budget catches a case that goes over it.
+
+    Returns:
+        dict: "outputs" (hash and mean of every output and thumbnail), "latency_ms"
+        (per stage), "peak_mb" (None where not available) and "errors".
+    """
+    baseline = peak_memory_mb()
+    result = {"outputs": {}, "latency_ms": {}, "peak_mb": None, "errors": []}
+    ballast = Image.new("L", (1024, 1024 * ballast_mb), 1) if ballast_mb else None  # Written, so resident
+
+    def timed(stage, function, *args):
+        """Run one stage, keeping its fastest time."""
+        start = time.perf_counter()
+        value = function(*args)
+        elapsed = 1000 * (time.perf_counter() - start)
+        result["latency_ms"][stage] = round(min(elapsed, result["latency_ms"].get(stage, elapsed)), 2)
+        return value
+
+    def record(key, image):
+        """Record an output, checking that repeated runs produce the same pixels."""
+        entry = {"sha256": image_digest(image), "mean": round(histogram_mean(channel_histogram(image)), 3)}
+        if result["outputs"].setdefault(key, entry) != entry:
+            result["errors"].append(f"{key}: output differs between runs")
+
+    for run in range(max(repeat, 1)):
+        image = timed("load", regression_image, image_name)
+        channels = timed("channels", split_channels, image)
+        for key, channel in channels.items():
+            record(f"channels/{key}", channel)
+        for name, settings in REGRESSION_RECIPES.items():
+            recipe = validate_recipe(dict(settings, outputs=list(OUTPUT_NAMES)))
+            outputs = timed(f"{name}/process", process_recipe, image, recipe)
+            thumbnails = timed(f"{name}/thumbnail", lambda: {
+                output: to_display_image(fit_image(output_image, REGRESSION_THUMBNAIL, REGRESSION_THUMBNAIL))
+                for output, output_image in outputs.items()
+            })
+            for output in OUTPUT_NAMES:
+                record(f"{name}/{output}", outputs[output])
+                record(f"{name}/{output}/thumbnail", thumbnails[output])
+        # Comparison grid tiles for every registered curve, with and without local contrast
+        entry = timed("tiles/entry", comparison_entry, image, None, no_green_mix(0.5, 0.5), REGRESSION_THUMBNAIL)
+        for curve, clahe_settings in [(curve, c) for curve in STRETCH_CURVES for c in (None, (2.0, 8))]:
+            stage = f"tiles/{curve}" + ("/clahe" if clahe_settings else "")
+            parameters = {
+                "cutoff": (0.0, 0.0), "ignore_values": {key: [] for key in CHANNEL_KEYS},
+                "lower": 60, "upper": 200, "inverse_lower": False, "inverse_upper": False,
+                "curve": curve, "curve_parameter": STRETCH_CURVES[curve]["default"],
+                "clahe": clahe_settings, "max_value": 255
+            }
+            tiles = timed(stage, lambda: [render_tile(entry, idx, parameters) for idx in range(len(OUTPUT_NAMES))])
+            for output, tile in zip(OUTPUT_NAMES, tiles):
+                record(f"{stage}/{output}", tile)
+    peak = peak_memory_mb()
+    if peak is not None:
+        result["peak_mb"] = round(peak - baseline, 1)
+    del ballast
+    return result
+
+def run_regression(golden_path=REGRESSION_GOLDEN, update=False, repeat=3, tolerance=0.0, budget_scale=1.0,
+                   images=REGRESSION_IMAGES):
+    """
+    Compare the processing engine's outputs, latencies and memory with a golden file.
+
+    Every image of the harness is processed in its own worker process across the
+    REGRESSION_RECIPES grid, with all 15 outputs and their display thumbnails hashed.
+    An output passes if its hash matches, or, with a tolerance, if its mean level moved
+    by no more than the tolerance. A stage fails when it is slower than its budget
+    and a case when its peak memory exceeds its budget. Budgets are recorded by
+    update as the measured values with headroom for run-to-run noise. The memory
+    check is itself checked: the first case is run again holding more memory than
+    its budget, and must fail.
+
+    Parameters:
+        golden_path (str): Path of the golden JSON file.
+        update (bool): Record the current results as the new golden file instead of comparing.
+        repeat (int): Runs of the grid per image; the fastest run of each stage is kept.
+        tolerance (float): Mean level change accepted when an output's hash differs.
+        budget_scale (float): Factor applied to every budget, for machines slower than the recording one.
+        images (tuple): Names of the images to run, see REGRESSION_IMAGES.
+
+    Returns:
+        list: Failure messages, empty if everything passed.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    context = multiprocessing.get_context("spawn")  # A fresh process per case, on every platform
+
+    def run_case(name, repeat, ballast_mb=0):
+        """Run one case in a fresh worker process."""
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            return executor.submit(regression_case, name, repeat, ballast_mb).result()
+
+    def memory_failure(name, peak, budget):
+        """Return the failure message of a case over its memory budget, or None."""
+        if budget is not None and peak is not None and peak > budget * budget_scale:
+            return f"{name}: peak memory {peak} MB exceeds the {budget * budget_scale:g} MB budget"
+        return None
+
+    results = {}
+    for name in images:
+        results[name] = run_case(name, repeat)
+        print(f"{name}: {len(results[name]['outputs'])} outputs, peak {results[name]['peak_mb']} MB", flush=True)
+
+    failures = [f"{name}/{error}" for name, result in results.items() for error in result["errors"]]
+    if update:
+        golden = {"pillow": PILLOW_VERSION, "cases": {}}
+        if os.path.exists(golden_path):
+            with open(golden_path, encoding="utf-8") as f:
+                golden = json.load(f)  # Cases not run keep their recorded results
+            golden["pillow"] = PILLOW_VERSION
+        for name, result in results.items():
+            golden["cases"][name] = {
+                "outputs": result["outputs"],
+                "latency_budget_ms": {
+                    stage: round(2 * value + 10, 1) for stage, value in result["latency_ms"].items()
+                },
+                "peak_budget_mb": None if result["peak_mb"] is None else round(1.25 * result["peak_mb"] + 16, 1)
+            }
+        with open(golden_path, "w", encoding="utf-8") as f:
+            json.dump(golden, f, indent=1, sort_keys=True)
+            f.write("\n")
+        print(f"Recorded {len(results)} cases in {golden_path}")
+        return failures
+
+    with open(golden_path, encoding="utf-8") as f:
+        golden = json.load(f)
+    if golden.get("pillow") != PILLOW_VERSION:
+        print(f"Note: golden results were recorded with Pillow {golden.get('pillow')}, running {PILLOW_VERSION}")
+    for name, result in results.items():
+        case = golden["cases"].get(name)
+        if case is None:
+            failures.append(f"{name}: not in the golden file, record it with --update")
+            continue
+        for key, expected in case["outputs"].items():
+            actual = result["outputs"].get(key)
+            if actual is None:
+                failures.append(f"{name}/{key}: output missing")
+            elif actual["sha256"] != expected["sha256"]:
+                change = abs(actual["mean"] - expected["mean"])
+                if change > tolerance:
+                    failures.append(f"{name}/{key}: pixels changed (mean {expected['mean']} -> {actual['mean']})")
+        for key in set(result["outputs"]) - set(case["outputs"]):
+            failures.append(f"{name}/{key}: not in the golden file, record it with --update")
+        for stage, budget in case["latency_budget_ms"].items():
+            latency = result["latency_ms"].get(stage)
+            if latency is not None and latency > budget * budget_scale:
+                failures.append(f"{name}/{stage}: {latency} ms exceeds the {budget * budget_scale:g} ms budget")
+        failure = memory_failure(name, result["peak_mb"], case.get("peak_budget_mb"))
+        if failure:
+            failures.append(failure)
+
+    # Hold the first case's budget on top of its own use; a memory check that passes this cannot fail
+    name = next((name for name in images if golden["cases"].get(name, {}).get("peak_budget_mb")), None)
+    if name is not None and results[name]["peak_mb"] is not None:
+        ballast_mb = math.ceil(golden["cases"][name]["peak_budget_mb"] * budget_scale)
+        canary = run_case(name, 1, ballast_mb)
+        if memory_failure(name, canary["peak_mb"], golden["cases"][name]["peak_budget_mb"]) is None:
+            failures.append(f"{name}: the memory check missed a run holding {ballast_mb} MB more than the case")
+        else:
+            print(f"{name}: over-budget run caught at peak {canary['peak_mb']} MB", flush=True)
+    return failures
+
+class ImageProcessorApp:
+    """Main application class for the Image Processor GUI."""
+    def __init__(self, root, memory_budget=DEFAULT_MEMORY_BUDGET, atlas=False):
+        """
+        Initialize the main window and set up the UI.
+
+        Parameters:
+            root (tk.Tk): The main window.
+            memory_budget (int): Bytes of full-resolution images kept before recomputable ones are released.
+            atlas (bool): Draw the output grid as one composed canvas image instead of 15 labels.
+        """
+        self.root = root
+        self.root.title("Custom Contrast Stretching GUI by github.com/kaanaldemir")
+        self.window_size = (1275, 980)  # Initial and minimum size of the window
+        self.root.geometry("%dx%d" % self.window_size)
+        self.root.minsize(*self.window_size)
 
         # Define color scheme for the UI
         self.colors = {
@@ -106,7 +2827,38 @@ class ImageProcessorApp:
         self.blue_custom = None
         self.gray_no_g_custom = None
 
+        # Attribute holding the full-resolution image of each display slot
+        self.output_attributes = list(OUTPUT_NAMES)
+
+        self.histograms = {}  # Histogram of each channel, computed once per load
+        self.thumbnails = {}  # Thumbnail of each channel, remapped for live updates
+        self.normalize_luts = {}  # Normalization lookup table of each channel
+        self.custom_luts = {}  # Normalization and custom stretch combined, per channel
+        self.stretch_luts = {}  # Custom stretch alone, applied after local contrast enhancement
+        self.enhanced_thumbnails = {}  # Normalized thumbnails after local contrast enhancement
+        self.normalized_histograms = {}  # Histogram after normalization, for curves using it
+        self.ignore_values = {key: [] for key in CHANNEL_KEYS}  # Levels left out of normalization
+
+        self.histogram_size = (240, 80)  # Size of each channel's histogram plot
+        self.histogram_gap = 10  # Horizontal space between histogram plots
+        self.histogram_markers = {}  # Canvas line of each (channel, threshold) marker
+        self.dragged_marker = None  # Threshold marker currently dragged, if any
+
+        self.channel_mixes = []  # User-defined channel mixes, besides Grayscale No Green
+        self.mix_images = {}  # Image of every channel mix, computed in one go per load
+        self.mix_title_labels = []  # Title labels of the channel mix column
+
         self.all_labels = []  # List to hold image labels
+        self.use_atlas = atlas  # Output grid drawn as one atlas image, see build_image_atlas
+        self.atlas_canvas = None  # Canvas showing the atlas
+        self.atlas_image = None  # Composed thumbnails of all 15 slots
+        self.atlas_photo = None  # Tk image of the atlas, updated by region
+        self.atlas_staging = {}  # Tk images used to upload a changed region, per region size
+        self.atlas_boxes = {}  # Area of each slot's thumbnail in the atlas, for hit-testing
+        self.atlas_dirty = None  # Bounding box of the atlas changed since the last upload
+        self.atlas_flush_id = None  # Pending upload of the changed region
+        self.atlas_cell = (264, 290)  # Width and height of an atlas slot, title included
+        self.atlas_title_height = 30
         self.fullscreen_window = None  # Reference to fullscreen window
         self.fullscreen_image = None  # Currently displayed fullscreen image
 
@@ -134,6 +2886,15 @@ class ImageProcessorApp:
         self.current_blue_coeff = 0.500
 
         self.num_columns = 5  # Number of image columns in the UI
+        if self.use_atlas:
+            # The atlas canvas does not shrink with the window, so widen the window to keep every column visible
+            atlas_width = self.atlas_cell[0] * self.num_columns + 2 * 10  # Plus the image frame's padding
+            if atlas_width > self.window_size[0]:
+                self.window_size = (atlas_width, self.window_size[1])
+                self.root.geometry("%dx%d" % self.window_size)
+                self.root.minsize(*self.window_size)
+
+        self.max_value = 255  # Largest intensity level of the loaded image (65535 for 16-bit)
 
         # Variable to track if the image should be inverted before processing
         self.invert_before_var = tk.BooleanVar(value=False)
@@ -143,7 +2904,68 @@ class ImageProcessorApp:
         self.image_list = []  # List of image file paths in the current folder
         self.current_image_index = -1  # Index of the currently displayed image
 
+        self.frame_index = 0  # Zero-based page of a multi-page image being shown
+        self.frame_count = 1  # Number of pages of the loaded file
+        self.frame_thumbnails = {}  # Preview thumbnail of each page, for browsing with the frame slider
+        self.frame_futures = {}  # Page thumbnails still being rendered in the background
+        self.frame_executor = ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1))
+        self.frame_load_id = None  # Pending load of the page under the frame slider
+
+        self.loader = BackgroundLoader(self.decode_image)  # Decodes and processes the image navigated to, skipping passed ones
+        self.pending_load = None  # Token of the image being decoded for navigation, if any
+        self.review_output_dir = None  # Folder the outputs of accepted images are saved to
+        self.save_executor = ThreadPoolExecutor(max_workers=1)  # Writes accepted outputs in order
+        self.pending_saves = []  # (file name prefix, future) of accepted images being written
+
+        self.comparison_window = None  # Open comparison grid, if any
+        self.recipe_outputs = list(DEFAULT_RECIPE["outputs"])  # Outputs batch runs save, from the last recipe
+        self.recipe_format = DEFAULT_RECIPE["output_format"]  # File format batch runs save in
+
+        self.image_path = None  # Path of the loaded image
+        self.roi_masks = {}  # Region of interest masks per (folder, size, mode, inset)
+        self.roi_mask = None  # Mask of the region of interest, None for the full frame
+        self.source_image = None  # Image the channels are extracted from, cropped to the ROI if enabled
+        self.memory = MemoryManager(memory_budget)  # Bytes held by full-resolution images, within a budget
+
+        self.first_paint_time = None  # Seconds from module import to the first paint
+
         self.setup_ui()  # Set up the user interface
+        self.bind_shortcuts()  # Keyboard shortcuts of the review workflow
+
+        # Work not needed for the first paint is done right after it
+        self.root.after_idle(self.finish_startup)
+
+    def finish_startup(self):
+        """Import Pillow, build the image grid and set the icon once the window is painted."""
+        if self.first_paint_time is not None:
+            return  # Already done, e.g. by the startup benchmark
+        self.root.update_idletasks()  # Complete the first paint
+        self.first_paint_time = time.perf_counter() - STARTUP_TIME
+        logging.info(f"First paint {1000 * self.first_paint_time:.0f} ms after start")
+
+        load_imaging()
+        self.build_image_grid()
+        self.set_window_icon()
+
+    def set_window_icon(self):
+        """Set the window icon from cstretch.ico."""
+        try:
+            if getattr(sys, 'frozen', False):
+                script_dir = sys._MEIPASS
+            else:
+                script_dir = os.path.dirname(os.path.abspath(__file__))
+
+            icon_path = os.path.join(script_dir, "cstretch.ico")
+
+            if not os.path.exists(icon_path):
+                raise FileNotFoundError(f"Icon file not found at: {icon_path}")
+
+            icon_image = Image.open(icon_path)
+            icon_photo = ImageTk.PhotoImage(icon_image)
+            self.root.iconphoto(False, icon_photo)
+            self.root.icon_photo = icon_photo  # Keep a reference to prevent garbage collection
+        except Exception as e:
+            logging.warning(f"Failed to set window icon: {e}")
 
     def setup_ui(self):
         """Set up all the UI components in the main window."""
@@ -174,14 +2996,42 @@ class ImageProcessorApp:
         load_button = ttk.Button(controls_frame, text="Load Image", command=self.load_image)
         load_button.grid(row=0, column=1, padx=5, pady=5, sticky="w")
 
+        # Button to compare one output across several images of the folder
+        self.compare_button = ttk.Button(
+            controls_frame,
+            text="Compare",
+            command=self.open_comparison,
+            state='disabled'  # Disabled until an image is loaded
+        )
+        self.compare_button.grid(row=0, column=2, padx=5, pady=5, sticky="w")
+
+        # Buttons to save and load every processing parameter as a recipe file
+        self.save_recipe_button = ttk.Button(controls_frame, text="Save Recipe", command=self.save_recipe_file)
+        self.save_recipe_button.grid(row=0, column=3, padx=5, pady=5, sticky="w")
+        self.load_recipe_button = ttk.Button(controls_frame, text="Load Recipe", command=self.load_recipe_file)
+        self.load_recipe_button.grid(row=0, column=4, padx=5, pady=5, sticky="w")
+
+        # Button to choose which outputs a recipe saves, and in which format
+        self.outputs_button = ttk.Button(controls_frame, text="Outputs", command=self.open_outputs_editor)
+        self.outputs_button.grid(row=0, column=5, padx=5, pady=5, sticky="w")
+
         # Instruction label for user actions
         indicator_label = ttk.Label(
             controls_frame,
-            text="Left-click to view full-screen.\nRight-click to save image.",
+            text="Left-click to view full-screen.\nRight-click to save image.\nF1 for keyboard shortcuts.",
             font=("Arial", 10),
             foreground=self.colors["sub_text"]
         )
-        indicator_label.grid(row=0, column=2, padx=35, pady=5, sticky="w")
+        indicator_label.grid(row=0, column=6, padx=35, pady=5, sticky="w")
+
+        # Label showing the memory held by full-resolution images against the budget
+        self.memory_label = ttk.Label(
+            controls_frame,
+            text="",
+            font=("Arial", 10),
+            foreground=self.colors["sub_text"]
+        )
+        self.memory_label.grid(row=0, column=7, padx=5, pady=5, sticky="w")
 
         # Container for image preview and navigation buttons
         preview_container = ttk.Frame(top_frame)
@@ -223,6 +3073,28 @@ class ImageProcessorApp:
         self.right_arrow_button.grid(row=0, column=2, padx=(5, 0))
         self.right_arrow_button.grid_remove()  # Hide initially
 
+        # Slider to browse the pages of a multi-page image, shown only for stacks
+        self.frame_var = tk.IntVar(value=1)
+        self.frame_scale = tk.Scale(
+            preview_container,
+            from_=1,
+            to=1,
+            orient=tk.HORIZONTAL,
+            variable=self.frame_var,
+            command=self.on_frame_slider,
+            length=130,
+            showvalue=0,
+            background=self.colors["secondary_bg"],
+            troughcolor=self.colors["accent_purple"],
+            highlightthickness=0,
+            borderwidth=0
+        )
+        self.frame_scale.grid(row=1, column=0, columnspan=3, pady=(5, 0))
+        self.frame_scale.grid_remove()  # Hide initially
+        self.frame_label = ttk.Label(preview_container, text="", font=("Arial", 10))
+        self.frame_label.grid(row=2, column=0, columnspan=3)
+        self.frame_label.grid_remove()  # Hide initially
+
         # Frame for sliders controlling red and blue coefficients
         sliders_frame = ttk.Frame(top_frame)
         sliders_frame.grid(row=0, column=3, columnspan=2, padx=20, pady=5, sticky="e")
@@ -237,8 +3109,8 @@ class ImageProcessorApp:
 
         self.red_scale = tk.Scale(
             sliders_frame,
-            from_=0.0,
-            to=1.0,
+            from_=RECIPE_RANGES["red_coefficient"][0],
+            to=RECIPE_RANGES["red_coefficient"][1],
             orient=tk.HORIZONTAL,
             variable=self.red_var,
             resolution=0.05,
@@ -273,8 +3145,8 @@ class ImageProcessorApp:
 
         self.blue_scale = tk.Scale(
             sliders_frame,
-            from_=0.0,
-            to=1.0,
+            from_=RECIPE_RANGES["blue_coefficient"][0],
+            to=RECIPE_RANGES["blue_coefficient"][1],
             orient=tk.HORIZONTAL,
             variable=self.blue_var,
             resolution=0.05,
@@ -324,6 +3196,32 @@ class ImageProcessorApp:
         self.warning_label.grid(row=2, column=0, columnspan=4, pady=(0, 0), sticky="w")
         self.warning_label.configure(anchor='w')
 
+        # Channel mix shown in the last column, and the button to define new mixes
+        mix_label = ttk.Label(sliders_frame, text="Channel Mix:", font=("Arial", 10))
+        mix_label.grid(row=3, column=0, sticky="w")
+        self.selected_mix_var = tk.StringVar(value=NO_GREEN_MIX)
+        self.mix_box = ttk.Combobox(
+            sliders_frame,
+            textvariable=self.selected_mix_var,
+            values=[NO_GREEN_MIX],
+            state="disabled",  # Disabled until an image is loaded
+            width=24
+        )
+        self.mix_box.grid(row=3, column=1, padx=5, pady=5, sticky="w")
+        self.mix_box.bind("<<ComboboxSelected>>", lambda e: self.on_mix_selected())
+
+        self.edit_mixes_button = tk.Button(
+            sliders_frame,
+            text="✎",
+            command=self.open_mix_editor,
+            width=2,
+            height=1,
+            bg=self.colors["secondary_bg"],
+            fg=self.colors["text"],
+            relief='flat'
+        )
+        self.edit_mixes_button.grid(row=3, column=2, padx=5, pady=5, sticky="w")
+
         # Frame for threshold controls
         control_frame = ttk.Frame(self.root)
         control_frame.grid(row=1, column=0, sticky="ew", padx=10, pady=10)
@@ -375,22 +3273,104 @@ class ImageProcessorApp:
             style='InverseClip.TCheckbutton',
             state='disabled'  # Disabled until an image is loaded
         )
-        self.inverse_lower_clip_checkbox.grid(row=0, column=3, padx=5, pady=5, sticky="w")
+        self.inverse_lower_clip_checkbox.grid(row=0, column=3, padx=5, pady=5, sticky="w")
+
+        # Label and slider for Upper Threshold
+        upper_threshold_label = ttk.Label(control_frame, text="Upper Threshold:", font=("Arial", 10))
+        upper_threshold_label.grid(row=0, column=4, padx=20, pady=5, sticky="w")
+        self.upper_threshold_var = tk.IntVar(value=255)
+        self.upper_threshold_var.trace_add("write", self.update_upper_threshold_label)
+
+        self.upper_threshold_scale = tk.Scale(
+            control_frame,
+            from_=0,
+            to=255,
+            orient=tk.HORIZONTAL,
+            variable=self.upper_threshold_var,
+            resolution=1,
+            command=lambda val: self.apply_custom_stretch(),
+            length=300,
+            showvalue=0,
+            background=self.colors["secondary_bg"],
+            troughcolor=self.colors["sub_text"],
+            highlightthickness=0,
+            borderwidth=0,
+            state='disabled'  # Disabled until an image is loaded
+        )
+        self.upper_threshold_scale.grid(row=0, column=5, padx=5, pady=5, sticky="w")
+
+        # Label to show the current value of the Upper Threshold
+        self.upper_threshold_value_label = ttk.Label(
+            control_frame,
+            text=f"{self.upper_threshold_var.get()}",
+            font=("Arial", 10),
+            foreground=self.colors["sub_text"],
+            width=6,
+            anchor='center'
+        )
+        self.upper_threshold_value_label.grid(row=0, column=6, padx=5, pady=5, sticky="w")
+
+        # Checkbox to inverse the upper clip behavior
+        self.inverse_upper_clip_var = tk.BooleanVar(value=False)
+        self.inverse_upper_clip_checkbox = ttk.Checkbutton(
+            control_frame,
+            text="Inverse Clip",
+            variable=self.inverse_upper_clip_var,
+            command=self.apply_custom_stretch,
+            style='InverseClip.TCheckbutton',
+            state='disabled'  # Disabled until an image is loaded
+        )
+        self.inverse_upper_clip_checkbox.grid(row=0, column=7, padx=5, pady=5, sticky="w")
+
+        # Label and slider for the low autocontrast cutoff
+        low_cutoff_label = ttk.Label(control_frame, text="Low Cutoff %:", font=("Arial", 10))
+        low_cutoff_label.grid(row=1, column=0, padx=5, pady=5, sticky="w")
+        self.low_cutoff_var = tk.DoubleVar(value=0.0)
+        self.low_cutoff_var.trace_add("write", self.update_low_cutoff_label)
+
+        self.low_cutoff_scale = tk.Scale(
+            control_frame,
+            from_=RECIPE_RANGES["low_cutoff"][0],
+            to=RECIPE_RANGES["low_cutoff"][1],
+            orient=tk.HORIZONTAL,
+            variable=self.low_cutoff_var,
+            resolution=0.1,
+            command=lambda val: self.update_normalization(),
+            length=300,
+            showvalue=0,
+            background=self.colors["secondary_bg"],
+            troughcolor=self.colors["sub_text"],
+            highlightthickness=0,
+            borderwidth=0,
+            state='disabled'  # Disabled until an image is loaded
+        )
+        self.low_cutoff_scale.grid(row=1, column=1, padx=5, pady=5, sticky="w")
 
-        # Label and slider for Upper Threshold
-        upper_threshold_label = ttk.Label(control_frame, text="Upper Threshold:", font=("Arial", 10))
-        upper_threshold_label.grid(row=0, column=4, padx=20, pady=5, sticky="w")
-        self.upper_threshold_var = tk.IntVar(value=255)
-        self.upper_threshold_var.trace_add("write", self.update_upper_threshold_label)
+        # Label to show the current value of the low cutoff
+        self.low_cutoff_value_label = ttk.Label(
+            control_frame,
+            text=f"{self.low_cutoff_var.get():.1f}",
+            font=("Arial", 10),
+            foreground=self.colors["sub_text"],
+            width=6,
+            anchor='center'
+        )
+        self.low_cutoff_value_label.grid(row=1, column=2, padx=5, pady=5, sticky="w")
 
-        self.upper_threshold_scale = tk.Scale(
+        # Label and slider for the high autocontrast cutoff
+        high_cutoff_label = ttk.Label(control_frame, text="High Cutoff %:", font=("Arial", 10))
+        high_cutoff_label.grid(row=1, column=4, padx=20, pady=5, sticky="w")
+        self.high_cutoff_var = tk.DoubleVar(value=0.0)
+        self.high_cutoff_var.trace_add("write", self.update_high_cutoff_label)
+
+        self.high_cutoff_scale = tk.Scale(
             control_frame,
-            from_=0,
-            to=255,
+            from_=RECIPE_RANGES["high_cutoff"][0],
+            to=RECIPE_RANGES["high_cutoff"][1],
             orient=tk.HORIZONTAL,
-            variable=self.upper_threshold_var,
-            resolution=1,
-            command=lambda val: self.apply_custom_stretch(),
+            variable=self.high_cutoff_var,
+            resolution=0.1,
+            command=lambda val: self.update_normalization(),
             length=300,
             showvalue=0,
             background=self.colors["secondary_bg"],
@@ -399,30 +3379,86 @@ class ImageProcessorApp:
             borderwidth=0,
             state='disabled'  # Disabled until an image is loaded
         )
-        self.upper_threshold_scale.grid(row=0, column=5, padx=5, pady=5, sticky="w")
+        self.high_cutoff_scale.grid(row=1, column=5, padx=5, pady=5, sticky="w")
 
-        # Label to show the current value of the Upper Threshold
-        self.upper_threshold_value_label = ttk.Label(
+        # Label to show the current value of the high cutoff
+        self.high_cutoff_value_label = ttk.Label(
             control_frame,
-            text=f"{self.upper_threshold_var.get()}",
+            text=f"{self.high_cutoff_var.get():.1f}",
             font=("Arial", 10),
             foreground=self.colors["sub_text"],
             width=6,
             anchor='center'
         )
-        self.upper_threshold_value_label.grid(row=0, column=6, padx=5, pady=5, sticky="w")
+        self.high_cutoff_value_label.grid(row=1, column=6, padx=5, pady=5, sticky="w")
 
-        # Checkbox to inverse the upper clip behavior
-        self.inverse_upper_clip_var = tk.BooleanVar(value=False)
-        self.inverse_upper_clip_checkbox = ttk.Checkbutton(
+        # Entry for intensity levels ignored by normalization (e.g. "0" or "green:0")
+        ignore_frame = ttk.Frame(control_frame)
+        ignore_frame.grid(row=1, column=7, columnspan=2, padx=5, pady=5, sticky="w")
+        ignore_label = ttk.Label(ignore_frame, text="Ignore:", font=("Arial", 10))
+        ignore_label.grid(row=0, column=0, sticky="w")
+        self.ignore_values_var = tk.StringVar(value="")
+        self.ignore_values_entry = ttk.Entry(
+            ignore_frame,
+            textvariable=self.ignore_values_var,
+            width=12,
+            state='disabled'  # Disabled until an image is loaded
+        )
+        self.ignore_values_entry.grid(row=0, column=1, padx=5, sticky="w")
+        self.ignore_values_entry.bind("<Return>", self.apply_ignore_values)
+        self.ignore_values_entry.bind("<FocusOut>", self.apply_ignore_values)
+
+        # Region of interest restricting the histograms and, optionally, the processing
+        roi_label = ttk.Label(control_frame, text="ROI:", font=("Arial", 10))
+        roi_label.grid(row=2, column=0, padx=5, pady=5, sticky="w")
+        self.roi_mode_var = tk.StringVar(value=ROI_MODES[0])
+        self.roi_mode_box = ttk.Combobox(
             control_frame,
-            text="Inverse Clip",
-            variable=self.inverse_upper_clip_var,
-            command=self.apply_custom_stretch,
+            textvariable=self.roi_mode_var,
+            values=ROI_MODES,
+            state="disabled",  # Disabled until an image is loaded
+            width=12
+        )
+        self.roi_mode_box.grid(row=2, column=1, padx=5, pady=5, sticky="w")
+        self.roi_mode_box.bind("<<ComboboxSelected>>", lambda e: self.update_roi())
+
+        # Inset of the rectangle and circle regions, in percent of the frame
+        roi_inset_label = ttk.Label(control_frame, text="Inset %:", font=("Arial", 10))
+        roi_inset_label.grid(row=2, column=2, padx=5, pady=5, sticky="e")
+        self.roi_inset_var = tk.DoubleVar(value=0.0)
+        self.roi_inset_box = ttk.Spinbox(
+            control_frame,
+            from_=RECIPE_RANGES["roi_inset"][0],
+            to=RECIPE_RANGES["roi_inset"][1],
+            increment=1,
+            textvariable=self.roi_inset_var,
+            command=self.update_roi,
+            state="disabled",  # Disabled until an image is loaded
+            width=5
+        )
+        self.roi_inset_box.grid(row=2, column=3, padx=5, pady=5, sticky="w")
+        self.roi_inset_box.bind("<Return>", lambda e: self.update_roi())
+
+        # Checkbox to process only the bounding box of the region of interest
+        self.roi_crop_var = tk.BooleanVar(value=False)
+        self.roi_crop_checkbox = ttk.Checkbutton(
+            control_frame,
+            text="Crop to ROI",
+            variable=self.roi_crop_var,
+            command=self.update_roi,
             style='InverseClip.TCheckbutton',
             state='disabled'  # Disabled until an image is loaded
         )
-        self.inverse_upper_clip_checkbox.grid(row=0, column=7, padx=5, pady=5, sticky="w")
+        self.roi_crop_checkbox.grid(row=2, column=4, padx=20, pady=5, sticky="w")
+
+        # Label showing the size and channel means of the region of interest
+        self.roi_stats_label = ttk.Label(
+            control_frame,
+            text="",
+            font=("Arial", 10),
+            foreground=self.colors["sub_text"]
+        )
+        self.roi_stats_label.grid(row=2, column=5, columnspan=4, padx=5, pady=5, sticky="w")
 
         # Button to reset threshold values to defaults
         self.reset_thresholds_button = tk.Button(
@@ -438,6 +3474,75 @@ class ImageProcessorApp:
         )
         self.reset_thresholds_button.grid(row=0, column=8, padx=25, pady=5, sticky="w")
 
+        # Stretch curve applied between the thresholds, and its parameter
+        curve_label = ttk.Label(control_frame, text="Stretch Curve:", font=("Arial", 10))
+        curve_label.grid(row=3, column=0, padx=5, pady=5, sticky="w")
+        self.curve_var = tk.StringVar(value="Linear")
+        self.curve_box = ttk.Combobox(
+            control_frame,
+            textvariable=self.curve_var,
+            values=list(STRETCH_CURVES),
+            state="disabled",  # Disabled until an image is loaded
+            width=12
+        )
+        self.curve_box.grid(row=3, column=1, padx=5, pady=5, sticky="w")
+        self.curve_box.bind("<<ComboboxSelected>>", self.on_curve_selected)
+
+        curve_parameter_label = ttk.Label(control_frame, text="Parameter:", font=("Arial", 10))
+        curve_parameter_label.grid(row=3, column=2, padx=5, pady=5, sticky="e")
+        self.curve_parameter_var = tk.StringVar(value="")
+        self.curve_parameter_entry = ttk.Entry(
+            control_frame,
+            textvariable=self.curve_parameter_var,
+            width=20,
+            state='disabled'  # Disabled until an image is loaded
+        )
+        self.curve_parameter_entry.grid(row=3, column=3, columnspan=2, padx=5, pady=5, sticky="w")
+        self.curve_parameter_entry.bind("<Return>", self.apply_custom_stretch)
+        self.curve_parameter_entry.bind("<FocusOut>", self.apply_custom_stretch)
+
+        # Local contrast enhancement (CLAHE) applied to the normalized channels
+        self.clahe_var = tk.BooleanVar(value=False)
+        self.clahe_checkbox = ttk.Checkbutton(
+            control_frame,
+            text="Local Contrast",
+            variable=self.clahe_var,
+            command=self.update_local_contrast,
+            style='InverseClip.TCheckbutton',
+            state='disabled'  # Disabled until an image is loaded
+        )
+        self.clahe_checkbox.grid(row=3, column=5, padx=5, pady=5, sticky="w")
+
+        clahe_clip_label = ttk.Label(control_frame, text="Clip:", font=("Arial", 10))
+        clahe_clip_label.grid(row=3, column=6, padx=5, pady=5, sticky="e")
+        self.clahe_clip_var = tk.DoubleVar(value=2.0)
+        self.clahe_clip_box = ttk.Spinbox(
+            control_frame,
+            from_=RECIPE_RANGES["local_contrast_clip"][0],
+            to=RECIPE_RANGES["local_contrast_clip"][1],
+            increment=0.5,
+            textvariable=self.clahe_clip_var,
+            command=self.update_local_contrast,
+            state="disabled",  # Disabled until an image is loaded
+            width=5
+        )
+        self.clahe_clip_box.grid(row=3, column=7, padx=5, pady=5, sticky="w")
+        self.clahe_clip_box.bind("<Return>", lambda e: self.update_local_contrast())
+
+        self.clahe_grid_var = tk.IntVar(value=8)
+        self.clahe_grid_box = ttk.Spinbox(
+            control_frame,
+            from_=RECIPE_RANGES["local_contrast_grid"][0],
+            to=RECIPE_RANGES["local_contrast_grid"][1],
+            increment=1,
+            textvariable=self.clahe_grid_var,
+            command=self.update_local_contrast,
+            state="disabled",  # Disabled until an image is loaded
+            width=4
+        )
+        self.clahe_grid_box.grid(row=3, column=8, padx=5, pady=5, sticky="w")
+        self.clahe_grid_box.bind("<Return>", lambda e: self.update_local_contrast())
+
         # Status bar to display messages to the user
         self.status_bar = ttk.Label(
             self.root,
@@ -448,35 +3553,54 @@ class ImageProcessorApp:
         )
         self.status_bar.grid(row=4, column=0, sticky="ew")
 
-        # Frame to hold all the image displays
+        # Canvas plotting the histogram of each normalized channel with threshold markers.
+        # The plots are rendered into a single canvas image; only the markers are canvas items.
+        plot_width, plot_height = self.histogram_size
+        self.histogram_canvas = tk.Canvas(
+            self.root,
+            width=self.num_columns * (plot_width + self.histogram_gap),
+            height=plot_height,
+            bg=self.colors["primary_bg"],
+            highlightthickness=0
+        )
+        self.histogram_canvas.grid(row=3, column=0, padx=10, pady=(0, 10))
+        self.histogram_image_item = self.histogram_canvas.create_image(0, 0, anchor="nw")
+        for col, key in enumerate(CHANNEL_KEYS):
+            for threshold in ("lower", "upper"):
+                self.histogram_markers[(key, threshold)] = self.histogram_canvas.create_line(
+                    0, 0, 0, plot_height,
+                    fill=self.colors["text"] if threshold == "upper" else self.colors["sub_text"],
+                    width=2,
+                    state="hidden"  # Shown once an image is loaded
+                )
+        self.histogram_canvas.bind("<Button-1>", self.on_histogram_press)
+        self.histogram_canvas.bind("<B1-Motion>", self.on_histogram_drag)
+        self.histogram_canvas.bind("<ButtonRelease-1>", self.on_histogram_release)
+        self.lower_threshold_var.trace_add("write", self.update_histogram_markers)
+        self.upper_threshold_var.trace_add("write", self.update_histogram_markers)
+
+        # Frame to hold all the image displays, filled by build_image_grid after the first paint
         self.image_frame = ttk.Frame(self.root)
         self.image_frame.grid(row=2, column=0, sticky="nsew", padx=10, pady=10)
         self.image_frame.columnconfigure(tuple(range(self.num_columns)), weight=1)
         for r in range(6):
             self.image_frame.rowconfigure(r, weight=1)
 
-        # Titles for different sets of images
-        original_titles = [
-            "Grayscale",
-            "Green Channel",
-            "Red Channel",
-            "Blue Channel",
-            "Grayscale No Green"
-        ]
-        normalized_titles = [
-            "Grayscale Normalized",
-            "Green Normalized",
-            "Red Normalized",
-            "Blue Normalized",
-            "Grayscale No Green Normalized"
-        ]
-        custom_titles = [
-            "Grayscale Custom Stretch",
-            "Green Custom Stretch",
-            "Red Custom Stretch",
-            "Blue Custom Stretch",
-            "Grayscale No Green Custom Stretch"
-        ]
+        # Add tooltips to various UI elements for better user experience
+        self.add_tooltips()
+
+    def build_image_grid(self):
+        """Create the title and image labels of the output grid."""
+        if self.all_labels or self.atlas_canvas is not None:
+            return  # Already built
+        if self.use_atlas:
+            self.build_image_atlas()
+            return
+
+        # Titles for different sets of images, following the selected channel mix
+        original_titles = self.image_titles[:self.num_columns]
+        normalized_titles = self.image_titles[self.num_columns:2 * self.num_columns]
+        custom_titles = self.image_titles[2 * self.num_columns:]
 
         # Add title labels for original images
         for col, title in enumerate(original_titles):
@@ -488,6 +3612,8 @@ class ImageProcessorApp:
                 foreground=fg_color
             )
             title_label.grid(row=0, column=col, padx=5, pady=5)
+            if col == self.num_columns - 1:
+                self.mix_title_labels.append(title_label)  # Retitled when the channel mix changes
 
         # Add title labels for normalized images
         for col, title in enumerate(normalized_titles):
@@ -499,6 +3625,8 @@ class ImageProcessorApp:
                 foreground=fg_color
             )
             title_label.grid(row=2, column=col, padx=5, pady=5)
+            if col == self.num_columns - 1:
+                self.mix_title_labels.append(title_label)  # Retitled when the channel mix changes
 
         # Add title labels for custom stretched images
         for col, title in enumerate(custom_titles):
@@ -510,6 +3638,8 @@ class ImageProcessorApp:
                 foreground=fg_color
             )
             title_label.grid(row=4, column=col, padx=5, pady=5)
+            if col == self.num_columns - 1:
+                self.mix_title_labels.append(title_label)  # Retitled when the channel mix changes
 
         # Create placeholders for image thumbnails
         for row in [1, 3, 5]:
@@ -523,10 +3653,112 @@ class ImageProcessorApp:
                     highlightthickness=0
                 )
                 label.grid(row=row, column=col, padx=5, pady=5, sticky="nsew")
+
+                # Bind left-click to view full-screen and right-click to save the image
+                idx = len(self.all_labels)
+                label.bind("<Button-1>", lambda e, idx=idx: self.on_label_left_click(idx))
+                label.bind("<Button-3>", lambda e, idx=idx: self.on_label_right_click(idx))
                 self.all_labels.append(label)
 
-        # Add tooltips to various UI elements for better user experience
-        self.add_tooltips()
+    def build_image_atlas(self):
+        """
+        Create the output grid as one canvas showing a single composed atlas image.
+
+        Thumbnails are pasted into the atlas and only the changed region is uploaded to
+        Tk, once per update, instead of creating one Tk image per slot. Clicks are mapped
+        back to their slot, so full-screen view and saving work as with the labels.
+        """
+        width, height = self.atlas_cell[0] * self.num_columns, self.atlas_cell[1] * 3
+        self.atlas_canvas = tk.Canvas(
+            self.image_frame,
+            width=width,
+            height=height,
+            bg=self.colors["primary_bg"],
+            highlightthickness=0
+        )
+        self.atlas_canvas.grid(row=0, column=0, rowspan=6, columnspan=self.num_columns, sticky="n")
+
+        self.atlas_image = Image.new("RGB", (width, height), self.colors["primary_bg"])
+        self.atlas_photo = ImageTk.PhotoImage(self.atlas_image)
+        self.atlas_canvas.create_image(0, 0, image=self.atlas_photo, anchor="nw")
+        for idx, title in enumerate(self.image_titles):
+            row, col = divmod(idx, self.num_columns)
+            title_label = ttk.Label(
+                self.atlas_canvas,
+                text=title,
+                font=("Arial", 10, "bold"),
+                foreground=self.get_title_color(title)
+            )
+            self.atlas_canvas.create_window(
+                (col + 0.5) * self.atlas_cell[0], row * self.atlas_cell[1] + self.atlas_title_height / 2,
+                window=title_label
+            )
+            if col == self.num_columns - 1:
+                self.mix_title_labels.append(title_label)  # Retitled when the channel mix changes
+            self.paste_atlas_image(idx, None)  # Empty placeholder
+
+        # Bind left-click to view full-screen and right-click to save the image under the pointer
+        self.atlas_canvas.bind("<Button-1>", lambda e: self.on_atlas_click(e, self.on_label_left_click))
+        self.atlas_canvas.bind("<Button-3>", lambda e: self.on_atlas_click(e, self.on_label_right_click))
+
+    def paste_atlas_image(self, idx, image):
+        """
+        Draw a thumbnail, or an empty placeholder, into its atlas slot.
+
+        The upload to Tk is deferred until idle, so the slots updated together are
+        uploaded as one region.
+
+        Parameters:
+            idx (int): Index of the slot, as in image_titles.
+            image (PIL.Image): 8-bit thumbnail of at most 250x250 pixels, or None.
+        """
+        row, col = divmod(idx, self.num_columns)
+        left = col * self.atlas_cell[0] + (self.atlas_cell[0] - 254) // 2
+        top = row * self.atlas_cell[1] + self.atlas_title_height
+        slot = (left, top, left + 254, top + 254)  # 250x250 thumbnail area inside a 2 pixel border
+        ImageDraw.Draw(self.atlas_image).rectangle(
+            (left, top, left + 253, top + 253), fill=self.colors["secondary_bg"], outline="#000000", width=2
+        )
+        if image is not None:
+            x = left + 2 + (250 - image.width) // 2
+            y = top + 2 + (250 - image.height) // 2
+            self.atlas_image.paste(image, (x, y))  # Grayscale thumbnails are converted to RGB
+            self.atlas_boxes[idx] = (x, y, x + image.width, y + image.height)
+
+        if self.atlas_dirty is None:
+            self.atlas_dirty = slot
+        else:
+            self.atlas_dirty = (
+                min(self.atlas_dirty[0], slot[0]), min(self.atlas_dirty[1], slot[1]),
+                max(self.atlas_dirty[2], slot[2]), max(self.atlas_dirty[3], slot[3])
+            )
+        if self.atlas_flush_id is None:
+            self.atlas_flush_id = self.root.after_idle(self.flush_atlas)
+
+    def flush_atlas(self):
+        """Upload the changed region of the atlas to its Tk image in one go."""
+        self.atlas_flush_id = None
+        if self.atlas_dirty is None:
+            return
+        box, self.atlas_dirty = self.atlas_dirty, None
+        region = self.atlas_image.crop(box)
+        staging = self.atlas_staging.get(region.size)
+        if staging is None:
+            if len(self.atlas_staging) >= 8:
+                self.atlas_staging.clear()  # Only a few region sizes recur: one slot, a row, the grid
+            staging = self.atlas_staging[region.size] = ImageTk.PhotoImage(region)
+        else:
+            staging.paste(region)
+        # Tk copies the staged region into the atlas image without converting pixels again
+        self.atlas_photo.tk.call(str(self.atlas_photo), "copy", str(staging), "-to", box[0], box[1])
+
+    def on_atlas_click(self, event, handler):
+        """Forward a click on the atlas to the handler of the slot under the pointer, if any."""
+        x, y = self.atlas_canvas.canvasx(event.x), self.atlas_canvas.canvasy(event.y)
+        for idx, (left, top, right, bottom) in self.atlas_boxes.items():
+            if left <= x < right and top <= y < bottom:
+                handler(idx)
+                return
 
     def get_title_color(self, title):
         """Determine the color of the title based on the image type."""
@@ -557,6 +3789,14 @@ class ImageProcessorApp:
         """Update the upper threshold label when the slider value changes."""
         self.upper_threshold_value_label.config(text=f"{self.upper_threshold_var.get()}")
 
+    def update_low_cutoff_label(self, *args):
+        """Update the low cutoff label when the slider value changes."""
+        self.low_cutoff_value_label.config(text=f"{self.low_cutoff_var.get():.1f}")
+
+    def update_high_cutoff_label(self, *args):
+        """Update the high cutoff label when the slider value changes."""
+        self.high_cutoff_value_label.config(text=f"{self.high_cutoff_var.get():.1f}")
+
     def load_image(self):
         """Handle the loading of an image file."""
         file_path = filedialog.askopenfilename(
@@ -565,49 +3805,7 @@ class ImageProcessorApp:
         )
         if not file_path:
             return  # User canceled the file dialog
-
-        try:
-            # Open the selected image and convert it to RGB
-            self.original_image_loaded = Image.open(file_path).convert("RGB")
-
-            if self.invert_before_var.get():
-                # Invert the image colors if the checkbox is selected
-                self.original_image = ImageOps.invert(self.original_image_loaded)
-                self.status_bar.config(text=f"Loaded and inverted image: {file_path}")
-                logging.info(f"Loaded and inverted image: {file_path}")
-            else:
-                self.original_image = self.original_image_loaded
-                self.status_bar.config(text=f"Loaded image: {file_path}")
-                logging.info(f"Loaded image: {file_path}")
-        except Exception as e:
-            # Show an error message if the image fails to load
-            messagebox.showerror("Error", f"Failed to load image.\n{e}")
-            logging.error(f"Failed to load image: {file_path} with error: {e}")
-            return
-
-        # Get the folder containing the image and list all supported image files
-        folder = os.path.dirname(file_path)
-        supported_extensions = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff")
-        self.image_list = sorted([
-            os.path.join(folder, f) for f in os.listdir(folder)
-            if f.lower().endswith(supported_extensions)
-        ])
-        try:
-            # Set the current image index based on the loaded image
-            self.current_image_index = self.image_list.index(file_path)
-        except ValueError:
-            self.current_image_index = -1  # Image not found in the list
-
-        self.enable_widgets()  # Enable UI widgets now that an image is loaded
-
-        self.process_images()  # Process the loaded image
-        self.display_images()  # Display all processed images
-        self.update_warning_label()  # Update any warning messages
-        self.apply_custom_stretch()  # Apply custom contrast stretching
-
-        self.update_preview_label()  # Update the preview thumbnail
-
-        self.update_navigation_arrows()  # Update navigation buttons visibility
+        self.load_image_from_path(file_path)
 
     def enable_widgets(self):
         """Enable UI widgets that were disabled until an image was loaded."""
@@ -615,90 +3813,482 @@ class ImageProcessorApp:
         self.blue_scale.config(state='normal')
         self.lower_threshold_scale.config(state='normal')
         self.upper_threshold_scale.config(state='normal')
+        self.low_cutoff_scale.config(state='normal')
+        self.high_cutoff_scale.config(state='normal')
+        self.ignore_values_entry.config(state='normal')
 
         self.inverse_lower_clip_checkbox.config(state='normal')
         self.inverse_upper_clip_checkbox.config(state='normal')
 
         self.reset_thresholds_button.config(state='normal')
         self.reset_coefficients_button.config(state='normal')
+        self.compare_button.config(state='normal')
+        self.roi_mode_box.config(state='readonly')
+        self.mix_box.config(state='readonly')
+        self.curve_box.config(state='readonly')
+        self.curve_parameter_entry.config(state='normal')
+        self.roi_inset_box.config(state='normal')
+        self.roi_crop_checkbox.config(state='normal')
+        self.clahe_checkbox.config(state='normal')
+        self.clahe_clip_box.config(state='normal')
+        self.clahe_grid_box.config(state='normal')
+
+    def update_bit_depth(self):
+        """Rescale the threshold sliders when the loaded image's bit depth changes."""
+        max_value = max_value_of(self.original_image)
+        if max_value == self.max_value:
+            return
+
+        ratio = max_value / self.max_value
+        lower = round(self.lower_threshold_var.get() * ratio)
+        upper = round(self.upper_threshold_var.get() * ratio)
+        self.max_value = max_value
+        self.lower_threshold_scale.config(to=max_value - 1)
+        self.upper_threshold_scale.config(to=max_value)
+        self.lower_threshold_var.set(min(lower, max_value - 1))
+        self.upper_threshold_var.set(min(upper, max_value))
+        logging.info(f"Threshold range set to 0-{max_value}.")
 
     def on_invert_checkbox_toggle(self):
         """Handle the event when the invert image checkbox is toggled."""
         if not self.original_image_loaded:
             return  # No image loaded yet
 
-        try:
-            if self.invert_before_var.get():
-                # Invert the image if checkbox is selected
-                self.original_image = ImageOps.invert(self.original_image_loaded)
-                self.status_bar.config(text="Image inverted before processing.")
-                logging.info("Image inverted before processing.")
+        try:
+            if self.invert_before_var.get():
+                # Invert the image if checkbox is selected
+                self.original_image = invert_image(self.original_image_loaded)
+                self.status_bar.config(text="Image inverted before processing.")
+                logging.info("Image inverted before processing.")
+            else:
+                # Use the original image without inversion
+                self.original_image = self.original_image_loaded
+                self.status_bar.config(text="Image loaded without inversion.")
+                logging.info("Image loaded without inversion.")
+
+            # Re-process and display images after inversion toggle
+            self.process_images()
+            self.display_images()
+            self.update_warning_label()
+            self.apply_custom_stretch()
+        except Exception as e:
+            # Show an error message if inversion fails
+            messagebox.showerror("Error", f"Failed to invert image.\n{e}")
+            logging.error(f"Failed to invert image with error: {e}")
+
+    def process_images(self, prepared=None):
+        """
+        Process the original image into various channels and cache their histograms.
+
+        Parameters:
+            prepared (dict): Result of analyze_image for the current image and settings,
+                computed on the background loader; computed here if None.
+        """
+        if prepared is None:
+            # The cache is copied so that new masks are only stored, and tracked, below
+            prepared = analyze_image(
+                self.original_image_loaded, self.original_image, self.image_path,
+                self.processing_settings(), dict(self.roi_masks)
+            )
+        # Restrict the histograms, and optionally the processing, to the region of interest
+        if prepared["roi_key"] is not None:
+            self.remember_roi_mask(prepared["roi_key"], prepared["roi_full_mask"])
+        self.roi_mask = prepared["roi_mask"]
+        self.source_image = prepared["source_image"]
+
+        for key, image in prepared["channels"].items():
+            setattr(self, f"{key}_image", image)
+        self.mix_images = prepared["mix_images"]
+        for attribute in ("original_image_loaded", "original_image", "source_image"):
+            self.memory.track(attribute, getattr(self, attribute))
+        for key in CHANNEL_KEYS:
+            self.track_image(f"{key}_image")
+        self.track_mix_images()
+
+        # Cache histograms and thumbnails so later changes only rebuild lookup tables
+        self.histograms = dict(prepared["histograms"])
+        self.thumbnails = dict(prepared["thumbnails"])
+        self.update_normalization_luts()
+        self.update_roi_stats()
+        self.update_memory_usage()
+
+    def processing_settings(self):
+        """
+        Capture the settings analyze_image depends on.
+
+        Returns:
+            dict: The settings, also recording whether the image is inverted first.
+        """
+        return {
+            "invert": self.invert_before_var.get(),
+            "roi_mode": self.roi_mode_var.get(),
+            "roi_inset": self.get_roi_inset(),
+            "roi_crop": self.roi_crop_var.get(),
+            "mixes": self.all_channel_mixes(),
+            "selected_mix": self.selected_mix_var.get()
+        }
+
+    def get_roi_inset(self):
+        """Return the ROI inset in percent, 0 if the spinbox does not hold a valid number."""
+        try:
+            return min(max(float(self.roi_inset_var.get()), 0.0), 45.0)
+        except (tk.TclError, ValueError):
+            return 0.0
+
+    def remember_roi_mask(self, key, mask):
+        """
+        Keep a region of interest mask for the other images of its folder.
+
+        Images of the same size in the same folder come from the same camera, so they
+        share one mask; the automatic field of view is only detected once per folder.
+        The masks are tracked against the memory budget, so this is only called on the
+        Tk thread; analyze_image builds them from a copy of the cache.
+
+        Parameters:
+            key (tuple): Cache key of the mask, see roi_mask_key.
+            mask (PIL.Image): The mask, as built for the image.
+        """
+        if key not in self.roi_masks:
+            self.roi_masks[key] = mask
+            folder, size, mode, inset = key
+            logging.info(f"Built {mode} ROI mask for {size[0]}x{size[1]} images in {folder}")
+            self.memory.track(f"roi_mask {key}", mask, lambda: self.roi_masks.pop(key, None))
+        self.memory.touch(f"roi_mask {key}")
+
+    def update_roi(self, event=None):
+        """Re-process the image after a region of interest change."""
+        if not self.original_image:
+            return  # No image to process
+
+        self.process_images()
+        self.display_images()
+        self.apply_custom_stretch()
+
+    def update_roi_stats(self):
+        """Show the size of the region of interest and the mean of each channel inside it."""
+        if self.roi_mask is None:
+            coverage = "ROI: full frame"
+        else:
+            width, height = self.original_image.size
+            coverage = f"ROI: {100 * self.roi_mask.histogram()[255] / (width * height):.1f}% of frame"
+        means = " ".join(
+            f"{label} {histogram_mean(self.histograms[key]):.1f}"
+            for label, key in (("Gray", "gray"), ("R", "red"), ("G", "green"), ("B", "blue"))
+        )
+        self.roi_stats_label.config(text=f"{coverage}  |  Mean {means}")
+
+    def cache_channel(self, key):
+        """Cache the histogram and thumbnail of a channel for live updates."""
+        image = getattr(self, f"{key}_image")
+        for other in self.histograms:
+            if other != key and getattr(self, f"{other}_image") is image:
+                # Channels sharing the same data (high-bit-depth images) share the cache
+                self.histograms[key] = self.histograms[other]
+                self.thumbnails[key] = self.thumbnails[other]
+                return
+        self.histograms[key] = channel_histogram(image, self.roi_mask)
+        self.thumbnails[key] = self.resize_image(image, 250, 250)
+
+    def update_normalization_luts(self, keys=CHANNEL_KEYS):
+        """Rebuild the normalization lookup tables from the cached histograms."""
+        cutoff = (self.low_cutoff_var.get(), self.high_cutoff_var.get())
+        for key in keys:
+            bounds = normalization_bounds(self.histograms[key], cutoff, self.ignore_values[key])
+            self.normalize_luts[key] = normalize_lut(bounds, self.max_value + 1)
+            self.normalized_histograms.pop(key, None)
+            setattr(self, f"{key}_normalized", None)  # Full resolution is materialized on demand
+
+    def update_normalization(self, event=None):
+        """Re-normalize from the cached histograms after a cutoff or ignore change."""
+        if not self.original_image:
+            return  # No image to process
+
+        self.update_normalization_luts()
+        self.display_normalized_images()
+        self.apply_custom_stretch()
+
+    def apply_ignore_values(self, event=None):
+        """Parse the ignore values entry and re-normalize if they changed."""
+        try:
+            ignore_values = parse_ignore_values(self.ignore_values_var.get())
+        except ValueError as e:
+            self.status_bar.config(text=f"Invalid ignore values: {e}")
+            logging.warning(f"Invalid ignore values '{self.ignore_values_var.get()}': {e}")
+            return
+        if ignore_values != self.ignore_values:
+            self.ignore_values = ignore_values
+            self.update_normalization()
+
+    def display_images(self):
+        """Display the original and normalized channel thumbnails in the UI."""
+        for col, key in enumerate(CHANNEL_KEYS):
+            self.set_label_image(col, to_display_image(self.thumbnails[key]))
+        self.display_normalized_images()
+
+    def display_normalized_images(self, keys=CHANNEL_KEYS):
+        """
+        Display the normalized thumbnails by remapping the cached channel thumbnails.
+
+        With local contrast enhancement on, the enhanced thumbnails are kept so the
+        custom stretch can be remapped on top of them without running CLAHE again.
+
+        Parameters:
+            keys (tuple): Channels to redisplay.
+        """
+        settings = self.get_clahe_settings()
+        enhanced = {}
+        for key in keys:
+            col = CHANNEL_KEYS.index(key)
+            if settings is None:
+                self.enhanced_thumbnails.pop(key, None)
+                thumbnail = to_display_image(self.thumbnails[key], self.normalize_luts[key])
+            else:
+                # Channels sharing a thumbnail and table (high-bit-depth images) are enhanced once
+                cache_key = (id(self.thumbnails[key]), id(self.normalize_luts[key]))
+                if cache_key not in enhanced:
+                    normalized = apply_lut(self.thumbnails[key], self.normalize_luts[key])
+                    enhanced[cache_key] = clahe(normalized, *settings, executor=worker_pool())
+                self.enhanced_thumbnails[key] = enhanced[cache_key]
+                thumbnail = to_display_image(self.enhanced_thumbnails[key])
+            self.set_label_image(self.num_columns + col, thumbnail)
+        self.update_histogram_panel()
+
+    def get_clahe_settings(self, disabled=False):
+        """
+        Return the local contrast enhancement settings.
+
+        Parameters:
+            disabled (bool): Return the settings even when the stage is disabled.
+
+        Returns:
+            tuple or None: (clip limit, grid size), or None when the stage is disabled.
+        """
+        if not (disabled or self.clahe_var.get()):
+            return None
+        try:
+            clip_limit = min(max(float(self.clahe_clip_var.get()), 0.0), 10.0)
+            grid = min(max(int(self.clahe_grid_var.get()), 1), 32)
+        except (tk.TclError, ValueError):
+            clip_limit, grid = 2.0, 8  # Value is being edited and does not hold a number yet
+        return clip_limit, grid
+
+    def update_local_contrast(self):
+        """Re-apply local contrast enhancement after it was toggled or its settings changed."""
+        if not self.original_image:
+            return  # No image to process
+
+        for key in CHANNEL_KEYS:
+            setattr(self, f"{key}_normalized", None)  # Full resolution is materialized on demand
+        self.display_normalized_images()
+        self.apply_custom_stretch()
+
+    def update_histogram_panel(self):
+        """
+        Redraw the histogram plots from the cached histograms.
+
+        The plots show the normalized channels, which is what the thresholds apply to.
+        They are drawn into one image so the canvas only receives a single upload.
+        """
+        plot_width, plot_height = self.histogram_size
+        panel = Image.new(
+            "RGB",
+            (self.num_columns * (plot_width + self.histogram_gap), plot_height),
+            self.colors["secondary_bg"]
+        )
+        draw = ImageDraw.Draw(panel)
+        remapped = {}
+        for col, key in enumerate(CHANNEL_KEYS):
+            # Channels sharing a histogram and table (high-bit-depth images) are remapped once
+            cache_key = (id(self.histograms[key]), id(self.normalize_luts[key]))
+            if cache_key not in remapped:
+                remapped[cache_key] = remap_histogram(self.histograms[key], self.normalize_luts[key], plot_width)
+            counts = remapped[cache_key]
+            peak = max(counts) ** 0.5 or 1
+            x0 = col * (plot_width + self.histogram_gap)
+            color = self.get_title_color(self.image_titles[col])
+            for x, count in enumerate(counts):
+                if count:
+                    # Square-root scale keeps small populations visible next to large peaks
+                    bar = max(1, int(count ** 0.5 / peak * (plot_height - 1)))
+                    draw.line((x0 + x, plot_height - 1, x0 + x, plot_height - 1 - bar), fill=color)
+            draw.rectangle((x0 + plot_width, 0, x0 + plot_width + self.histogram_gap, plot_height), fill=self.colors["primary_bg"])
+
+        photo = ImageTk.PhotoImage(panel)
+        self.histogram_canvas.itemconfigure(self.histogram_image_item, image=photo)
+        self.histogram_canvas.image = photo  # Keep a reference to prevent garbage collection
+        self.update_histogram_markers()
+
+    def update_histogram_markers(self, *args):
+        """Move the threshold markers on the histogram plots without redrawing them."""
+        if not self.histograms:
+            return  # Nothing plotted yet
+
+        plot_width, plot_height = self.histogram_size
+        try:
+            thresholds = {
+                "lower": self.lower_threshold_var.get(),
+                "upper": self.upper_threshold_var.get()
+            }
+        except tk.TclError:
+            return  # Variable is being edited and does not hold a number yet
+        for col, key in enumerate(CHANNEL_KEYS):
+            x0 = col * (plot_width + self.histogram_gap)
+            for threshold, value in thresholds.items():
+                x = x0 + value * (plot_width - 1) / self.max_value
+                item = self.histogram_markers[(key, threshold)]
+                self.histogram_canvas.coords(item, x, 0, x, plot_height)
+                self.histogram_canvas.itemconfigure(item, state="normal")
+
+    def histogram_value_at(self, x):
+        """Return the threshold value under a canvas x coordinate, and the plot column."""
+        plot_width = self.histogram_size[0]
+        col = min(max(int(x // (plot_width + self.histogram_gap)), 0), self.num_columns - 1)
+        offset = x - col * (plot_width + self.histogram_gap)
+        value = round(offset * self.max_value / (plot_width - 1))
+        return min(max(value, 0), self.max_value), col
+
+    def on_histogram_press(self, event):
+        """Start dragging the threshold marker closest to the click."""
+        if not self.original_image:
+            return  # No image to process
+
+        value, col = self.histogram_value_at(event.x)
+        lower = self.lower_threshold_var.get()
+        upper = self.upper_threshold_var.get()
+        self.dragged_marker = "lower" if abs(value - lower) <= abs(value - upper) else "upper"
+        self.on_histogram_drag(event)
+
+    def on_histogram_drag(self, event):
+        """Move the dragged threshold marker and re-apply the custom stretch."""
+        if not self.dragged_marker:
+            return
+
+        value, col = self.histogram_value_at(event.x)
+        if self.dragged_marker == "lower":
+            self.lower_threshold_var.set(min(value, self.max_value - 1))
+        else:
+            self.upper_threshold_var.set(max(value, 1))
+        self.apply_custom_stretch()
+
+    def on_histogram_release(self, event):
+        """Stop dragging the threshold marker."""
+        self.dragged_marker = None
+
+    def set_label_image(self, idx, image):
+        """Show a thumbnail in the image label at the given index."""
+        self.build_image_grid()  # No-op once built after the first paint
+        if self.atlas_canvas is not None:
+            self.paste_atlas_image(idx, image)
+            return
+        photo = ImageTk.PhotoImage(image)
+        self.all_labels[idx].configure(image=photo)
+        self.all_labels[idx].image = photo  # Keep a reference to prevent garbage collection
+
+    def get_output_image(self, idx):
+        """
+        Return the full-resolution image for a display slot, materializing it on demand.
+
+        Parameters:
+            idx (int): Index of the image label.
+
+        Returns:
+            PIL.Image: The full-resolution image.
+        """
+        attribute = self.output_attributes[idx]
+        image = getattr(self, attribute)
+        if image is None:
+            key = CHANNEL_KEYS[idx % self.num_columns]
+            settings = self.get_clahe_settings()
+            if idx < self.num_columns:
+                image = self.get_channel_image(key)  # Released when over the memory budget
+            elif idx < 2 * self.num_columns:
+                image = apply_lut(self.get_channel_image(key), self.normalize_luts[key])
+                if settings is not None:
+                    image = clahe(image, *settings, executor=worker_pool())
+            elif settings is not None:
+                # Local contrast sits between normalization and the custom stretch
+                image = apply_lut(self.get_output_image(idx - self.num_columns), self.stretch_luts[key])
+            else:
+                image = apply_lut(self.get_channel_image(key), self.custom_luts[key])
+            setattr(self, attribute, image)
+            self.track_image(attribute)
+            self.update_memory_usage()
+        self.memory.touch(attribute)
+        return image
+
+    def get_channel_image(self, key):
+        """
+        Return the full-resolution image of a channel, recomputing it if it was released.
+
+        Parameters:
+            key (str): One of CHANNEL_KEYS.
+
+        Returns:
+            PIL.Image: The channel image.
+        """
+        attribute = f"{key}_image"
+        image = getattr(self, attribute)
+        if image is None:
+            if key == "gray_no_g":
+                image = self.get_mix_image(self.selected_mix_var.get())
+            elif self.source_image.mode == "I":
+                image = self.source_image  # High-bit-depth images have a single channel
+            elif key == "gray":
+                image = ImageOps.grayscale(self.source_image)
             else:
-                # Use the original image without inversion
-                self.original_image = self.original_image_loaded
-                self.status_bar.config(text="Image loaded without inversion.")
-                logging.info("Image loaded without inversion.")
+                image = self.source_image.getchannel(key[0].upper())  # "R", "G" or "B" band
+            setattr(self, attribute, image)
+            self.track_image(attribute)
+        self.memory.touch(attribute)
+        return image
 
-            # Re-process and display images after inversion toggle
-            self.process_images()
-            self.display_images()
-            self.update_warning_label()
-            self.apply_custom_stretch()
-        except Exception as e:
-            # Show an error message if inversion fails
-            messagebox.showerror("Error", f"Failed to invert image.\n{e}")
-            logging.error(f"Failed to invert image with error: {e}")
+    def get_mix_image(self, name):
+        """Return the image of a channel mix, recomputing it if it was released."""
+        if name not in self.mix_images:
+            mix = next(mix for mix in self.all_channel_mixes() if mix["name"] == name)
+            self.mix_images.update(compute_channel_mixes(self.source_image, [mix]))
+            self.track_mix_images()
+        self.memory.touch(f"mix {name}")
+        return self.mix_images[name]
 
-    def process_images(self):
-        """Process the original image into various channels and apply normalization."""
-        self.gray_image = ImageOps.grayscale(self.original_image)  # Convert to grayscale
-        self.green_image = self.original_image.split()[1]  # Extract green channel
-        self.red_image = self.original_image.split()[0]    # Extract red channel
-        self.blue_image = self.original_image.split()[2]   # Extract blue channel
-        self.gray_no_g_image = self.original_image.convert(
-            "L",
-            (
-                self.current_red_coeff,
-                0.0,
-                self.current_blue_coeff,
-                0
-            )
-        )  # Grayscale without green channel
+    def track_image(self, attribute):
+        """Track the recomputable full-resolution image held by an attribute."""
+        self.memory.track(attribute, getattr(self, attribute), lambda: setattr(self, attribute, None))
 
-        # Apply autocontrast normalization to each channel
-        self.gray_normalized = ImageOps.autocontrast(self.gray_image)
-        self.green_normalized = ImageOps.autocontrast(self.green_image)
-        self.red_normalized = ImageOps.autocontrast(self.red_image)
-        self.blue_normalized = ImageOps.autocontrast(self.blue_image)
-        self.gray_no_g_normalized = ImageOps.autocontrast(self.gray_no_g_image)
+    def track_mix_images(self):
+        """Track the channel mix images, which are recomputed when released."""
+        for name, image in self.mix_images.items():
+            self.memory.track(f"mix {name}", image, lambda name=name: self.mix_images.pop(name, None))
 
-    def display_images(self):
-        """Display all processed images in the UI."""
-        original_images = [
-            self.gray_image,
-            self.green_image,
-            self.red_image,
-            self.blue_image,
-            self.gray_no_g_image
-        ]
-        normalized_images = [
-            self.gray_normalized,
-            self.green_normalized,
-            self.red_normalized,
-            self.blue_normalized,
-            self.gray_no_g_normalized
-        ]
-        self.all_images = original_images + normalized_images  # Combine all images for display
+    def update_memory_usage(self):
+        """Release recomputable images if over the memory budget, and show the memory in use."""
+        self.memory.enforce()
+        self.memory_label.config(
+            text=f"Memory: {self.memory.usage() / 2 ** 20:.0f} / {self.memory.budget / 2 ** 20:.0f} MB"
+        )
+
+    def release_image_state(self):
+        """
+        Drop the full-resolution intermediates of the current image before another is loaded.
+
+        Everything dropped can be recomputed from the source image, so the display and
+        outputs stay usable if the next image fails to load.
+        """
+        for attribute in self.output_attributes:
+            setattr(self, attribute, None)
+        self.mix_images = {}
+        self.fullscreen_image = None  # The fullscreen window keeps its own resized copy
+        self.update_memory_usage()
 
-        for idx, img in enumerate(self.all_images):
-            img_resized = self.resize_image(img, 250, 250)  # Resize for thumbnail
-            photo = ImageTk.PhotoImage(img_resized)
-            self.all_labels[idx].configure(image=photo)
-            self.all_labels[idx].image = photo  # Keep a reference to prevent garbage collection
+    def on_label_left_click(self, idx):
+        """Show the image of the clicked label in full-screen."""
+        if self.original_image:
+            self.show_fullscreen(self.get_output_image(idx))
 
-            # Bind left-click to view full-screen and right-click to save the image
-            self.all_labels[idx].bind("<Button-1>", lambda e, im=img: self.show_fullscreen(im))
-            self.all_labels[idx].bind("<Button-3>", lambda e, im=img, idx=idx: self.save_image(im, idx))
+    def on_label_right_click(self, idx):
+        """Save the image of the clicked label."""
+        if self.original_image:
+            self.save_image(self.get_output_image(idx), idx)
 
     def apply_custom_stretch(self, event=None):
         """Apply custom contrast stretching based on user-defined thresholds."""
@@ -712,7 +4302,7 @@ class ImageProcessorApp:
 
         # Ensure that upper threshold is greater than lower threshold
         if lower >= upper:
-            upper = min(lower + 1, 255)
+            upper = min(lower + 1, self.max_value)
             self.upper_threshold_var.set(upper)
             self.upper_threshold_value_label.config(text=f"{upper}")
             self.status_bar.config(text="Upper Threshold adjusted to be at least one higher than Lower Threshold.")
@@ -720,84 +4310,59 @@ class ImageProcessorApp:
         else:
             self.status_bar.config(text="Applying custom contrast stretch.")
 
-        # Apply custom contrast stretching to each normalized image
-        self.gray_custom = self.custom_contrast_stretch(
-            self.gray_normalized, lower, upper, inverse_lower, inverse_upper
-        )
-        self.green_custom = self.custom_contrast_stretch(
-            self.green_normalized, lower, upper, inverse_lower, inverse_upper
-        )
-        self.red_custom = self.custom_contrast_stretch(
-            self.red_normalized, lower, upper, inverse_lower, inverse_upper
-        )
-        self.blue_custom = self.custom_contrast_stretch(
-            self.blue_normalized, lower, upper, inverse_lower, inverse_upper
-        )
-        self.gray_no_g_custom = self.custom_contrast_stretch(
-            self.gray_no_g_normalized, lower, upper, inverse_lower, inverse_upper
-        )
-        self.custom_images = [
-            self.gray_custom,
-            self.green_custom,
-            self.red_custom,
-            self.blue_custom,
-            self.gray_no_g_custom
-        ]
+        curve = self.curve_var.get()
+        parameter = self.curve_parameter_var.get().strip()
+        try:
+            # Combine normalization and stretching into one lookup table per channel
+            custom_luts, stretch_luts, combined = {}, {}, {}
+            for key in CHANNEL_KEYS:
+                counts = None
+                if STRETCH_CURVES[curve]["uses_histogram"]:
+                    counts = self.get_normalized_histogram(key)
+                stretch_lut = build_stretch_lut(
+                    lower, upper, inverse_lower, inverse_upper, self.max_value, curve, parameter, counts
+                )
+                stretch_luts[key] = stretch_lut
+                # Channels sharing both cached tables (high-bit-depth images) share the combined one
+                pair = (id(self.normalize_luts[key]), id(stretch_lut))
+                if pair not in combined:
+                    combined[pair] = compose_luts(self.normalize_luts[key], stretch_lut)
+                custom_luts[key] = combined[pair]
+        except ValueError as e:
+            self.status_bar.config(text=f"Invalid {curve} curve parameter: {e}")
+            logging.warning(f"Invalid {curve} curve parameter '{parameter}': {e}")
+            return
+
+        self.custom_luts = custom_luts
+        self.stretch_luts = stretch_luts
+        for key in CHANNEL_KEYS:
+            setattr(self, f"{key}_custom", None)  # Full resolution is materialized on demand
         self.display_custom_stretched_images()  # Update the display with stretched images
 
-    def custom_contrast_stretch(self, image, lower_threshold, upper_threshold, inverse_lower, inverse_upper):
-        """
-        Apply a custom contrast stretch to the image based on thresholds.
-        
-        Parameters:
-            image (PIL.Image): The image to process.
-            lower_threshold (int): The lower threshold value.
-            upper_threshold (int): The upper threshold value.
-            inverse_lower (bool): Whether to invert the lower clipping.
-            inverse_upper (bool): Whether to invert the upper clipping.
-        
-        Returns:
-            PIL.Image: The contrast-stretched image.
-        """
-        if upper_threshold == lower_threshold:
-            if inverse_lower:
-                return image.point(lambda p: 255 if p >= lower_threshold else 0)
-            else:
-                return image.point(lambda p: 0 if p < lower_threshold else 255)
-        elif upper_threshold < lower_threshold:
-            lower_threshold, upper_threshold = upper_threshold, lower_threshold
-
-        # Create a lookup table for mapping pixel values
-        lut = []
-        for i in range(256):
-            if i < lower_threshold:
-                lut.append(255 if inverse_lower else 0)
-            elif i > upper_threshold:
-                lut.append(0 if inverse_upper else 255)
-            else:
-                scaled = int((i - lower_threshold) * 255 / (upper_threshold - lower_threshold))
-                lut.append(scaled)
-        return image.point(lut)
+        if self.comparison_window:
+            self.comparison_window.refresh()  # Apply the same parameters to the compared images
 
-    def display_custom_stretched_images(self):
-        """Display the custom contrast-stretched images in the UI."""
-        custom_images = [
-            self.gray_custom,
-            self.green_custom,
-            self.red_custom,
-            self.blue_custom,
-            self.gray_no_g_custom
-        ]
-        for idx, img in enumerate(custom_images):
-            img_resized = self.resize_image(img, 250, 250)  # Resize for thumbnail
-            photo = ImageTk.PhotoImage(img_resized)
-            label_idx = self.num_columns*2 + idx  # Calculate label index for custom images
-            self.all_labels[label_idx].configure(image=photo)
-            self.all_labels[label_idx].image = photo  # Keep a reference to prevent garbage collection
+    def get_normalized_histogram(self, key):
+        """Return the histogram of a normalized channel, derived from the cached histogram."""
+        if key not in self.normalized_histograms:
+            self.normalized_histograms[key] = tuple(
+                remap_histogram(self.histograms[key], self.normalize_luts[key], self.max_value + 1)
+            )
+        return self.normalized_histograms[key]
+
+    def on_curve_selected(self, event=None):
+        """Reset the curve parameter to the selected curve's default and re-apply the stretch."""
+        self.curve_parameter_var.set(STRETCH_CURVES[self.curve_var.get()]["default"])
+        self.apply_custom_stretch()
 
-            # Bind left-click to view full-screen and right-click to save the image
-            self.all_labels[label_idx].bind("<Button-1>", lambda e, im=img: self.show_fullscreen(im))
-            self.all_labels[label_idx].bind("<Button-3>", lambda e, im=img, idx=label_idx: self.save_image(im, idx))
+    def display_custom_stretched_images(self):
+        """Display the custom contrast-stretched thumbnails in the UI."""
+        for col, key in enumerate(CHANNEL_KEYS):
+            if key in self.enhanced_thumbnails:
+                thumbnail = to_display_image(self.enhanced_thumbnails[key], self.stretch_luts[key])
+            else:
+                thumbnail = to_display_image(self.thumbnails[key], self.custom_luts[key])
+            self.set_label_image(2 * self.num_columns + col, thumbnail)
 
     def update_grayscale_no_g(self, event=None):
         """Update the grayscale image without the green channel based on coefficient sliders."""
@@ -809,60 +4374,134 @@ class ImageProcessorApp:
         self.current_red_coeff = red_val
         self.current_blue_coeff = blue_val
 
-        # Create a grayscale image without the green channel using custom coefficients
-        self.gray_no_g_image = self.original_image.convert(
-            "L",
-            (
-                self.current_red_coeff,
-                0.0,
-                self.current_blue_coeff,
-                0
-            )
+        # Re-mix only the Grayscale No Green channel with the new coefficients
+        self.mix_images.update(compute_channel_mixes(
+            self.source_image,
+            [no_green_mix(self.current_red_coeff, self.current_blue_coeff)]
+        ))
+        self.track_mix_images()
+        if self.selected_mix_var.get() == NO_GREEN_MIX:
+            self.gray_no_g_image = self.mix_images[NO_GREEN_MIX]
+            self.track_image("gray_no_g_image")
+            self.refresh_mix_column()
+
+        self.update_warning_label()  # Check for any coefficient warnings
+        self.apply_custom_stretch()   # Re-apply custom stretching with updated coefficients
+
+    def refresh_mix_column(self):
+        """Re-cache and redisplay the channel mix column after its image changed."""
+        self.cache_channel("gray_no_g")
+        self.update_normalization_luts(keys=("gray_no_g",))
+
+        self.set_label_image(4, to_display_image(self.thumbnails["gray_no_g"]))
+        self.display_normalized_images(keys=("gray_no_g",))
+
+    def all_channel_mixes(self):
+        """Return Grayscale No Green with the current coefficients, followed by the user mixes."""
+        return [no_green_mix(self.current_red_coeff, self.current_blue_coeff)] + self.channel_mixes
+
+    def selected_mix(self):
+        """Return the channel mix shown in the last column."""
+        name = self.selected_mix_var.get()
+        return next(mix for mix in self.all_channel_mixes() if mix["name"] == name)
+
+    def on_mix_selected(self):
+        """Show the selected channel mix in the last column."""
+        self.update_mix_titles()
+        if not self.original_image:
+            return  # No image to process
+
+        self.gray_no_g_image = self.get_mix_image(self.selected_mix_var.get())
+        self.track_image("gray_no_g_image")
+        self.refresh_mix_column()
+        self.apply_custom_stretch()
+        self.update_memory_usage()
+
+    def update_mix_titles(self):
+        """Title the last column after the selected channel mix."""
+        name = self.selected_mix_var.get()
+        titles = [name, f"{name} Normalized", f"{name} Custom Stretch"]
+        for row, (title, label) in enumerate(zip(titles, self.mix_title_labels)):
+            self.image_titles[row * self.num_columns + 4] = title
+            label.config(text=title)
+
+    def open_mix_editor(self):
+        """Open a dialog to define the user channel mixes."""
+        editor = tk.Toplevel(self.root)
+        editor.title("Channel Mixes")
+        editor.configure(bg=self.colors["primary_bg"])
+        editor.transient(self.root)
+
+        help_label = ttk.Label(
+            editor,
+            text=(
+                "One mix per line:\n"
+                "  Name: red, green, blue[, offset]   weighted mix, offset in 0-255 levels\n"
+                "  Name: LAB L* | HSV V | YCbCr Y       colour space channel"
+            ),
+            font=("Arial", 10),
+            foreground=self.colors["sub_text"]
         )
-        self.gray_no_g_normalized = ImageOps.autocontrast(self.gray_no_g_image)
-        self.gray_no_g_custom = self.custom_contrast_stretch(
-            self.gray_no_g_normalized,
-            self.lower_threshold_var.get(),
-            self.upper_threshold_var.get(),
-            self.inverse_lower_clip_var.get(),
-            self.inverse_upper_clip_var.get()
+        help_label.grid(row=0, column=0, columnspan=2, padx=10, pady=10, sticky="w")
+
+        text = tk.Text(
+            editor,
+            width=60,
+            height=10,
+            bg=self.colors["secondary_bg"],
+            fg=self.colors["text"],
+            insertbackground=self.colors["text"]
         )
+        text.grid(row=1, column=0, columnspan=2, padx=10, pady=5)
+        text.insert("1.0", format_channel_mixes(self.channel_mixes))
 
-        # Update the grayscale without green channel image in the UI
-        img_resized = self.resize_image(self.gray_no_g_image, 250, 250)
-        photo = ImageTk.PhotoImage(img_resized)
-        label = self.all_labels[4]
-        label.configure(image=photo)
-        label.image = photo
-        label.bind("<Button-1>", lambda e, im=self.gray_no_g_image: self.show_fullscreen(im))
-        label.bind("<Button-3>", lambda e, im=self.gray_no_g_image, idx=4: self.save_image(im, idx))
-
-        # Update the normalized version
-        img_resized_norm = self.resize_image(self.gray_no_g_normalized, 250, 250)
-        photo_norm = ImageTk.PhotoImage(img_resized_norm)
-        label_norm = self.all_labels[self.num_columns + 4]
-        label_norm.configure(image=photo_norm)
-        label_norm.image = photo_norm
-        label_norm.bind("<Button-1>", lambda e, im=self.gray_no_g_normalized: self.show_fullscreen(im))
-        label_norm.bind("<Button-3>", lambda e, im=self.gray_no_g_normalized, idx=self.num_columns + 4: self.save_image(im, self.num_columns + 4))
-
-        # Update the custom stretched version
-        img_resized_custom = self.resize_image(self.gray_no_g_custom, 250, 250)
-        photo_custom = ImageTk.PhotoImage(img_resized_custom)
-        label_custom = self.all_labels[2 * self.num_columns + 4]
-        label_custom.configure(image=photo_custom)
-        label_custom.image = photo_custom
-        label_custom.bind("<Button-1>", lambda e, im=self.gray_no_g_custom: self.show_fullscreen(im))
-        label_custom.bind("<Button-3>", lambda e, im=self.gray_no_g_custom, idx=2 * self.num_columns + 4: self.save_image(im, 2 * self.num_columns + 4))
+        def apply():
+            """Parse the definitions and re-mix the loaded image."""
+            try:
+                mixes = parse_channel_mixes(text.get("1.0", "end"))
+            except ValueError as e:
+                messagebox.showerror("Error", f"Invalid channel mix.\n{e}", parent=editor)
+                return
+            self.set_channel_mixes(mixes)
+            editor.destroy()
 
-        self.update_warning_label()  # Check for any coefficient warnings
-        self.apply_custom_stretch()   # Re-apply custom stretching with updated coefficients
+        apply_button = ttk.Button(editor, text="Apply", command=apply)
+        apply_button.grid(row=2, column=0, padx=10, pady=10, sticky="e")
+        cancel_button = ttk.Button(editor, text="Cancel", command=editor.destroy)
+        cancel_button.grid(row=2, column=1, padx=10, pady=10, sticky="w")
+
+    def set_channel_mixes(self, mixes):
+        """
+        Replace the user channel mixes and evaluate them over the loaded image.
+
+        Parameters:
+            mixes (list): Channel mix dictionaries from parse_channel_mixes.
+        """
+        self.channel_mixes = mixes
+        names = [NO_GREEN_MIX] + [mix["name"] for mix in mixes]
+        self.mix_box.config(values=names)
+        if self.selected_mix_var.get() not in names:
+            self.selected_mix_var.set(NO_GREEN_MIX)
+        logging.info(f"Channel mixes set to: {', '.join(names)}")
+
+        if self.original_image:
+            self.mix_images = {name: image for name, image in self.mix_images.items() if name == NO_GREEN_MIX}
+            self.mix_images.update(compute_channel_mixes(self.source_image, mixes))
+            self.track_mix_images()
+        self.update_warning_label()
+        self.on_mix_selected()
 
     def update_warning_label(self):
-        """Display a warning if the sum of red and blue coefficients exceeds 1.0."""
+        """Display a warning if a channel mix can exceed the 0-255 output range."""
+        warnings = []
         total = self.red_var.get() + self.blue_var.get()
         if total > 1.0:
-            self.warning_label.config(text="Warning: Red + Blue coefficients exceed 1.0!")
+            warnings.append("Red + Blue coefficients exceed 1.0!")
+        for mix in self.channel_mixes:
+            if mix_exceeds_range(mix):
+                warnings.append(f"{mix['name']} exceeds the output range!")
+        if warnings:
+            self.warning_label.config(text="Warning: " + " ".join(warnings))
         else:
             self.warning_label.config(text="")
 
@@ -887,6 +4526,7 @@ class ImageProcessorApp:
         ratio = min(screen_width / img_width, screen_height / img_height)
         new_size = (int(img_width * ratio), int(img_height * ratio))
         img_resized = image.resize(new_size, Image.Resampling.LANCZOS if hasattr(Image, 'Resampling') else Image.ANTIALIAS)
+        img_resized = to_display_image(img_resized)  # Reduce high-bit-depth images for display
         photo = ImageTk.PhotoImage(img_resized)
 
         # Display the image in the fullscreen window
@@ -906,7 +4546,7 @@ class ImageProcessorApp:
         """Save the selected image to disk."""
         title = self.image_titles[idx]
         # Customize the default filename for specific images
-        if idx in [4, self.num_columns + 4, 2 * self.num_columns + 4]:
+        if idx in [4, self.num_columns + 4, 2 * self.num_columns + 4] and title.startswith(NO_GREEN_MIX):
             red = f"{self.current_red_coeff:.2f}"
             blue = f"{self.current_blue_coeff:.2f}"
             default_name = f"{title}_R{red}_B{blue}.png"
@@ -924,7 +4564,7 @@ class ImageProcessorApp:
         )
         if file_path:
             try:
-                image.save(file_path)
+                save_output(image, file_path)
                 self.status_bar.config(text=f"Image saved: {file_path}")
                 logging.info(f"Image saved: {file_path}")
             except Exception as e:
@@ -944,42 +4584,38 @@ class ImageProcessorApp:
         Returns:
             PIL.Image: The resized image.
         """
-        width, height = image.size
-        ratio = min(max_width / width, max_height / height)
-        new_size = (int(width * ratio), int(height * ratio))
-        pillow_version = tuple(map(int, PILLOW_VERSION.split('.')[:2]))
-        if pillow_version >= (10, 0):
-            resample_filter = Image.Resampling.LANCZOS
-        else:
-            resample_filter = Image.ANTIALIAS
-        return image.resize(new_size, resample=resample_filter)
+        return fit_image(image, max_width, max_height)
 
     def add_tooltips(self):
         """Add tooltips to various UI elements to enhance user experience."""
         def create_tooltip(widget, text):
-            """Create a tooltip for a given widget."""
-            tooltip = tk.Toplevel(widget)
-            tooltip.withdraw()
-            tooltip.overrideredirect(True)
-            tooltip_label = tk.Label(
-                tooltip,
-                text=text,
-                background="#803030",
-                foreground="#ffffff",
-                font=("Arial", 10)
-            )
-            tooltip_label.pack()
+            """Create a tooltip for a given widget; its window is only created on first hover."""
+            tooltips = []
 
             def enter(event):
                 """Show tooltip on mouse enter."""
+                if not tooltips:
+                    tooltip = tk.Toplevel(widget)
+                    tooltip.withdraw()
+                    tooltip.overrideredirect(True)
+                    tooltip_label = tk.Label(
+                        tooltip,
+                        text=text,
+                        background="#803030",
+                        foreground="#ffffff",
+                        font=("Arial", 10)
+                    )
+                    tooltip_label.pack()
+                    tooltips.append(tooltip)
                 x = event.widget.winfo_rootx()
                 y = event.widget.winfo_rooty() + event.widget.winfo_height() + 5
-                tooltip.geometry(f"+{x}+{y}")
-                tooltip.deiconify()
+                tooltips[0].geometry(f"+{x}+{y}")
+                tooltips[0].deiconify()
 
             def leave(event):
                 """Hide tooltip on mouse leave."""
-                tooltip.withdraw()
+                if tooltips:
+                    tooltips[0].withdraw()
 
             widget.bind("<Enter>", enter)
             widget.bind("<Leave>", leave)
@@ -991,10 +4627,28 @@ class ImageProcessorApp:
         create_tooltip(self.upper_threshold_scale, "Set the upper threshold for contrast stretching. Pixels above this value will be clipped.")
         create_tooltip(self.inverse_lower_clip_checkbox, "Inverse the clipping behavior for the lower threshold.")
         create_tooltip(self.inverse_upper_clip_checkbox, "Inverse the clipping behavior for the upper threshold.")
-        create_tooltip(self.reset_thresholds_button, "Reset Lower and Upper Thresholds to 128 and 255 respectively.")
+        create_tooltip(self.reset_thresholds_button, "Reset Lower and Upper Thresholds to the middle and top of the range (128 and 255 for 8-bit images).")
         create_tooltip(self.reset_coefficients_button, "Reset Red and Blue coefficients to 0.50.")
         create_tooltip(self.invert_before_checkbox, "If checked, the image will be inverted before processing.")
         create_tooltip(self.preview_label, "Left-click to view the original image in full-screen.")
+        create_tooltip(self.frame_scale, "Browse the pages of a multi-page image. The page is processed once the slider stops.")
+        create_tooltip(self.curve_box, "Shape of the stretch between the Lower and Upper Thresholds.")
+        create_tooltip(
+            self.curve_parameter_entry,
+            "Gamma: exponent. Sigmoid: gain. Piecewise: input:output points, e.g. 0.25:0.1, 0.75:0.9. Equalize: clip limit."
+        )
+        create_tooltip(self.mix_box, "Channel mix shown in the last column.")
+        create_tooltip(self.edit_mixes_button, "Define weighted or colour space channel mixes.")
+        create_tooltip(self.roi_mode_box, "Region of interest used for the histograms. Auto FOV detects the illuminated fundus area.")
+        create_tooltip(self.roi_inset_box, "Percent of the frame left out around the rectangle or circle region.")
+        create_tooltip(self.roi_crop_checkbox, "If checked, only the bounding box of the region of interest is processed.")
+        create_tooltip(self.clahe_checkbox, "If checked, local contrast is enhanced (CLAHE) after normalization.")
+        create_tooltip(self.clahe_clip_box, "Contrast limit as a multiple of the mean tile histogram count. 0 disables the limit.")
+        create_tooltip(self.clahe_grid_box, "Number of tiles along each side of the image.")
+        create_tooltip(self.save_recipe_button, "Save every processing parameter to a recipe file, for reuse or batch processing.")
+        create_tooltip(self.load_recipe_button, "Load processing parameters from a recipe file.")
+        create_tooltip(self.outputs_button, "Choose the outputs and file format that recipes, batch runs and Accept save.")
+        create_tooltip(self.histogram_canvas, "Histograms of the normalized channels. Drag the markers to set the thresholds.")
 
     def on_preview_left_click(self, event):
         """Handle left-click on the preview label to view the original image fullscreen."""
@@ -1004,59 +4658,151 @@ class ImageProcessorApp:
     def update_preview_label(self):
         """Update the preview thumbnail with the loaded image."""
         if self.original_image_loaded:
-            preview_img = self.resize_image(self.original_image_loaded, 100, 100)
-            photo_preview = ImageTk.PhotoImage(preview_img)
-            self.preview_label.configure(image=photo_preview)
-            self.preview_label.image = photo_preview  # Keep a reference
-            self.preview_label.grid()  # Make sure the preview is visible
+            self.show_preview_image(to_display_image(self.resize_image(self.original_image_loaded, 100, 100)))
         else:
             self.preview_label.configure(image='')
             self.preview_label.image = None
             self.preview_label.grid_remove()  # Hide if no image is loaded
 
+    def show_preview_image(self, preview_img):
+        """Show an 8-bit thumbnail in the preview label."""
+        photo_preview = ImageTk.PhotoImage(preview_img)
+        self.preview_label.configure(image=photo_preview)
+        self.preview_label.image = photo_preview  # Keep a reference
+        self.preview_label.grid()  # Make sure the preview is visible
+
     def show_next_image(self):
         """Navigate to and load the next image in the image list."""
         if not self.image_list:
             return  # No images to navigate
-        self.current_image_index = (self.current_image_index + 1) % len(self.image_list)
-        next_image_path = self.image_list[self.current_image_index]
-        self.load_image_from_path(next_image_path)
+        self.request_image((self.current_image_index + 1) % len(self.image_list))
 
     def show_previous_image(self):
         """Navigate to and load the previous image in the image list."""
         if not self.image_list:
             return  # No images to navigate
-        self.current_image_index = (self.current_image_index - 1) % len(self.image_list)
-        prev_image_path = self.image_list[self.current_image_index]
-        self.load_image_from_path(prev_image_path)
+        self.request_image((self.current_image_index - 1) % len(self.image_list))
+
+    def request_image(self, index):
+        """
+        Navigate to an image of the list, decoding it on the background loader.
+
+        The index moves at once, so repeated key presses skip ahead while the UI stays
+        responsive. Only the image requested last is processed and shown.
+
+        Parameters:
+            index (int): Index of the image in image_list.
+        """
+        self.current_image_index = index
+        file_path = self.image_list[index]
+        self.status_bar.config(text=f"Loading {index + 1}/{len(self.image_list)}: {os.path.basename(file_path)}")
+        polling = self.pending_load is not None
+        self.pending_load = self.loader.submit(file_path, self.processing_settings(), dict(self.roi_masks))
+        if not polling:
+            self.root.after(10, self.poll_loader)
 
-    def load_image_from_path(self, file_path):
-        """Load an image from a specific file path."""
+    def poll_loader(self):
+        """Show the image requested last once the background loader has decoded it."""
+        if self.pending_load is None:
+            return  # Replaced by a direct load
+        result = self.loader.poll()
+        if result is None or result[0] != self.pending_load:
+            self.root.after(10, self.poll_loader)  # Still decoding, or only a skipped image finished
+            return
+        self.pending_load = None
+        token, (file_path, settings, roi_masks), decoded, error = result
+        if error:
+            self.show_load_error(file_path, error)
+        elif settings != self.processing_settings():
+            self.show_image(file_path, 0, decoded[0])  # A setting changed while loading; process again
+        else:
+            self.show_image(file_path, 0, *decoded)
+
+    def decode_image(self, file_path, settings, roi_masks):
+        """
+        Decode and analyze an image for display (loader thread).
+
+        Only the arguments are used, not the application's state, which belongs to the
+        Tk thread; the results are applied there by show_image.
+
+        Parameters:
+            file_path (str): Path of the image file.
+            settings (dict): Snapshot from processing_settings.
+            roi_masks (dict): Copy of the ROI mask cache.
+
+        Returns:
+            tuple: The image as returned by open_image, the image to process (inverted
+            if the settings ask for it) and the result of analyze_image.
+        """
+        image = open_image(file_path)
+        original = invert_image(image) if settings["invert"] else image
+        return image, original, analyze_image(image, original, file_path, settings, roi_masks)
+
+    def show_load_error(self, file_path, error):
+        """Report an image that failed to load."""
+        messagebox.showerror("Error", f"Failed to load image.\n{error}")
+        logging.error(f"Failed to load image: {file_path} with error: {error}")
+
+    def load_image_from_path(self, file_path, frame=0):
+        """
+        Load an image, or one page of a multi-page image, from a specific file path.
+
+        Parameters:
+            file_path (str): Path of the image file.
+            frame (int): Zero-based page of a multi-page file.
+        """
+        self.pending_load = None  # A direct load replaces any navigation still decoding
+        self.release_image_state()  # Free the previous image's intermediates first
         try:
-            # Open the image and convert to RGB
-            self.original_image_loaded = Image.open(file_path).convert("RGB")
+            # Open the image as RGB, or at native depth for high-bit-depth images
+            image = open_image(file_path, frame)
+        except Exception as e:
+            self.show_load_error(file_path, e)
+            return
+        self.show_image(file_path, frame, image)
+
+    def show_image(self, file_path, frame, image, original=None, prepared=None):
+        """
+        Process and display a decoded image.
+
+        Parameters:
+            file_path (str): Path of the image file.
+            frame (int): Zero-based page of a multi-page file.
+            image (PIL.Image): The page, as returned by open_image.
+            original (PIL.Image): The page inverted as the settings ask, if already computed.
+            prepared (dict): Result of analyze_image for the current settings, if already computed.
+        """
+        self.release_image_state()  # No-op after load_image_from_path, needed after background loads
+        new_file = file_path != self.image_path
+        try:
+            self.original_image_loaded = image
+            if new_file:
+                self.frame_count = frame_count(file_path)
+            self.image_path = file_path
+            self.frame_index = frame
 
+            description = file_path
+            if self.frame_count > 1:
+                description += f" (frame {frame + 1}/{self.frame_count})"
             if self.invert_before_var.get():
                 # Invert colors if the checkbox is selected
-                self.original_image = ImageOps.invert(self.original_image_loaded)
-                self.status_bar.config(text=f"Loaded and inverted image: {file_path}")
-                logging.info(f"Loaded and inverted image: {file_path}")
+                self.original_image = original if original is not None else invert_image(self.original_image_loaded)
+                self.status_bar.config(text=f"Loaded and inverted image: {description}")
+                logging.info(f"Loaded and inverted image: {description}")
             else:
                 self.original_image = self.original_image_loaded
-                self.status_bar.config(text=f"Loaded image: {file_path}")
-                logging.info(f"Loaded image: {file_path}")
+                self.status_bar.config(text=f"Loaded image: {description}")
+                logging.info(f"Loaded image: {description}")
         except Exception as e:
             # Show error message if loading fails
-            messagebox.showerror("Error", f"Failed to load image.\n{e}")
-            logging.error(f"Failed to load image: {file_path} with error: {e}")
+            self.show_load_error(file_path, e)
             return
 
         # Update the image list based on the new folder
         folder = os.path.dirname(file_path)
-        supported_extensions = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff")
         self.image_list = sorted([
             os.path.join(folder, f) for f in os.listdir(folder)
-            if f.lower().endswith(supported_extensions)
+            if f.lower().endswith(IMAGE_EXTENSIONS)
         ])
         try:
             self.current_image_index = self.image_list.index(file_path)
@@ -1064,8 +4810,9 @@ class ImageProcessorApp:
             self.current_image_index = -1
 
         self.enable_widgets()  # Ensure widgets are enabled
+        self.update_bit_depth()  # Map the threshold sliders to the image's native range
 
-        self.process_images()  # Process the newly loaded image
+        self.process_images(prepared)  # Process the newly loaded image, unless done in the background
         self.display_images()  # Display all processed images
         self.update_warning_label()  # Check for any warnings
         self.apply_custom_stretch()   # Apply custom contrast stretching
@@ -1073,6 +4820,191 @@ class ImageProcessorApp:
         self.update_preview_label()  # Update the preview thumbnail
 
         self.update_navigation_arrows()  # Update navigation buttons
+        if new_file:
+            self.prefetch_frame_thumbnails()  # Render every page's thumbnail for the frame slider
+        self.update_frame_slider()
+
+    def bind_shortcuts(self):
+        """Bind the keyboard shortcuts of the review workflow, see show_shortcuts."""
+        shortcuts = {
+            "<Left>": self.show_previous_image,
+            "<Right>": self.show_next_image,
+            "<Prior>": lambda: self.step_frame(-1),
+            "<Next>": lambda: self.step_frame(1),
+            "<Up>": lambda: self.nudge_threshold("upper", 1),
+            "<Down>": lambda: self.nudge_threshold("upper", -1),
+            "<Shift-Up>": lambda: self.nudge_threshold("lower", 1),
+            "<Shift-Down>": lambda: self.nudge_threshold("lower", -1),
+            "<Control-Up>": lambda: self.nudge_threshold("upper", 10),
+            "<Control-Down>": lambda: self.nudge_threshold("upper", -10),
+            "<Control-Shift-Up>": lambda: self.nudge_threshold("lower", 10),
+            "<Control-Shift-Down>": lambda: self.nudge_threshold("lower", -10),
+            "<Return>": lambda: self.accept_image(advance=True),
+            "<Control-s>": lambda: self.accept_image(advance=False),
+            "<F1>": self.show_shortcuts
+        }
+        for sequence, handler in shortcuts.items():
+            self.root.bind(sequence, lambda event, handler=handler: self.on_shortcut(event, handler))
+        # Escape hands the keys back to the shortcuts after typing in an entry or using a slider
+        self.root.bind("<Escape>", lambda event: self.root.focus_set())
+
+    def on_shortcut(self, event, handler):
+        """Run a shortcut unless the focused widget uses the key itself, e.g. an entry's arrow keys."""
+        try:
+            if event.widget.winfo_class() in KEY_WIDGET_CLASSES:
+                return
+        except (AttributeError, tk.TclError):
+            pass  # Not a widget of this application, e.g. a combobox's popdown list
+        handler()
+
+    def show_shortcuts(self):
+        """List the keyboard shortcuts."""
+        messagebox.showinfo(
+            "Keyboard Shortcuts",
+            "Left / Right: previous / next image\n"
+            "Page Up / Page Down: previous / next page of a multi-page image\n"
+            "Up / Down: raise / lower the Upper Threshold\n"
+            "Shift+Up / Shift+Down: raise / lower the Lower Threshold\n"
+            "Hold Ctrl to move the thresholds in steps of 10\n"
+            "Enter: accept the image, save its outputs and show the next one\n"
+            "Ctrl+S: save the image's outputs without moving on\n"
+            "Escape: leave an entry or slider so the shortcuts apply\n\n"
+            "Accepted images are saved with the outputs and format of the last loaded recipe, "
+            "the custom stretch row as PNG by default."
+        )
+
+    def nudge_threshold(self, which, steps):
+        """
+        Move the lower or upper threshold by a number of 8-bit levels.
+
+        Parameters:
+            which (str): "lower" or "upper".
+            steps (int): Levels to move by, negative to lower the threshold.
+        """
+        if not self.original_image:
+            return  # No image loaded yet
+        step = steps * max((self.max_value + 1) // 256, 1)  # One 8-bit level is 256 levels at 16 bits
+        if which == "lower":
+            value = self.lower_threshold_var.get() + step
+            self.lower_threshold_var.set(min(max(value, 0), self.max_value - 1))
+        else:
+            value = self.upper_threshold_var.get() + step
+            self.upper_threshold_var.set(min(max(value, 1), self.max_value))
+        self.apply_custom_stretch()
+
+    def step_frame(self, steps):
+        """Move the frame slider of a multi-page image; the page is processed once the key rests."""
+        if self.frame_count < 2:
+            return
+        frame = min(max(self.frame_var.get() + steps, 1), self.frame_count)
+        self.frame_var.set(frame)
+        self.on_frame_slider(frame)
+
+    def accept_image(self, advance=True):
+        """
+        Save the outputs of the current image selected by the last recipe, then move on.
+
+        The outputs are materialized here and written by a background thread, with the
+        names batch runs give them, so the next image can be shown while they are saved.
+
+        Parameters:
+            advance (bool): Show the next image of the folder afterwards.
+        """
+        if not self.original_image:
+            return  # No image loaded yet
+        if not self.review_output_dir:
+            folder = filedialog.askdirectory(title="Select Folder for Accepted Images")
+            if not folder:
+                return  # User canceled the folder dialog
+            self.review_output_dir = folder
+
+        prefix = os.path.splitext(os.path.basename(self.image_path))[0]
+        if self.frame_count > 1:
+            prefix += f"_p{self.frame_index + 1:04d}"
+        outputs = {name: self.get_output_image(OUTPUT_NAMES.index(name)) for name in self.recipe_outputs}
+        future = self.save_executor.submit(
+            write_outputs, outputs, prefix, self.review_output_dir, self.recipe_format
+        )
+        self.pending_saves.append((prefix, future))
+        if len(self.pending_saves) == 1:
+            self.root.after(100, self.poll_saves)
+        self.status_bar.config(text=f"Accepted {prefix}: saving {len(outputs)} outputs to {self.review_output_dir}")
+        logging.info(f"Accepted {self.image_path}, saving {len(outputs)} outputs to {self.review_output_dir}")
+        if advance:
+            self.show_next_image()
+
+    def poll_saves(self):
+        """Report accepted images whose outputs were written, until every save is done."""
+        for prefix, future in [save for save in self.pending_saves if save[1].done()]:
+            self.pending_saves.remove((prefix, future))
+            error = future.exception()
+            if error:
+                messagebox.showerror("Error", f"Failed to save the outputs of {prefix}.\n{error}")
+                logging.error(f"Failed to save the outputs of {prefix} with error: {error}")
+            else:
+                logging.info(f"Saved the outputs of {prefix} to {self.review_output_dir}")
+        if self.pending_saves:
+            self.root.after(100, self.poll_saves)
+
+    def update_frame_slider(self):
+        """Show the frame slider on the current page of a multi-page image, hide it otherwise."""
+        if self.frame_count > 1:
+            self.frame_scale.config(to=self.frame_count)
+            self.frame_var.set(self.frame_index + 1)
+            self.frame_label.config(text=f"Frame {self.frame_index + 1}/{self.frame_count}")
+            self.frame_scale.grid()
+            self.frame_label.grid()
+        else:
+            self.frame_scale.grid_remove()
+            self.frame_label.grid_remove()
+
+    def prefetch_frame_thumbnails(self):
+        """Render the preview thumbnail of every page of the loaded file in parallel."""
+        for future in self.frame_futures.values():
+            future.cancel()  # Pages of the previous file not started yet are dropped
+        self.frame_thumbnails = {}
+        self.frame_futures = {}
+        if self.frame_count < 2:
+            return
+        self.frame_futures = {
+            frame: self.frame_executor.submit(frame_thumbnail, self.image_path, frame, 100)
+            for frame in range(self.frame_count)
+        }
+        self.root.after(50, self.poll_frame_thumbnails, self.image_path)
+
+    def poll_frame_thumbnails(self, file_path):
+        """Move rendered page thumbnails into the cache until every page of the file is done."""
+        if file_path != self.image_path:
+            return  # Another file was loaded; its own polling took over
+        for frame, future in list(self.frame_futures.items()):
+            if not future.done():
+                continue
+            del self.frame_futures[frame]
+            try:
+                self.frame_thumbnails[frame] = future.result()
+            except Exception as e:
+                logging.error(f"Failed to render page {frame + 1} of {file_path} with error: {e}")
+        if self.frame_futures:
+            self.root.after(50, self.poll_frame_thumbnails, file_path)
+
+    def on_frame_slider(self, value):
+        """Preview the page under the frame slider from the thumbnail cache, and load it once the slider stops."""
+        frame = int(float(value)) - 1
+        self.frame_label.config(text=f"Frame {frame + 1}/{self.frame_count}")
+        thumbnail = self.frame_thumbnails.get(frame)
+        if thumbnail is not None:
+            self.show_preview_image(thumbnail)
+        # Processing the full page is deferred, so dragging across pages stays smooth
+        if self.frame_load_id is not None:
+            self.root.after_cancel(self.frame_load_id)
+        self.frame_load_id = self.root.after(300, self.load_selected_frame)
+
+    def load_selected_frame(self):
+        """Load the page selected with the frame slider through the processing pipeline."""
+        self.frame_load_id = None
+        frame = self.frame_var.get() - 1
+        if self.image_path and frame != self.frame_index:
+            self.load_image_from_path(self.image_path, frame)
 
     def update_navigation_arrows(self):
         """Show or hide navigation arrows based on the number of images."""
@@ -1085,11 +5017,13 @@ class ImageProcessorApp:
 
     def reset_thresholds(self):
         """Reset the lower and upper thresholds to their default values."""
-        self.lower_threshold_var.set(128)
-        self.upper_threshold_var.set(255)
+        lower = (self.max_value + 1) // 2  # 128 for 8-bit images
+        upper = self.max_value
+        self.lower_threshold_var.set(lower)
+        self.upper_threshold_var.set(upper)
         self.apply_custom_stretch()  # Re-apply stretching with default thresholds
-        self.status_bar.config(text="Thresholds reset to 128 (Lower) and 255 (Upper).")
-        logging.info("Thresholds reset to 128 (Lower) and 255 (Upper).")
+        self.status_bar.config(text=f"Thresholds reset to {lower} (Lower) and {upper} (Upper).")
+        logging.info(f"Thresholds reset to {lower} (Lower) and {upper} (Upper).")
 
     def reset_coefficients(self):
         """Reset the red and blue coefficients to their default values."""
@@ -1099,11 +5033,553 @@ class ImageProcessorApp:
         self.status_bar.config(text="Red and Blue coefficients reset to 0.50.")
         logging.info("Red and Blue coefficients reset to 0.50.")
 
-def main():
-    """Entry point of the application."""
+    def open_outputs_editor(self):
+        """Open a dialog to choose the outputs and file format saved with the recipe."""
+        editor = tk.Toplevel(self.root)
+        editor.title("Recipe Outputs")
+        editor.configure(bg=self.colors["primary_bg"])
+        editor.transient(self.root)
+
+        # One checkbox per output, laid out like the image grid
+        output_vars = {}
+        for idx, name in enumerate(OUTPUT_NAMES):
+            output_vars[name] = tk.BooleanVar(value=name in self.recipe_outputs)
+            checkbox = ttk.Checkbutton(editor, text=self.image_titles[idx], variable=output_vars[name])
+            checkbox.grid(row=idx // self.num_columns, column=idx % self.num_columns, padx=10, pady=5, sticky="w")
+
+        format_label = ttk.Label(editor, text="Format:", font=("Arial", 10))
+        format_label.grid(row=3, column=0, padx=10, pady=10, sticky="e")
+        format_var = tk.StringVar(value=self.recipe_format)
+        format_box = ttk.Combobox(editor, textvariable=format_var, values=OUTPUT_FORMATS, state="readonly", width=6)
+        format_box.grid(row=3, column=1, padx=10, pady=10, sticky="w")
+
+        def apply():
+            """Keep the chosen outputs, in grid order, for the next recipe."""
+            outputs = [name for name in OUTPUT_NAMES if output_vars[name].get()]
+            if not outputs:
+                messagebox.showerror("Error", "Choose at least one output.", parent=editor)
+                return
+            self.recipe_outputs = outputs
+            self.recipe_format = format_var.get()
+            editor.destroy()
+
+        apply_button = ttk.Button(editor, text="Apply", command=apply)
+        apply_button.grid(row=4, column=self.num_columns - 2, padx=10, pady=10, sticky="e")
+        cancel_button = ttk.Button(editor, text="Cancel", command=editor.destroy)
+        cancel_button.grid(row=4, column=self.num_columns - 1, padx=10, pady=10, sticky="w")
+
+    def current_recipe(self):
+        """
+        Capture every processing parameter as a recipe.
+
+        Returns:
+            dict: The recipe, see validate_recipe.
+        """
+        clip_limit, grid = self.get_clahe_settings(disabled=True)
+        return {
+            "version": RECIPE_VERSION,
+            "invert_before": self.invert_before_var.get(),
+            "red_coefficient": self.red_var.get(),
+            "blue_coefficient": self.blue_var.get(),
+            "channel_mixes": format_channel_mixes(self.channel_mixes),
+            "selected_mix": self.selected_mix_var.get(),
+            "roi_mode": self.roi_mode_var.get(),
+            "roi_inset": self.get_roi_inset(),
+            "roi_crop": self.roi_crop_var.get(),
+            "low_cutoff": self.low_cutoff_var.get(),
+            "high_cutoff": self.high_cutoff_var.get(),
+            "ignore_values": self.ignore_values_var.get().strip(),
+            "local_contrast": self.clahe_var.get(),
+            "local_contrast_clip": clip_limit,
+            "local_contrast_grid": grid,
+            "lower_threshold": self.lower_threshold_var.get(),
+            "upper_threshold": self.upper_threshold_var.get(),
+            "threshold_max": self.max_value,
+            "inverse_lower": self.inverse_lower_clip_var.get(),
+            "inverse_upper": self.inverse_upper_clip_var.get(),
+            "curve": self.curve_var.get(),
+            "curve_parameter": self.curve_parameter_var.get().strip(),
+            "outputs": self.recipe_outputs,
+            "output_format": self.recipe_format
+        }
+
+    def apply_recipe(self, recipe):
+        """
+        Set every processing parameter from a recipe and re-process the loaded image.
+
+        Parameters:
+            recipe (dict): A complete recipe, see validate_recipe.
+        """
+        self.invert_before_var.set(recipe["invert_before"])
+        self.red_var.set(recipe["red_coefficient"])
+        self.blue_var.set(recipe["blue_coefficient"])
+        self.current_red_coeff = recipe["red_coefficient"]
+        self.current_blue_coeff = recipe["blue_coefficient"]
+        self.roi_mode_var.set(recipe["roi_mode"])
+        self.roi_inset_var.set(recipe["roi_inset"])
+        self.roi_crop_var.set(recipe["roi_crop"])
+        self.low_cutoff_var.set(recipe["low_cutoff"])
+        self.high_cutoff_var.set(recipe["high_cutoff"])
+        self.ignore_values_var.set(recipe["ignore_values"])
+        self.ignore_values = parse_ignore_values(recipe["ignore_values"])
+        self.clahe_var.set(recipe["local_contrast"])
+        self.clahe_clip_var.set(recipe["local_contrast_clip"])
+        self.clahe_grid_var.set(recipe["local_contrast_grid"])
+        # Thresholds are stored against the recipe's range; map them to the current one
+        lower, upper = scale_thresholds(
+            recipe["lower_threshold"], recipe["upper_threshold"], recipe["threshold_max"], self.max_value
+        )
+        self.lower_threshold_var.set(lower)
+        self.upper_threshold_var.set(upper)
+        self.inverse_lower_clip_var.set(recipe["inverse_lower"])
+        self.inverse_upper_clip_var.set(recipe["inverse_upper"])
+        self.curve_var.set(recipe["curve"])
+        self.curve_parameter_var.set(recipe["curve_parameter"])
+        self.recipe_outputs = list(recipe["outputs"])
+        self.recipe_format = recipe["output_format"]
+
+        self.selected_mix_var.set(recipe["selected_mix"])
+        self.channel_mixes = parse_channel_mixes(recipe["channel_mixes"])
+        self.mix_box.config(values=[NO_GREEN_MIX] + [mix["name"] for mix in self.channel_mixes])
+        self.update_mix_titles()
+
+        if self.original_image_loaded:
+            if recipe["invert_before"]:
+                self.original_image = invert_image(self.original_image_loaded)
+            else:
+                self.original_image = self.original_image_loaded
+            self.process_images()
+            self.display_images()
+            self.update_warning_label()
+            self.apply_custom_stretch()
+
+    def save_recipe_file(self):
+        """Save the current processing parameters to a recipe file."""
+        file_path = filedialog.asksaveasfilename(
+            initialfile="recipe.json",
+            defaultextension=".json",
+            filetypes=[("Recipe", "*.json")]
+        )
+        if not file_path:
+            return  # User canceled the file dialog
+
+        try:
+            save_recipe(self.current_recipe(), file_path)
+            self.status_bar.config(text=f"Recipe saved: {file_path}")
+            logging.info(f"Recipe saved: {file_path}")
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to save recipe.\n{e}")
+            logging.error(f"Failed to save recipe: {file_path} with error: {e}")
+
+    def load_recipe_file(self):
+        """Load processing parameters from a recipe file."""
+        file_path = filedialog.askopenfilename(
+            title="Select Recipe",
+            filetypes=[("Recipe", "*.json")]
+        )
+        if not file_path:
+            return  # User canceled the file dialog
+
+        try:
+            recipe = load_recipe(file_path)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Error", f"Failed to load recipe.\n{e}")
+            logging.error(f"Failed to load recipe: {file_path} with error: {e}")
+            return
+        self.apply_recipe(recipe)
+        self.status_bar.config(text=f"Recipe loaded: {file_path}")
+        logging.info(f"Recipe loaded: {file_path}")
+
+    def open_comparison(self):
+        """Open the comparison grid, or bring it to the front if it is already open."""
+        if self.comparison_window:
+            self.comparison_window.window.lift()
+        else:
+            self.comparison_window = ComparisonWindow(self)
+
+class ComparisonWindow:
+    """Window showing one output for several images of the current folder side by side."""
+    def __init__(self, app):
+        """Create the comparison window for the given application."""
+        self.app = app
+        self.tile_size = 250  # Maximum width and height of each tile
+        self.num_columns = 4  # Number of tile columns
+        self.entries = {}  # Cached channel histograms and thumbnails per image path
+        self.pending = {}  # Settings of the images currently being processed, per path
+        self.results = queue.Queue()  # Processed images handed back by the worker threads
+        self.roi_masks = {}  # ROI masks shared by the worker threads, apart from the application's
+        self.executor = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1))
+        self.tiles = []  # (path, title label, image label) of each tile
+        self.tile_paths = []  # Paths of the images currently shown
+
+        self.window = tk.Toplevel(app.root)
+        self.window.title("Compare Images")
+        self.window.configure(bg=app.colors["primary_bg"])
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        controls_frame = ttk.Frame(self.window)
+        controls_frame.grid(row=0, column=0, sticky="ew", padx=10, pady=10)
+
+        # Output shown in every tile
+        output_label = ttk.Label(controls_frame, text="Output:", font=("Arial", 10))
+        output_label.grid(row=0, column=0, padx=5, pady=5, sticky="w")
+        self.output_index = app.image_titles.index("Green Custom Stretch")
+        self.output_var = tk.StringVar(value=app.image_titles[self.output_index])
+        self.output_box = ttk.Combobox(
+            controls_frame,
+            textvariable=self.output_var,
+            values=app.image_titles,
+            state="readonly",
+            width=32
+        )
+        self.output_box.grid(row=0, column=1, padx=5, pady=5, sticky="w")
+        self.output_box.bind("<<ComboboxSelected>>", lambda e: self.on_output_selected())
+
+        # Number of images compared, starting at the current image
+        count_label = ttk.Label(controls_frame, text="Images:", font=("Arial", 10))
+        count_label.grid(row=0, column=2, padx=(20, 5), pady=5, sticky="w")
+        self.count_var = tk.IntVar(value=min(4, max(len(app.image_list), 1)))
+        count_box = ttk.Spinbox(
+            controls_frame,
+            from_=1,
+            to=16,
+            textvariable=self.count_var,
+            command=self.refresh,
+            width=4
+        )
+        count_box.grid(row=0, column=3, padx=5, pady=5, sticky="w")
+        count_box.bind("<Return>", lambda e: self.refresh())
+
+        self.tile_frame = ttk.Frame(self.window)
+        self.tile_frame.grid(row=1, column=0, sticky="nsew", padx=10, pady=10)
+
+        self.refresh()
+        self.poll_id = self.window.after(50, self.poll_results)
+
+    def selected_paths(self):
+        """Return the paths of the compared images, starting at the current image."""
+        image_list = self.app.image_list
+        if not image_list:
+            return []
+        try:
+            count = min(max(int(self.count_var.get()), 1), len(image_list))
+        except (tk.TclError, ValueError):
+            count = 1
+        start = max(self.app.current_image_index, 0)
+        return [image_list[(start + i) % len(image_list)] for i in range(count)]
+
+    def settings_key(self):
+        """Return the settings that require reprocessing the full-resolution images."""
+        return (
+            self.app.invert_before_var.get(),
+            self.app.selected_mix(),
+            self.app.roi_mode_var.get(),
+            self.app.get_roi_inset(),
+            self.app.roi_crop_var.get()
+        )
+
+    def stretch_parameters(self):
+        """Snapshot the parameters that only rebuild lookup tables, read on the Tk thread."""
+        return {
+            "cutoff": (self.app.low_cutoff_var.get(), self.app.high_cutoff_var.get()),
+            "ignore_values": self.app.ignore_values,
+            "lower": self.app.lower_threshold_var.get(),
+            "upper": self.app.upper_threshold_var.get(),
+            "inverse_lower": self.app.inverse_lower_clip_var.get(),
+            "inverse_upper": self.app.inverse_upper_clip_var.get(),
+            "curve": self.app.curve_var.get(),
+            "curve_parameter": self.app.curve_parameter_var.get().strip(),
+            "clahe": self.app.get_clahe_settings(),
+            "max_value": self.app.max_value
+        }
+
+    def rebuild_tiles(self, paths):
+        """Create one tile per compared image."""
+        for path, title_label, image_label in self.tiles:
+            title_label.destroy()
+            image_label.destroy()
+        self.tiles = []
+        for i, path in enumerate(paths):
+            row, col = divmod(i, self.num_columns)
+            title_label = ttk.Label(
+                self.tile_frame,
+                text=os.path.basename(path),
+                font=("Arial", 10, "bold"),
+                foreground=self.app.colors["sub_text"]
+            )
+            title_label.grid(row=2 * row, column=col, padx=5, pady=(5, 0))
+            image_label = tk.Label(
+                self.tile_frame,
+                text="Loading...",
+                relief="solid",
+                bg=self.app.colors["secondary_bg"],
+                fg=self.app.colors["sub_text"],
+                bd=2,
+                highlightthickness=0
+            )
+            image_label.grid(row=2 * row + 1, column=col, padx=5, pady=5)
+            # Left-click opens the image in the main window
+            image_label.bind("<Button-1>", lambda e, path=path: self.app.load_image_from_path(path))
+            self.tiles.append((path, title_label, image_label))
+        self.tile_paths = paths
+
+    def on_output_selected(self):
+        """Show the newly selected output in every tile."""
+        self.output_index = self.app.image_titles.index(self.output_var.get())
+        self.refresh()
+
+    def refresh(self):
+        """Update every tile with the current parameters, processing new images in the background."""
+        # The channel mix column is retitled when another mix is selected
+        self.output_box.configure(values=self.app.image_titles)
+        self.output_var.set(self.app.image_titles[self.output_index])
+
+        paths = self.selected_paths()
+        if paths != self.tile_paths:
+            self.rebuild_tiles(paths)
+
+        settings = self.settings_key()
+        ready = []
+        for path in paths:
+            entry = self.entries.get(path)
+            if entry and entry["settings"] == settings:
+                ready.append(path)
+            elif self.pending.get(path) != settings:
+                self.pending[path] = settings
+                self.executor.submit(self.process_entry, path, settings)
+        self.render_tiles(ready)
+
+    def process_entry(self, path, settings):
+        """Compute the channel histograms and thumbnails of one image (worker thread)."""
+        invert, mix, roi_mode, roi_inset, roi_crop = settings
+        try:
+            image = open_image(path)
+            mask = shared_roi_mask(image, path, roi_mode, roi_inset, self.roi_masks)
+            if invert:
+                image = invert_image(image)
+            bbox = mask.getbbox() if mask is not None and roi_crop else None
+            if bbox:
+                image = image.crop(bbox)
+                mask = mask.crop(bbox)
+            entry = comparison_entry(image, mask, mix, self.tile_size)
+            entry["settings"] = settings
+            self.results.put((path, settings, entry, None))
+        except Exception as e:
+            self.results.put((path, settings, None, e))
+
+    def poll_results(self):
+        """Collect processed images from the worker threads and show them."""
+        ready = []
+        while True:
+            try:
+                path, settings, entry, error = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if self.pending.get(path) == settings:
+                del self.pending[path]
+            if error:
+                logging.error(f"Failed to process image for comparison: {path} with error: {error}")
+                for tile_path, title_label, image_label in self.tiles:
+                    if tile_path == path:
+                        image_label.configure(text="Failed to load", image="")
+                continue
+            self.entries[path] = entry
+            if settings == self.settings_key():
+                ready.append(path)
+        if ready:
+            self.render_tiles(ready)
+        self.poll_id = self.window.after(50, self.poll_results)
+
+    def render_tiles(self, paths):
+        """Remap the cached thumbnails of the given images in parallel and show them."""
+        paths = [path for path in paths if path in self.tile_paths]
+        if not paths:
+            return
+        idx = self.output_index
+        parameters = self.stretch_parameters()
+        images = self.executor.map(
+            lambda path: self.tile_image(self.entries[path], idx, parameters),
+            paths
+        )
+        for path, image in zip(paths, images):
+            for tile_path, title_label, image_label in self.tiles:
+                if tile_path == path:
+                    photo = ImageTk.PhotoImage(image)
+                    image_label.configure(image=photo, text="")
+                    image_label.image = photo  # Keep a reference to prevent garbage collection
+
+    def tile_image(self, entry, idx, parameters):
+        """Build the thumbnail of one output from an image's cached channels, see render_tile."""
+        return render_tile(entry, idx, parameters)
+
+    def close(self):
+        """Close the window and stop the worker threads."""
+        self.window.after_cancel(self.poll_id)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.window.destroy()
+        self.app.comparison_window = None
+
+def main(argv=None):
+    """
+    Entry point of the application.
+
+    Without arguments the GUI starts. The batch subcommand applies a recipe to
+    images without starting the GUI, and the watch subcommand applies it to images
+    as they are dropped into a folder:
+
+        customContrastStretchingGUI.py batch recipe.json images/ -o outputs/
+        customContrastStretchingGUI.py watch recipe.json incoming/ -o outputs/
+        customContrastStretchingGUI.py video recipe.json exam.y4m -o outputs/ --smoothing 0.8
+
+    The serve subcommand starts a local HTTP service, see ProcessingRequestHandler.
+    The regress subcommand checks the processing engine against regression_golden.json.
+    With --startup-benchmark the GUI reports how long it took to start, then exits.
+    """
+    configure_logging()
+    parser = argparse.ArgumentParser(description="Custom contrast stretching of fundus images.")
+    parser.add_argument(
+        "--startup-benchmark", action="store_true",
+        help="Start the GUI, print its startup times in milliseconds as JSON and exit."
+    )
+    parser.add_argument(
+        "--atlas", action="store_true",
+        help="Draw the output grid as one composed image, updated by region, instead of 15 labels."
+    )
+    parser.add_argument(
+        "--memory-budget", type=int, default=DEFAULT_MEMORY_BUDGET // 2 ** 20,
+        help="Megabytes of full-resolution images the GUI keeps before releasing recomputable ones."
+    )
+    subparsers = parser.add_subparsers(dest="command")
+    batch_parser = subparsers.add_parser("batch", help="Apply a recipe to images without the GUI.")
+    batch_parser.add_argument("recipe", help="Recipe file saved from the GUI.")
+    batch_parser.add_argument("inputs", nargs="+", help="Image files or folders.")
+    batch_parser.add_argument("-o", "--output", required=True, help="Folder the outputs are written to.")
+    batch_parser.add_argument("-j", "--workers", type=int, default=None, help="Images processed at once.")
+    watch_parser = subparsers.add_parser("watch", help="Apply a recipe to images as they appear in a folder.")
+    watch_parser.add_argument("recipe", help="Recipe file saved from the GUI.")
+    watch_parser.add_argument("folder", help="Folder to watch.")
+    watch_parser.add_argument("-o", "--output", required=True, help="Folder the outputs are written to.")
+    watch_parser.add_argument("-j", "--workers", type=int, default=None, help="Images processed at once.")
+    watch_parser.add_argument("--queue-size", type=int, default=16, help="Files waiting for a worker at most.")
+    watch_parser.add_argument("--interval", type=float, default=1.0, help="Seconds between polls of the folder.")
+    watch_parser.add_argument("--settle", type=int, default=2, help="Polls a file must stay unchanged before it is processed.")
+    watch_parser.add_argument("--include-existing", action="store_true", help="Also process the files present at startup.")
+    watch_parser.add_argument("--metrics-interval", type=float, default=10.0, help="Seconds between metrics reports.")
+    video_parser = subparsers.add_parser("video", help="Apply a recipe to a video or numbered frame sequence.")
+    video_parser.add_argument("recipe", help="Recipe file saved from the GUI.")
+    video_parser.add_argument("source", help="Folder of numbered frames, or an uncompressed .y4m video.")
+    video_parser.add_argument("-o", "--output", required=True, help="Folder the outputs are written to.")
+    video_parser.add_argument(
+        "--smoothing", type=float, default=0.0,
+        help="Weight (0-1) of previous frames in the normalization bounds; higher values flicker less."
+    )
+    video_parser.add_argument("--queue-size", type=int, default=4, help="Frames waiting between pipeline stages at most.")
+    regress_parser = subparsers.add_parser(
+        "regress", help="Check the processing engine's outputs and performance against golden results."
+    )
+    regress_parser.add_argument("--golden", default=REGRESSION_GOLDEN, help="Golden results file.")
+    regress_parser.add_argument("--update", action="store_true", help="Record the current results as golden.")
+    regress_parser.add_argument("--repeat", type=int, default=3, help="Runs per image; the fastest is kept.")
+    regress_parser.add_argument("--tolerance", type=float, default=0.0, help="Mean level change accepted when pixels differ.")
+    regress_parser.add_argument("--budget-scale", type=float, default=1.0, help="Factor applied to the latency and memory budgets.")
+    regress_parser.add_argument("--image", action="append", choices=REGRESSION_IMAGES, help="Image to run; all by default.")
+    serve_parser = subparsers.add_parser("serve", help="Start a local HTTP processing service.")
+    serve_parser.add_argument("--host", default="127.0.0.1", help="Address to listen on.")
+    serve_parser.add_argument("--port", type=int, default=8000, help="Port to listen on.")
+    serve_parser.add_argument("-j", "--workers", type=int, default=None, help="Worker processes.")
+    serve_parser.add_argument("--max-concurrent", type=int, default=None, help="Requests handled at once; others get 503.")
+    serve_parser.add_argument("--cache-size", type=int, default=64, help="Results kept in the cache.")
+    args = parser.parse_args(argv)
+    if args.command:
+        load_imaging()  # Only the GUI defers Pillow until its window is painted
+
+    if args.command == "serve":
+        service = ProcessingService(args.workers, args.max_concurrent, args.cache_size)
+        server = create_server(service, args.host, args.port)
+        print(f"Serving on http://{args.host}:{server.server_address[1]}", flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            service.close()
+        return 0
+
+    if args.command == "video":
+        try:
+            recipe = load_recipe(args.recipe)
+        except (OSError, ValueError) as e:
+            parser.error(f"Failed to load recipe: {e}")
+        start = time.perf_counter()
+        try:
+            stats = run_video(recipe, args.source, args.output, args.smoothing, args.queue_size)
+        except (OSError, ValueError) as e:
+            print(e, file=sys.stderr)
+            logging.error(f"Failed to process video {args.source} with error: {e}")
+            return 1
+        except KeyboardInterrupt:
+            return 130
+        print(
+            f"Processed {stats['frames']} frames in {time.perf_counter() - start:.1f} s "
+            f"(decode {stats['decode']:.1f} s, process {stats['process']:.1f} s, encode {stats['encode']:.1f} s); "
+            f"{stats['built']} lookup tables built, {stats['reused']} reused."
+        )
+        return 0
+
+    if args.command == "regress":
+        failures = run_regression(
+            args.golden, args.update, args.repeat, args.tolerance, args.budget_scale,
+            tuple(args.image or REGRESSION_IMAGES)
+        )
+        for failure in failures:
+            print(f"FAIL {failure}")
+        if not args.update:
+            print("Regression failed." if failures else "Regression passed.")
+        return 1 if failures else 0
+
+    if args.command == "watch":
+        try:
+            recipe = load_recipe(args.recipe)
+            watcher = FolderWatcher(
+                recipe, args.folder, args.output, args.workers, args.queue_size, args.interval,
+                args.settle, args.include_existing, args.metrics_interval
+            )
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+        watcher.run()
+        return 0
+
+    if args.command == "batch":
+        try:
+            recipe = load_recipe(args.recipe)
+        except (OSError, ValueError) as e:
+            parser.error(f"Failed to load recipe: {e}")
+        processed, failed = run_batch(recipe, args.inputs, args.output, args.workers)
+        print(f"Processed {processed} images, {failed} failed.")
+        return 1 if failed else 0
+
+    main_time = time.perf_counter()
     root = tk.Tk()
-    app = ImageProcessorApp(root)
+    app = ImageProcessorApp(root, args.memory_budget * 2 ** 20, args.atlas)
+    if args.startup_benchmark:
+        window_time = time.perf_counter()
+        app.finish_startup()  # First paint, then the deferred work
+        ready_time = time.perf_counter()
+        timings = {
+            "import": main_time - STARTUP_TIME,
+            "window": window_time - STARTUP_TIME,
+            "first_paint": app.first_paint_time,
+            "ready": ready_time - STARTUP_TIME
+        }
+        print(json.dumps({name: round(1000 * value, 1) for name, value in timings.items()}))
+        logging.info(f"Startup benchmark: {timings}")
+        root.destroy()
+        return 0
     root.mainloop()
+    return 0
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
+else:
+    load_imaging()  # Imported as a library, e.g. by the service's worker processes